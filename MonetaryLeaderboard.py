@@ -1,7 +1,18 @@
-users={} #empty dictionary
-tier1_price = 5.99 #price values to easily edit if needed
-tier2_price = 9.99
-tier3_price = 24.99
+import argparse
+import sys
+
+from songbump import batch
+from songbump.archive import archive_session
+from songbump.contributions import add_contribution, empty_delta
+from songbump.core import Contributor, Session, apply, describe
+from songbump.leaderboard import LeaderboardIndex
+from songbump.money import BIT_VALUE, TIER_PRICES, dollars, format_dollars, to_cents #prices in cents, edit them in songbump/money.py
+from songbump.render_cache import RenderCache
+
+session = Session() #this stream's contributors, name -> Contributor
+users = session.users
+leaderboard = LeaderboardIndex() #users kept sorted by monetary total as they change
+session.subscribe(leaderboard)
 
 def main(): #main menu from GradeTrackerDB
     while True:
@@ -38,6 +49,9 @@ def main(): #main menu from GradeTrackerDB
             print("\n---Clearing All Users---")
             clear_input = input("Are you sure? (Y or N)").strip().lower()
             if clear_input == "y":
+                archive_input = input("Archive this stream first? (Y or N)").strip().lower()
+                if archive_input == "y" and session:
+                    print(f"Archived as {archive_session(session)}") #see songbump/archive.py for looking it up later
                 clear_all()
             elif clear_input == "n":
                 continue
@@ -53,44 +67,15 @@ def main(): #main menu from GradeTrackerDB
         else:
             print("Invalid choice, please try again.")
 
-def update_contributions(user_name, totals, initial=False): #initial so that I can still subtract in edit mode, but does not allow negative numbers initially
-    #function to use in both add and update users
-    user_name = totals["name"]
-    user_total = totals["monetary_total"]
-    resub_tier = totals["resub_tier"]
-    total_resub = totals["resub_total"]
-    num_tierone_gifted = totals["tier1"]
-    num_tiertwo_gifted = totals["tier2"]
-    num_tierthree_gifted = totals["tier3"]
-    gifted_count = totals["gifted_subs_count"]
-    total_gifted = totals["gifted_subs_total"]
-    num_bits = totals["num_bits"]
-    total_bits = totals["bits_total"]
-    total_dono = totals["donos"]
-    bump_status = totals["bumpable"]
+def update_contributions(user_name, initial=False): #initial so that I can still subtract in edit mode, but does not allow negative numbers initially
+    #function to use in both add and update users, collects everything typed into one delta
+    delta = empty_delta()
 
     while True:
         cont_choice = input(f"\n{user_name} - Resub/gifted/bits/dono? (R,G,B,D, Q to Esc): ").strip().lower()
         if cont_choice == "q":
-            user_total = round(total_resub + total_gifted + total_bits + total_dono, 2)
-            bump_status = (num_bits >= 500) or (resub_tier >= 2) or (gifted_count >= 2) or (total_dono >= 5) or (num_tiertwo_gifted >= 1) or (num_tierthree_gifted >= 1) or (user_total > 5.99)
-
-            #dictionary update
-            users[user_name] = {
-                "name": user_name,
-                "monetary_total": user_total,
-                "resub_tier": resub_tier,
-                "resub_total": total_resub,
-                "tier1": num_tierone_gifted,
-                "tier2": num_tiertwo_gifted,
-                "tier3": num_tierthree_gifted,
-                "gifted_subs_count": gifted_count,
-                "gifted_subs_total": total_gifted,
-                "num_bits": num_bits,
-                "bits_total": total_bits,
-                "donos": total_dono,
-                "bumpable": bump_status,
-            }
+            contributor = session.get(user_name) or Contributor(user_name)
+            session.put(user_name, apply(contributor, delta)) #totals and bump status (bump_rules.json) are recalculated, leaderboard follows
             print(f"Updated {user_name}'s contributions.")
             return
 
@@ -108,20 +93,12 @@ def update_contributions(user_name, totals, initial=False): #initial so that I c
             except ValueError:
                 print("Invalid tier")
                 continue
-            if resub_tier == 1:
-                amount = tier1_price
-                print(f"Added Resub Tier {resub_tier} to {user_name} (${tier1_price})")
-            elif resub_tier == 2:
-                amount = tier2_price
-                print(f"Added Resub Tier {resub_tier} to {user_name} (${tier2_price})")
-            elif resub_tier == 3:
-                amount = tier3_price
-                print(f"Added Resub Tier {resub_tier} to {user_name} (${tier3_price})")
-            else:
+            if resub_tier not in TIER_PRICES:
                 print("Invalid tier")
                 continue
 
-            total_resub += amount
+            add_contribution(delta, "resub", tier=resub_tier)
+            print(f"Added Resub Tier {resub_tier} to {user_name} ({format_dollars(TIER_PRICES[resub_tier])})")
 
         #gifted update
         elif cont_choice == "g":
@@ -147,26 +124,13 @@ def update_contributions(user_name, totals, initial=False): #initial so that I c
             except ValueError:
                 print("Invalid amount or tier")
                 continue
-
-            if gifted_tier == 1:
-                total_gifted += gifted_amt * tier1_price
-                num_tierone_gifted += gifted_amt
-                gifted_count += gifted_amt
-                print(f"Added {gifted_amt} Tier {gifted_tier} Gifted to {user_name} (${gifted_amt * tier1_price:.2f})")
-            elif gifted_tier == 2:
-                total_gifted += gifted_amt * tier2_price
-                num_tiertwo_gifted += gifted_amt
-                gifted_count += gifted_amt
-                print(f"Added {gifted_amt} Tier {gifted_tier} Gifted to {user_name} (${gifted_amt * tier2_price:.2f})")
-            elif gifted_tier == 3:
-                total_gifted += gifted_amt * tier3_price
-                num_tierthree_gifted += gifted_amt
-                gifted_count += gifted_amt
-                print(f"Added {gifted_amt} Tier {gifted_tier} Gifted to {user_name} (${gifted_amt * tier3_price:.2f})")
-            else:
+            if gifted_tier not in TIER_PRICES:
                 print("Invalid tier")
                 continue
 
+            add_contribution(delta, "gifted", gifted_amt, gifted_tier)
+            print(f"Added {gifted_amt} Tier {gifted_tier} Gifted to {user_name} ({format_dollars(gifted_amt * TIER_PRICES[gifted_tier])})")
+
         #bit update
         elif cont_choice == "b":
             try:
@@ -180,26 +144,25 @@ def update_contributions(user_name, totals, initial=False): #initial so that I c
                     continue
 
                 bit_word = "Bit" if bit_amt == 1 else "Bits"
-                print(f"Added {bit_amt} {bit_word} to {user_name} (${(bit_amt * 0.01):.2f})")
+                print(f"Added {bit_amt} {bit_word} to {user_name} ({format_dollars(bit_amt * BIT_VALUE)})")
             except ValueError:
                 print("Invalid amount")
                 continue
 
-            total_bits += round(bit_amt * 0.01, 2)
-            num_bits += bit_amt
+            add_contribution(delta, "bits", bit_amt)
 
         #dono update
         elif cont_choice == "d":
             try:
-                dono_amt = float(input(f"{user_name} - Dono: How much? "))
+                dono_amt = to_cents(input(f"{user_name} - Dono: How much? "))
                 if initial and dono_amt < 0:
                     print("Initial entries cannot be negative")
                     continue
-                print(f"Added ${dono_amt:.2f} to {user_name}")
+                print(f"Added {format_dollars(dono_amt)} to {user_name}")
             except ValueError:
                 print("Invalid amount")
                 continue
-            total_dono += round(dono_amt, 2)
+            add_contribution(delta, "dono", dono_amt)
 
         else:
             print("Unknown option")
@@ -207,135 +170,78 @@ def update_contributions(user_name, totals, initial=False): #initial so that I c
 
 #clear all users
 def clear_all():
-    users.clear()
+    session.clear()
 
 #clearing a singular user
 def delete_user(user_name):
-    global users
-    if user_name in users:
-        del users[user_name]
+    if user_name in session:
+        session.delete(user_name)
         print(f"{user_name} has been deleted.")
     else:
         print(f"{user_name} not found.")
 
 
 def edit_user(user_name):
-    if user_name not in users:
+    if user_name not in session:
             print(f"{user_name} is not on the list")
             add_input = input(f"Do you want to add {user_name}? (Y or N): ").strip().lower()
             if add_input == "y":
                 add_user(user_name)
             return
 
-    #loading existing totals
-    user_data = users[user_name]
-    totals = {
-        "name": user_data["name"],
-        "monetary_total": user_data["monetary_total"],
-        "resub_tier": user_data["resub_tier"],
-        "resub_total": user_data["resub_total"],
-        "tier1": user_data["tier1"],
-        "tier2": user_data["tier2"],
-        "tier3": user_data["tier3"],
-        "gifted_subs_count": user_data["gifted_subs_count"],
-        "gifted_subs_total": user_data["gifted_subs_total"],
-        "num_bits": user_data["num_bits"],
-        "bits_total": user_data["bits_total"],
-        "donos": user_data["donos"],
-        "bumpable": user_data["bumpable"],
-    }
-
-    update_contributions(user_name, totals)
+    update_contributions(user_name) #adds to the existing totals
 
 def add_user(user_name):
-    if user_name in users:
+    if user_name in session:
         print(f"{user_name} is already on list.")
         edit_choice = input("Would you like to edit? (Y or N): ").strip().lower()
         if edit_choice == "y":
             edit_user(user_name)
         return
 
-    #fresh totals
-    totals = {
-                "name": user_name,
-                "monetary_total": 0.0,
-                "resub_tier": 0,
-                "resub_total": 0,
-                "tier1": 0,
-                "tier2": 0,
-                "tier3": 0,
-                "gifted_subs_count" : 0,
-                "gifted_subs_total": 0.0,
-                "num_bits": 0,
-                "bits_total": 0.0,
-                "donos": 0.0,
-                "bumpable": False,
-            }
-
-    update_contributions(user_name, totals, initial=True)
+    update_contributions(user_name, initial=True) #starts from fresh totals
 
 #function to show the users sorted by monetary value, highest to lowest
-def print_users_by_total():
-    global users
-    if not users:
+def print_users_by_total(limit=None): #limit = only the top few, for batch mode
+    if not session:
         print("There are no usernames to show")
         return
-    sorted_users = sorted(
-        users.items(),
-        key=lambda item: item[1]['monetary_total'],
-        reverse = True
-    )
     print("\n---Monetary Leaderboard---")
-    for user_name, user_data in sorted_users:
-        total = user_data['monetary_total']
-
-        bump = "Bumpable" if user_data['bumpable'] else "Not Bumpable" #Learned that you can combine if else on one line
-        contributions =[] 
-
-        #resub check
-        if user_data['resub_tier'] == 3:
-            contributions.append("tier 3 resub")
-        elif user_data['resub_tier'] == 2:
-            contributions.append("tier 2 resub")
-        elif user_data['resub_tier'] == 1:
-            contributions.append("resub")
-
-
-        #gifted sub tier 1 check
-        if user_data['tier1'] > 1:
-            contributions.append(f"{user_data['tier1']} gifted subs")
-        elif user_data['tier1'] == 1:
-            contributions.append("gifted sub")
-        
-        #gifted sub tier 2 check
-        if user_data['tier2'] > 1:
-            contributions.append(f"{user_data['tier2']} tier 2 gifted subs")
-        elif user_data['tier2'] == 1:
-            contributions.append("tier 2 gifted sub")
-
-        #gifted sub tier 3 check
-        if user_data['tier3'] > 1:
-            contributions.append(f"{user_data['tier3']} tier 3 gifted subs")
-        elif user_data['tier3'] == 1:
-            contributions.append("tier 3 gifted sub")
-        
-        #bits check
-        if user_data["num_bits"] > 1:
-            contributions.append(f"{user_data['num_bits']} bits")
-        elif user_data["num_bits"] == 1:
-            contributions.append("1 bit")
-
-        #dono check
-        if user_data["donos"] > 0:
-            dono_amt = user_data["donos"]
-            if dono_amt.is_integer():
-                contributions.append(f"${int(dono_amt)} dono")
-            else:
-                contributions.append(f"${dono_amt:.2f} dono")
-
-        #joining the strings
-        contribution_string = ", ".join(contributions)            
-        line = (f"{user_name[:15].ljust(15)} | Total: ${total:>6.2f} | {bump.rjust(12)} | {(contribution_string).capitalize()}")
-
-        print(line)
-main()
\ No newline at end of file
+    for user_name in (leaderboard if limit is None else leaderboard.top(limit)): #already in order, no re-sort needed
+        print(leaderboard_lines.get(user_name, users[user_name])) #only rebuilt for users that changed
+
+def leaderboard_line(user_name, user_data):
+    bump = "Bumpable" if user_data.bumpable else "Not Bumpable" #Learned that you can combine if else on one line
+    contribution_string = describe(user_data, tier1_label="", empty="") #same wording as the Streamlit version, minus "Tier 1"
+    return (f"{user_name[:15].ljust(15)} | Total: ${dollars(user_data.monetary_total):>6} | {bump.rjust(12)} | {contribution_string}")
+
+leaderboard_lines = RenderCache(leaderboard_line) #each user's line, kept until they change or get deleted
+session.subscribe(leaderboard_lines)
+
+#headless mode: commands from a file or stdin instead of prompts (see songbump/batch.py)
+def run_batch(path, every=0, top=None):
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        summary = batch.run(session, stream, show=lambda: print_users_by_total(top), every=every)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print_users_by_total(top)
+    for error in summary.errors:
+        print(error, file=sys.stderr)
+    print(summary, file=sys.stderr)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Twitch Song Bump Calculator (interactive unless --batch is given).")
+    parser.add_argument("--batch", metavar="FILE", help="read commands from FILE (- for stdin) instead of prompting")
+    parser.add_argument("--every", type=int, default=0, help="in batch mode, also print the leaderboard every N commands")
+    parser.add_argument("--top", type=int, help="only print the top N users")
+    args = parser.parse_args()
+    if args.batch:
+        try:
+            run_batch(args.batch, args.every, args.top)
+        except OSError as e:
+            parser.error(str(e))
+    else:
+        main()
\ No newline at end of file
@@ -1,121 +1,150 @@
+import datetime
+import html
+import os
+import uuid
+
 import streamlit as st
-import json
+
+from songbump import analytics, profiling
+from songbump.archive import ArchiveIndex, archive_session
+from songbump.assets import background_css, build_background, data_uri
+from songbump.bump_queue import BumpQueue
+from songbump.bump_rules import get_rules
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.core import ChangeCounter, describe
+from songbump.exporter import EXPORT_DIR, Exporter, file_sinks
+from songbump.history import History
+from songbump.importer import import_upload
+from songbump.leaderboard import LeaderboardIndex
+from songbump.money import TIER_PRICES, format_dollars, to_cents
+from songbump.render_cache import RenderCache
+from songbump.storage import open_storage
+from songbump.totals import GrandTotals
 
 # --- Persistence ---
 DATA_FILE = "users.json"
+JOURNAL_FILE = "users.journal.jsonl"
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static") # served at app/static/
+
+@st.cache_resource
+def get_storage():
+    # One storage per server process, shared by every session and rerun.
+    # SONGBUMP_STORAGE=sqlite switches from the JSON journal to users.db
+    return open_storage(snapshot_path=DATA_FILE, journal_path=JOURNAL_FILE)
+
+@st.cache_resource
+def get_totals():
+    # Follows the storage so totals only change when a user does
+    totals = GrandTotals()
+    get_storage().subscribe(totals)
+    return totals
+
+@st.cache_resource
+def get_archive():
+    # Past streams, see songbump/archive.py (archive/ next to users.json)
+    return ArchiveIndex()
+
+@st.cache_resource
+def get_leaderboard():
+    # Kept in order as users change, so reruns never re-sort
+    leaderboard = LeaderboardIndex()
+    get_storage().subscribe(leaderboard)
+    return leaderboard
+
+@st.cache_resource
+def get_bump_queue():
+    # Bumpable users still owed a song, in the order they should be played
+    queue = BumpQueue()
+    get_storage().subscribe(queue)
+    return queue
+
+@st.cache_resource
+def get_history():
+    # Every change since the server started, for undo/redo and "as of" restores
+    return History(get_storage())
+
+@st.cache_resource
+def get_exporter():
+    # Mirrors the board into exports/ from a background thread once a mod turns it on
+    # (SONGBUMP_EXPORT=1 turns it on at startup)
+    exporter = Exporter(file_sinks(EXPORT_DIR))
+    get_storage().subscribe(exporter)
+    if os.environ.get("SONGBUMP_EXPORT", "") not in ("", "0"):
+        exporter.start()
+    return exporter
+
+@st.cache_resource
+def get_changes():
+    # Counts writes, so a fragment can tell whether users were added or removed since the page was drawn
+    changes = ChangeCounter()
+    get_storage().subscribe(changes)
+    return changes
 
 def load_users():
-    try:
-        with open(DATA_FILE, "r") as f:
-            users = json.load(f)
-            for user in users.values():
-                if "song_played" not in user:
-                    user["song_played"] = False
-            return users
-    except FileNotFoundError:
-        return {}
-
-def save_users(users):
-    with open(DATA_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-
-# --- HELPER FUNCTION ---
-def get_contribution_string(user_data):
-    """Generates a detailed contribution string for a user."""
-    contributions = []
-    
-    # Resub check
-    if user_data['resub_tier'] == 3:
-        contributions.append("Tier 3 resub")
-    elif user_data['resub_tier'] == 2:
-        contributions.append("Tier 2 resub")
-    elif user_data['resub_tier'] == 1:
-        contributions.append("Resub")
-
-    # Gifted sub tier 1 check
-    if user_data['tier1'] > 1:
-        contributions.append(f"{user_data['tier1']} Tier 1 gifted subs")
-    elif user_data['tier1'] == 1:
-        contributions.append("Tier 1 gifted sub")
-    
-    # Gifted sub tier 2 check
-    if user_data['tier2'] > 1:
-        contributions.append(f"{user_data['tier2']} Tier 2 gifted subs")
-    elif user_data['tier2'] == 1:
-        contributions.append("Tier 2 gifted sub")
-
-    # Gifted sub tier 3 check
-    if user_data['tier3'] > 1:
-        contributions.append(f"{user_data['tier3']} Tier 3 gifted subs")
-    elif user_data['tier3'] == 1:
-        contributions.append("Tier 3 gifted sub")
-    
-    # Bits check
-    if user_data["num_bits"] > 1:
-        contributions.append(f"{user_data['num_bits']} bits")
-    elif user_data["num_bits"] == 1:
-        contributions.append("1 bit")
-
-    # Dono check
-    if user_data["donos"] > 0:
-        dono_amt = user_data["donos"]
-        # Check if it's a whole number
-        if dono_amt == int(dono_amt):
-            contributions.append(f"${int(dono_amt)} dono")
-        else:
-            contributions.append(f"${dono_amt:.2f} dono")
-    
-    if not contributions:
-        return "No contributions yet."
-
-    return ", ".join(contributions).capitalize()
+    storage = get_storage()
+    storage.sync() # pick up anything written by other processes
+    return storage.users
+
+def follow_storage():
+    # Called first in every fragment, so it draws the latest rows when it reruns on its own.
+    # Edits to existing users only show up in the fragments that rerun; the rest of the page
+    # catches up on its next full run
+    return load_users()
+
+def redraw_if_users_changed():
+    # Called last in every fragment, once it has handled its own input. Users added or removed
+    # (here or by another mod) change lists, counts and pages all over the page, so those
+    # draw the whole page again
+    if get_changes().user_set != st.session_state.get("drawn_user_set"):
+        st.rerun()
+
+def mod_id():
+    # One per browser session: Undo only ever takes back this mod's own changes
+    if "mod_id" not in st.session_state:
+        st.session_state.mod_id = uuid.uuid4().hex
+    return st.session_state.mod_id
+
+def save_user(name, change=None):
+    # Applies change(data) to the latest copy of the user, so edits other mods
+    # made in the meantime are merged in instead of overwritten
+    with get_history().action(owner=mod_id()):
+        return get_storage().update(name, change or (lambda data: None))
+
+def add_delta(name, delta):
+    return save_user(name, lambda data: apply_delta(data, delta))
+
+def remove_user(name):
+    with get_history().action(owner=mod_id()):
+        get_storage().delete(name)
+
+def clear_users():
+    with get_history().action(owner=mod_id()):
+        get_storage().clear()
+
+@st.cache_data(show_spinner=False)
+def get_background_css(image_file, mtime):
+    # mtime is part of the cache key, so the image is only processed again when it changes
+    if st.get_option("server.enableStaticServing"):
+        full_name, mobile_name = build_background(image_file, STATIC_DIR)
+        return background_css(f"app/static/{full_name}?v={mtime}", f"app/static/{mobile_name}?v={mtime}")
+    return background_css(data_uri(image_file))
 
 def set_background(image_file):
-    import base64
-    with open(image_file, "rb") as f:
-        data = base64.b64encode(f.read()).decode("utf-8")
-    
-    # Custom CSS for setting the background
-    st.markdown(
-        f"""
-        <style>
-        .stApp {{
-            background-image: url("data:image/jpeg;base64,{data}");
-            background-size: cover; /* Ensures the image covers the entire viewport */
-            background-attachment: fixed; /* Keeps the background fixed when scrolling */
-            background-position: center; /* Centers the image */
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(get_background_css(image_file, os.stat(image_file).st_mtime_ns), unsafe_allow_html=True)
+
+# --- Profiling (opt-in: add ?debug=1 to the URL or set SONGBUMP_PROFILE=1) ---
+profiler = profiling.start(
+    profiling.enabled(st.query_params), get_storage(), cprofile=st.session_state.get("debug_cprofile", False)
+)
 
 set_background('background.jpg')
+profiler.lap("set_background")
 
 # --- Load users ---
 users = load_users()
-
-# --- Prices ---
-tier1_price = 5.99
-tier2_price = 9.99
-tier3_price = 24.99
-
-# --- GRAND TOTALS INITIALIZATION ---
-grand_totals = {
-    "total_monetary": 0.0,
-    "total_resubs_value": 0.0,
-    "total_gifted_subs_value": 0.0,
-    "total_donos": 0.0,
-    "total_bits_value": 0.0,
-    "total_bits_amount": 0,
-    "total_subs_count": 0,
-    # --- RAW COUNTS ---
-    "total_gifted_subs_count": 0, # Total gifted subs (Tier 1, 2, 3)
-    "total_resubs_count": 0,      # Total Tier 1, 2, or 3 resubs (not value, just the count of active subs)
-    "total_tier1": 0,
-    "total_tier2": 0,
-    "total_tier3": 0,
-}
+history = get_history() # subscribed before anything below can write
+st.session_state["drawn_user_set"] = get_changes().user_set # the users every section below is drawn from
+profiler.lap("load_users")
 
 # --- Streamlit UI ---
 # Place this CSS block near the top of your script
@@ -133,104 +162,167 @@ st.markdown(
 # Use st.markdown() with a custom class to display the title
 st.markdown('<h1 class="centered-title">🎵 PRB Song Bump Calculator🎵</h1>', unsafe_allow_html=True)
 
-if users:
-    # --- RESET GRAND TOTALS ---
-    grand_totals = {key: 0.0 if isinstance(grand_totals[key], float) else 0 for key in grand_totals}
+# --- Leaderboard paging ---
+PAGE_SIZES = [10, 25, 50, 100]
+NEXT_UP = 5 # users shown in the Next Up panel
+
+def jump_to_user():
+    # Runs as a widget callback, before the page selector is drawn, so it can still move it
+    name = st.session_state.get("leaderboard_jump", "").strip()
+    rank = get_leaderboard().rank(name)
+    if rank is not None:
+        st.session_state.leaderboard_page = rank // st.session_state.get("leaderboard_page_size", PAGE_SIZES[1]) + 1
+
+def build_row(name, data):
+    # Everything about a leaderboard row that only depends on the user's data,
+    # built once per change and reused by every rerun until then (see get_row_cache)
+    contribution_string = describe(data) # same contribution list the command line prints
+
+    # Shorten username for display if necessary
+    display_name = name
+    if len(name) > 20:
+        display_name = name[:12] + "..."
+
+    # The HTML entity &nbsp; is used to ensure the space between the word and emoji doesn't allow a line break.
+    reason = get_rules().reason(data) or ""
+    if data.bumpable:
+        # Hovering the status shows which bump rule the user met first
+        # (&#36; keeps the markdown renderer from reading a $ amount as the start of math)
+        bump_status_text = f'<span title="{html.escape(reason).replace("$", "&#36;")}">Bumpable&nbsp;🟢</span>'
+        status_text = "Song Played Status: ✅" if data.song_played else "Song Played Status: ❌"
+        song_status = f'<div style="margin-top: -10px; font-size: small;">{status_text}</div>'
+    else:
+        bump_status_text = 'Not&nbsp;Bumpable&nbsp;🔴'
+        song_status = None # only shown for bumpable users
+
+    return {
+        "display_name": display_name,
+        "stats": f" | Total: **{format_dollars(data.monetary_total)}** | {bump_status_text}", # after the bold name
+        "song_status": song_status,
+        # Use HTML to enforce both right-alignment AND italics (using the <i> tag)
+        "contributions": f'<div style="text-align: right;"><i>{contribution_string}</i></div>',
+        "table": {
+            "Total ($)": data.monetary_total / 100, # cents to dollars for display only
+            "Bumpable": "🟢" if data.bumpable else "🔴",
+            "Song Played": ("✅" if data.song_played else "❌") if data.bumpable else "",
+            "Bump Rule": reason,
+            "Contributions": contribution_string,
+        },
+    }
 
-    # --- Recalculate totals and bump status before sorting ---
-    for name, data in users.items():
-        total = round(
-            data["resub_total"] + data["gifted_subs_total"] + data["bits_total"] + data["donos"], 2
-        )
-        bump_status = (
-            data["num_bits"] >= 500
-            or data["resub_tier"] >= 2
-            or data["gifted_subs_count"] >= 2
-            or data["donos"] >= 5
-            or data["tier2"] >= 1
-            or data["tier3"] >= 1
-            or total > 5.99
-        )
-        
-        # Calculate the simplified sub count for Grand Total tracking
-        sub_count = (1 if data['resub_tier'] > 0 else 0) + data['gifted_subs_count']
-
-        data["monetary_total"] = total
-        data["bumpable"] = bump_status
-
-        # --- UPDATE GRAND TOTALS ---
-        grand_totals["total_monetary"] += total
-        grand_totals["total_resubs_value"] += data["resub_total"] # Keep value tracking
-        grand_totals["total_gifted_subs_value"] += data["gifted_subs_total"] # Keep value tracking
-        grand_totals["total_donos"] += data["donos"]
-        grand_totals["total_bits_value"] += data["bits_total"]
-        grand_totals["total_bits_amount"] += data["num_bits"]
-        grand_totals["total_subs_count"] += sub_count
-        
-        # --- ACCUMULATE RAW COUNTS ---
-        grand_totals["total_gifted_subs_count"] += data["gifted_subs_count"]
-        # Only count the highest active tier for resubs (1 if T1/T2/T3 is active)
-        if data["resub_tier"] > 0:
-            grand_totals["total_resubs_count"] += 1 
-        grand_totals["total_tier1"] += data["tier1"]
-        grand_totals["total_tier2"] += data["tier2"]
-        grand_totals["total_tier3"] += data["tier3"]
-        
-    sorted_users = sorted(users.items(), key=lambda item: item[1]['monetary_total'], reverse=True)
-    
-if users:
-    # The sorted_users list is only created when 'users' is not empty.
-    
-    # --- Leaderboard ---
-    st.subheader("Leaderboard")
+@st.cache_resource
+def get_row_cache():
+    # Rows are rebuilt only for users that changed since they were last shown
+    cache = RenderCache(build_row)
+    get_storage().subscribe(cache)
+    return cache
+
+def render_leaderboard_row(name, data, highlight=False):
+    row = get_row_cache().get(name, data)
+    display_name = ("👉 " + row["display_name"]) if highlight else row["display_name"]
+
+    # Use two columns: give more space to the stats column to prevent wrapping
+    col_stats, col_contrib = st.columns([1.5, 2]) 
+
+    with col_stats:
+        # 1. Primary Name, Total, and Bump Status display
+        st.markdown(f"**{display_name}**{row['stats']}", unsafe_allow_html=True)
+
+        # 2. Display Song Played Status ONLY if bumpable
+        if row["song_status"]:
+            # Display this status on a new line underneath the primary stats
+            st.markdown(row["song_status"], unsafe_allow_html=True)
 
-    # --- Display each user in a single row using flexbox ---
-    for name, data in sorted_users:
-        # Calls the function that now returns ONLY the contribution list
-        contribution_string = get_contribution_string(data) 
+    with col_contrib:
+        st.markdown(row["contributions"], unsafe_allow_html=True)
         
-        # Shorten username for display if necessary
-        display_name = name
-        if len(name) > 20:
-            display_name = name[:12] + "..."
+    st.divider() # Visually separate each user
+
+def render_leaderboard_table(users, names, offset, highlight_name=None):
+    # One dataframe element for the whole page instead of several elements per user.
+    # users is the fragment's own (just synced) dict, the module-level one can be a run behind
+    cache = get_row_cache()
+    rows = []
+    for rank, name in enumerate(names, start=offset + 1):
+        rows.append({
+            "#": rank,
+            "User": ("👉 " + name) if name == highlight_name else name,
+            **cache.get(name, users[name])["table"],
+        })
+    st.dataframe(
+        rows,
+        hide_index=True,
+        use_container_width=True,
+        column_config={"Total ($)": st.column_config.NumberColumn(format="$%.2f")},
+    )
 
-        # Use two columns: give more space to the stats column to prevent wrapping
-        col_stats, col_contrib = st.columns([1.5, 2]) 
+# Only this panel reruns when the page, page size, view or Jump to user changes
+@st.fragment
+def leaderboard_panel():
+    users = follow_storage()
+    if users:
+        # Monetary totals and bump status are recalculated whenever a user is saved,
+        # and the leaderboard index keeps everyone in order, so only the visible page is rendered.
+        leaderboard = get_leaderboard()
+
+        # --- Next Up ---
+        # Read straight from the bump queue instead of filtering the leaderboard
+        bump_queue = get_bump_queue()
+        next_up = bump_queue.peek(NEXT_UP)
+        if next_up:
+            st.subheader("🎶 Next Up")
+            col_queue, col_played = st.columns([3, 1])
+            with col_queue:
+                for position, name in enumerate(next_up, start=1):
+                    st.markdown(f"{position}. **{name}** {format_dollars(users[name].monetary_total)}")
+                if len(bump_queue) > len(next_up):
+                    st.caption(f"{len(bump_queue) - len(next_up)} more waiting")
+            with col_played:
+                if st.button(f"Mark {next_up[0]}'s song played", key="next_up_played_btn", type="primary"):
+                    save_user(next_up[0], lambda data: data.update(song_played=True))
+                    st.rerun()
 
-        with col_stats:
-            # The HTML entity &nbsp; is used to ensure the space between the word and emoji doesn't allow a line break.
-            bump_status_text = 'Bumpable&nbsp;🟢' if data['bumpable'] else 'Not&nbsp;Bumpable&nbsp;🔴'
-            
-            # 1. Primary Name, Total, and Bump Status display
-            st.markdown(
-                f"**{display_name}** | Total: **${data['monetary_total']:.2f}** | {bump_status_text}",
-                unsafe_allow_html=True
-            )
+        # --- Leaderboard ---
+        st.subheader("Leaderboard")
 
-            # 2. Display Song Played Status ONLY if bumpable
-            if data['bumpable']:
-                is_song_played = data.get("song_played", False)
-                status_text = "Song Played Status: ✅" if is_song_played else "Song Played Status: ❌"
-                
-                # Display this status on a new line underneath the primary stats
-                st.markdown(f'<div style="margin-top: -10px; font-size: small;">{status_text}</div>', unsafe_allow_html=True)
+        col_view, col_size, col_jump = st.columns([1.5, 1, 1.5])
+        with col_view:
+            view_mode = st.radio("View", ["Detailed", "Compact table"], key="leaderboard_view", horizontal=True)
+        with col_size:
+            page_size = st.selectbox("Users per page", PAGE_SIZES, index=1, key="leaderboard_page_size")
+        with col_jump:
+            jump_name = st.text_input("Jump to user", key="leaderboard_jump", on_change=jump_to_user).strip()
 
+        page_count = max(1, -(-len(leaderboard) // page_size)) # ceiling division
+        if st.session_state.get("leaderboard_page", 1) > page_count:
+            st.session_state.leaderboard_page = page_count # the board shrank under the current page
 
-        with col_contrib:
-            # Use HTML to enforce both right-alignment AND italics (using the <i> tag)
-            st.markdown(
-                f'<div style="text-align: right;"><i>{contribution_string}</i></div>', 
-                unsafe_allow_html=True
-            )
-            
-        st.divider() # Visually separate each user
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key="leaderboard_page")
 
-else:
-    st.info("No contributions yet. Beeg Sadge :(")
+        if jump_name and jump_name not in leaderboard:
+            st.caption(f"{jump_name} is not on the leaderboard.")
 
-# --- Add User ---
-st.subheader("Add User")
+        offset = (page - 1) * page_size
+        page_names = leaderboard.page(offset, page_size)
 
+        if view_mode == "Compact table":
+            render_leaderboard_table(users, page_names, offset, highlight_name=jump_name)
+        else:
+            # --- Display each user on the current page in a single row ---
+            for name in page_names:
+                render_leaderboard_row(name, users[name], highlight=(name == jump_name))
+
+    else:
+        st.info("No contributions yet. Beeg Sadge :(")
+    redraw_if_users_changed()
+
+leaderboard_panel()
+
+profiler.lap("leaderboard")
+
+# --- Add User ---
 if "current_new_user" not in st.session_state:
     st.session_state.current_new_user = None
 
@@ -238,226 +330,154 @@ if "current_new_user" not in st.session_state:
 if "editing_user" not in st.session_state:
     st.session_state.editing_user = None
 
-# --- NEW EXCLUSION BLOCK ---
-# This block is for creating a new user, which should always be possible.
-if st.session_state.editing_user is None and st.session_state.current_new_user is None:
+# Switching the contribution type only reruns this form
+@st.fragment
+def add_user_panel():
+    users = follow_storage()
+    st.subheader("Add User")
 
-    # 1. Initialize the input value (must be done before the input is called)
-    if "add_user_input_value" not in st.session_state:
-        st.session_state["add_user_input_value"] = ""
+    # --- NEW EXCLUSION BLOCK ---
+    # This block is for creating a new user, which should always be possible.
+    if st.session_state.editing_user is None and st.session_state.current_new_user is None:
 
-    new_user = st.text_input(
-        "Enter a new username", 
-        key="add_user_input", 
-        value=st.session_state["add_user_input_value"]
-    )
+        # 1. Initialize the input value (must be done before the input is called)
+        if "add_user_input_value" not in st.session_state:
+            st.session_state["add_user_input_value"] = ""
 
-    # --- Logic for creating the new user ---
-    if new_user and new_user not in users:
-        users[new_user] = {
-            "monetary_total": 0.0,
-            "resub_tier": 0,
-            "resub_total": 0.0,
-            "tier1": 0,
-            "tier2": 0,
-            "tier3": 0,
-            "gifted_subs_count": 0,
-            "gifted_subs_total": 0.0,
-            "num_bits": 0,
-            "bits_total": 0.0,
-            "donos": 0.0,
-            "bumpable": False,
-            "song_played": False, 
-        }
-        save_users(users)
-        st.session_state.current_new_user = new_user
-        st.success(f"{new_user} added! Now enter their contributions below:")
-        st.rerun() 
-
-    # --- Warning Logic (simplified since we've excluded editing_user) ---
-    # We also check the 'just_submitted_add' flag to skip the warning immediately after submission
-    is_just_submitted = st.session_state.pop("just_submitted_add", False)
+        new_user = st.text_input(
+            "Enter a new username", 
+            key="add_user_input", 
+            value=st.session_state["add_user_input_value"]
+        )
+
+        # --- Logic for creating the new user ---
+        if new_user and new_user not in users:
+            save_user(new_user) # creates the row with everything at zero
+            st.session_state.current_new_user = new_user
+            st.success(f"{new_user} added! Now enter their contributions below:")
+            st.rerun() 
+
+        # --- Warning Logic (simplified since we've excluded editing_user) ---
+        # We also check the 'just_submitted_add' flag to skip the warning immediately after submission
+        is_just_submitted = st.session_state.pop("just_submitted_add", False)
     
-    if new_user in users and not is_just_submitted:
-        st.warning(f"{new_user} already exists.")
-
-# --- Contribution Form Logic (if current_new_user is set) ---
-# This form only appears after a user name is entered above.
-if st.session_state.current_new_user:
-    user = st.session_state.current_new_user
-    st.info(f"Adding initial contribution for **{user}**")
+        if new_user in users and not is_just_submitted:
+            st.warning(f"{new_user} already exists.")
+
+    # --- Contribution Form Logic (if current_new_user is set) ---
+    # This form only appears after a user name is entered above.
+    if st.session_state.current_new_user:
+        user = st.session_state.current_new_user
+        st.info(f"Adding initial contribution for **{user}**")
     
-    # Radio button is outside the form for dynamic rendering
-    st.radio(
-        "Initial Contribution Type",
-        ["Resub", "Gifted", "Bits", "Dono"],
-        key="add_contrib_choice",
-    )
+        # Radio button is outside the form for dynamic rendering
+        st.radio(
+            "Initial Contribution Type",
+            ["Resub", "Gifted", "Bits", "Dono"],
+            key="add_contrib_choice",
+        )
     
-    with st.form("add_contrib_form"):
-        # Retrieve the choice from the state (guaranteed to be current)
-        current_choice = st.session_state.get("add_contrib_choice", "Resub")
+        with st.form("add_contrib_form"):
+            # Retrieve the choice from the state (guaranteed to be current)
+            current_choice = st.session_state.get("add_contrib_choice", "Resub")
 
-        # --- Define the container slot ---
-        input_container = st.container() 
+            # --- Define the container slot ---
+            input_container = st.container() 
 
-        # --- Draw Inputs based on the choice stored in state ---
-        with input_container:
-            if current_choice == "Resub":
-                st.selectbox("Tier", [1, 2, 3], key="add_resub_tier")
+            # --- Draw Inputs based on the choice stored in state ---
+            with input_container:
+                if current_choice == "Resub":
+                    st.selectbox("Tier", [1, 2, 3], key="add_resub_tier")
             
-            elif current_choice == "Gifted":
-                st.number_input("Number of Gifted Subs", min_value=1, step=1, key="add_gifted_amt")
-                st.selectbox("Gifted Tier", [1, 2, 3], key="add_gifted_tier")
+                elif current_choice == "Gifted":
+                    st.number_input("Number of Gifted Subs", min_value=1, step=1, key="add_gifted_amt")
+                    st.selectbox("Gifted Tier", [1, 2, 3], key="add_gifted_tier")
             
-            elif current_choice == "Bits":
-                st.number_input("Number of Bits", min_value=1, step=1, key="add_bits_amt")
+                elif current_choice == "Bits":
+                    st.number_input("Number of Bits", min_value=1, step=1, key="add_bits_amt")
             
-            elif current_choice == "Dono":
-                st.number_input("Donation Amount ($)", min_value=0.01, step=0.01, format="%.2f", key="add_dono_amt")
+                elif current_choice == "Dono":
+                    st.number_input("Donation Amount ($)", min_value=0.01, step=0.01, format="%.2f", key="add_dono_amt")
 
-        # --- Form Buttons ---
-        col_submit, col_cancel = st.columns(2)
+            # --- Form Buttons ---
+            col_submit, col_cancel = st.columns(2)
 
-        with col_submit:
-            submitted = st.form_submit_button("Add Contribution", use_container_width=True, type="primary")
+            with col_submit:
+                submitted = st.form_submit_button("Add Contribution", use_container_width=True, type="primary")
 
-        with col_cancel:
-            # We use a button with the same action as the form submission to trigger the logic
-            canceled = st.form_submit_button("Cancel & Delete User", use_container_width=True)
+            with col_cancel:
+                # We use a button with the same action as the form submission to trigger the logic
+                canceled = st.form_submit_button("Cancel & Delete User", use_container_width=True)
 
-        # --- Submission Logic ---
-        if submitted:
-            choice = current_choice
+            # --- Submission Logic ---
+            if submitted:
+                choice = current_choice
+                delta = empty_delta()
             
-            if choice == "Resub":
-                tier = st.session_state.add_resub_tier
-                tier_prices = {1: tier1_price, 2: tier2_price, 3: tier3_price}
-                
-                if tier == 1: users[user]["resub_total"] += tier1_price
-                elif tier == 2: users[user]["resub_total"] += tier2_price
-                elif tier == 3: users[user]["resub_total"] += tier3_price
-                users[user]["resub_tier"] = tier
-                st.success(f"Resub Tier {tier} added to {user}")
+                if choice == "Resub":
+                    tier = st.session_state.add_resub_tier
+                    add_contribution(delta, "resub", tier=tier)
+                    st.success(f"Resub Tier {tier} added to {user}")
             
-            elif choice == "Gifted":
-                gifted_amt = st.session_state.add_gifted_amt
-                gifted_tier = st.session_state.add_gifted_tier
-                tier_prices = {1: tier1_price, 2: tier2_price, 3: tier3_price}
-                
-                subs_price = tier_prices.get(gifted_tier, 0.0)
-                
-                users[user]["gifted_subs_total"] += gifted_amt * subs_price
-                
-                if gifted_tier == 1: users[user]["tier1"] += gifted_amt
-                elif gifted_tier == 2: users[user]["tier2"] += gifted_amt
-                elif gifted_tier == 3: users[user]["tier3"] += gifted_amt
-                    
-                users[user]["gifted_subs_count"] += gifted_amt
-                st.success(f"{gifted_amt} Tier {gifted_tier} gifted subs added to {user}")
+                elif choice == "Gifted":
+                    gifted_amt = st.session_state.add_gifted_amt
+                    gifted_tier = st.session_state.add_gifted_tier
+                    add_contribution(delta, "gifted", gifted_amt, gifted_tier)
+                    st.success(f"{gifted_amt} Tier {gifted_tier} gifted subs added to {user}")
             
-            elif choice == "Bits":
-                bit_amt = st.session_state.add_bits_amt
-                users[user]["bits_total"] += round(bit_amt * 0.01, 2)
-                users[user]["num_bits"] += bit_amt
-                st.success(f"{bit_amt} bits added to {user}")
+                elif choice == "Bits":
+                    bit_amt = st.session_state.add_bits_amt
+                    add_contribution(delta, "bits", bit_amt)
+                    st.success(f"{bit_amt} bits added to {user}")
             
-            elif choice == "Dono":
-                dono_amt = st.session_state.add_dono_amt
-                users[user]["donos"] += round(dono_amt, 2)
-                st.success(f"${dono_amt:.2f} donation added to {user}")
-
-            # Recalculate monetary total before saving
-            data = users[user]
-            data["monetary_total"] = round(
-                data["resub_total"] + data["gifted_subs_total"] + data["bits_total"] + data["donos"], 
-                2
-            )
-
-            # --- Common Post-Submission Logic for successful ADD ---
-            save_users(users)
-            st.session_state.current_new_user = None
-            st.session_state["add_user_input_value"] = ""
+                elif choice == "Dono":
+                    dono_amt = to_cents(st.session_state.add_dono_amt)
+                    add_contribution(delta, "dono", dono_amt)
+                    st.success(f"{format_dollars(dono_amt)} donation added to {user}")
+
+                # --- Common Post-Submission Logic for successful ADD ---
+                add_delta(user, delta) # also recalculates the monetary total and bump status
+                st.session_state.current_new_user = None
+                st.session_state["add_user_input_value"] = ""
             
-            # Temporarily set flag to suppress "already exists" warning
-            st.session_state["just_submitted_add"] = True 
+                # Temporarily set flag to suppress "already exists" warning
+                st.session_state["just_submitted_add"] = True 
             
-            st.rerun()
+                st.rerun()
 
-    # --- NEW: Logic for CANCEL button ---
-        if canceled:
-            del users[user]
-            save_users(users)
-            st.warning(f"Adding user **{user}** canceled. User has been deleted.")
-            st.session_state.current_new_user = None
-            st.session_state["add_user_input_value"] = "" # Reset the input value
-            st.rerun()
+        # --- NEW: Logic for CANCEL button ---
+            if canceled:
+                remove_user(user)
+                st.warning(f"Adding user **{user}** canceled. User has been deleted.")
+                st.session_state.current_new_user = None
+                st.session_state["add_user_input_value"] = "" # Reset the input value
+                st.rerun()
+    redraw_if_users_changed()
+
+add_user_panel()
 
 st.markdown("---") # Separator between Add User and Manage Users
+profiler.lap("add_user")
 
 # --- Initialize Song Status Edit State ---
 if "editing_song_status" not in st.session_state:
     st.session_state.editing_song_status = None
 
-# --- Manage Existing Users (Only show if users exist) ---
-if users:
-    st.subheader("Manage Existing Users")
-
-    # Variable to hold selected user from the selectbox
-    selected_user = None
-
-    user_list = [""] + list(users.keys())
-    # Reset the selection to a valid state if needed
-    default_index = user_list.index(st.session_state.get("manage_user_select", "")) if st.session_state.get("manage_user_select") in user_list else 0
-    
-    selected_user = st.selectbox(
-        "Choose a user", 
-        user_list, 
-        key="manage_user_select", 
-        format_func=lambda x: "Select a user" if x == "" else x,
-        index=default_index
-    )
-    
-    # --- Show Status and Buttons if a user is selected and not currently editing contributions ---
-    if selected_user and st.session_state.editing_user is None: 
-        user_data = users[selected_user] # Get the selected user's data
-        
-        # 1. Status Management Buttons
-        col_edit_status, col_edit_contrib, col_delete = st.columns([1, 1, 1])
-
-        with col_edit_status:
-            # Button to open the Song Status editor
-            if st.button("**Edit Song Played Status**", key="change_song_status_btn", use_container_width=True):
-                st.session_state.editing_song_status = selected_user
-                st.rerun() 
-
-        with col_edit_contrib:
-            if st.button("Edit Contributions", key="edit_user_btn", use_container_width=True):
-                st.session_state.editing_user = selected_user
-                st.rerun() 
-
-        with col_delete:
-            if st.button("Delete User", key="delete_user_btn", use_container_width=True, type="primary"):
-                del users[selected_user]
-                save_users(users)
-                st.warning(f"{selected_user} has been deleted.")
-                st.session_state.editing_user = None
-                st.session_state.editing_song_status = None
-                st.session_state["manage_user_select"] = "" # Reset selection
-                st.rerun()
-        
-        st.markdown("---") # Separator below buttons
-
+def close_song_status_editor():
+    st.session_state.editing_song_status = None
 
+@st.fragment
+def song_status_editor():
+    users = follow_storage()
     # --- DEDICATED SONG STATUS FORM (REVEALED BY BUTTON) ---
-    if st.session_state.editing_song_status:
+    if st.session_state.editing_song_status and st.session_state.editing_song_status in users:
         user_to_edit_status = st.session_state.editing_song_status
         user_data = users[user_to_edit_status]
         
         st.info(f"Setting Song Played status for **{user_to_edit_status}**")
         
         with st.form("edit_song_status_form"):
-            is_played = user_data.get("song_played", False)
+            is_played = user_data.song_played
             current_status = "Yes" if is_played else "No"
             initial_index = ["Yes", "No"].index(current_status)
 
@@ -475,23 +495,26 @@ if users:
                 submitted = st.form_submit_button("Save Song Status", use_container_width=True, type="primary")
                 
             with col_cancel:
-                if st.form_submit_button("Cancel", use_container_width=True):
-                    st.session_state.editing_song_status = None
-                    st.rerun()
+                # Closed from a callback: nothing was saved, so only this form reruns
+                st.form_submit_button("Cancel", use_container_width=True, on_click=close_song_status_editor)
 
             if submitted:
                 new_is_played = (new_status == "Yes")
                 
                 if new_is_played != is_played:
-                    users[user_to_edit_status]["song_played"] = new_is_played
-                    save_users(users)
+                    save_user(user_to_edit_status, lambda data: data.update(song_played=new_is_played))
                     st.success(f"Song Played status updated to **{new_status}** for {user_to_edit_status}.")
                 else:
                     st.info("Song status was not changed.")
                     
                 st.session_state.editing_song_status = None
                 st.rerun()
-                
+    redraw_if_users_changed()
+
+# Add/Subtract and the contribution type only rerun this form
+@st.fragment
+def contribution_editor():
+    users = follow_storage()
     # --- Contribution Management Form ---
     if st.session_state.editing_user and st.session_state.editing_user in users:
         user_to_edit = st.session_state.editing_user 
@@ -545,30 +568,27 @@ if users:
 
     # --- Submission Logic ---
             if submitted:
-                # --- Assuming 'tier1_price', 'tier2_price', 'tier3_price' are defined earlier in your script ---
                 choice = st.session_state.edit_contrib_choice
-                
-                tier_prices = {1: tier1_price, 2: tier2_price, 3: tier3_price}
+                delta = empty_delta()
                 
                 if choice == "Resub":
                     tier = st.session_state.edit_resub_tier
+                    old_tier = users[user_to_edit].resub_tier
                     
                     if multiplier == 1:
-                        old_tier = users[user_to_edit]["resub_tier"]
-                        old_price = tier_prices.get(old_tier, 0.0) 
-                        new_price = tier_prices.get(tier, 0.0)
-                        net_change = new_price - old_price
-                        users[user_to_edit]["resub_total"] += net_change
-                        users[user_to_edit]["resub_tier"] = tier
+                        def change_resub(data):
+                            # Priced against the tier at save time, in case another mod changed it
+                            data.resub_total += TIER_PRICES.get(tier, 0) - TIER_PRICES.get(data.resub_tier, 0)
+                            data.resub_tier = tier
+                        save_user(user_to_edit, change_resub)
                         st.success(f"Resub Tier updated from Tier {old_tier} to **Tier {tier}** for {user_to_edit}")
                     
                     else: 
-                        old_tier = users[user_to_edit]["resub_tier"]
-                        
                         if old_tier > 0:
-                            price_to_subtract = tier_prices.get(old_tier)
-                            users[user_to_edit]["resub_total"] -= price_to_subtract
-                            users[user_to_edit]["resub_tier"] = 0
+                            def remove_resub(data):
+                                data.resub_total -= TIER_PRICES.get(data.resub_tier, 0)
+                                data.resub_tier = 0
+                            save_user(user_to_edit, remove_resub)
                             st.success(f"Resub Tier {old_tier} status removed from {user_to_edit}")
                         else:
                             st.warning(f"{user_to_edit} currently has no active Resub status to remove.")
@@ -577,132 +597,299 @@ if users:
                 elif choice == "Gifted":
                     gifted_amt = st.session_state.edit_gifted_amt
                     gifted_tier = st.session_state.edit_gifted_tier
-                    amount_change = gifted_amt * multiplier
-                    total_change = amount_change * tier_prices.get(gifted_tier) 
-
-                    users[user_to_edit]["gifted_subs_total"] += total_change
-                    users[user_to_edit]["gifted_subs_count"] += amount_change
-                    
-                    if gifted_tier == 1: users[user_to_edit]["tier1"] += amount_change
-                    elif gifted_tier == 2: users[user_to_edit]["tier2"] += amount_change
-                    elif gifted_tier == 3: users[user_to_edit]["tier3"] += amount_change
-                    
+                    add_contribution(delta, "gifted", gifted_amt * multiplier, gifted_tier)
                     st.success(f"{operation_type}ed {gifted_amt} Tier {gifted_tier} gifted subs to {user_to_edit}")
 
                 elif choice == "Bits":
                     bit_amt = st.session_state.edit_bits_amt
-                    
-                    users[user_to_edit]["bits_total"] += round(bit_amt * 0.01, 2) * multiplier
-                    users[user_to_edit]["num_bits"] += bit_amt * multiplier
+                    add_contribution(delta, "bits", bit_amt * multiplier)
                     st.success(f"{operation_type}ed {bit_amt} bits to {user_to_edit}")
 
                 elif choice == "Dono":
-                    dono_amt = st.session_state.edit_dono_amt
-                    
-                    users[user_to_edit]["donos"] += round(dono_amt, 2) * multiplier
-                    st.success(f"{operation_type}ed ${dono_amt:.2f} donation to {user_to_edit}")
+                    dono_amt = to_cents(st.session_state.edit_dono_amt)
+                    add_contribution(delta, "dono", dono_amt * multiplier)
+                    st.success(f"{operation_type}ed {format_dollars(dono_amt)} donation to {user_to_edit}")
 
                 # --- Common Post-Submission Logic ---
-                data = users[user_to_edit]
-                data["monetary_total"] = round(
-                    data["resub_total"] + data["gifted_subs_total"] + data["bits_total"] + data["donos"], 
-                    2
-                )
-                
-                save_users(users)
+                if choice != "Resub":
+                    add_delta(user_to_edit, delta) # also recalculates the monetary total and bump status
                 st.session_state.editing_user = None 
                 st.session_state.pop("manage_user_select", None)
                 st.session_state.pop("edit_contrib_choice", None)
                 st.rerun()
+    redraw_if_users_changed()
+
+# --- Manage Existing Users (Only show if users exist) ---
+# Picking a user only reruns this panel (and the two editors inside it)
+@st.fragment
+def manage_users_panel():
+    users = follow_storage()
+    if users:
+        st.subheader("Manage Existing Users")
+
+        # Variable to hold selected user from the selectbox
+        selected_user = None
+
+        user_list = [""] + list(users.keys())
+        # Reset the selection to a valid state if needed
+        default_index = user_list.index(st.session_state.get("manage_user_select", "")) if st.session_state.get("manage_user_select") in user_list else 0
+    
+        selected_user = st.selectbox(
+            "Choose a user", 
+            user_list, 
+            key="manage_user_select", 
+            format_func=lambda x: "Select a user" if x == "" else x,
+            index=default_index
+        )
+    
+        # --- Show Status and Buttons if a user is selected and not currently editing contributions ---
+        if selected_user and st.session_state.editing_user is None: 
+            user_data = users[selected_user] # Get the selected user's data
+        
+            # 1. Status Management Buttons
+            col_edit_status, col_edit_contrib, col_delete = st.columns([1, 1, 1])
+
+            with col_edit_status:
+                # Button to open the Song Status editor
+                if st.button("**Edit Song Played Status**", key="change_song_status_btn", use_container_width=True):
+                    st.session_state.editing_song_status = selected_user # the form is drawn below in this same run
+
+            with col_edit_contrib:
+                if st.button("Edit Contributions", key="edit_user_btn", use_container_width=True):
+                    st.session_state.editing_user = selected_user
+                    st.rerun() 
+
+            with col_delete:
+                if st.button("Delete User", key="delete_user_btn", use_container_width=True, type="primary"):
+                    remove_user(selected_user)
+                    st.warning(f"{selected_user} has been deleted.")
+                    st.session_state.editing_user = None
+                    st.session_state.editing_song_status = None
+                    st.session_state["manage_user_select"] = "" # Reset selection
+                    st.rerun()
+        
+            st.markdown("---") # Separator below buttons
+
+        song_status_editor()
+        contribution_editor()
+    redraw_if_users_changed()
+
+manage_users_panel()
+
+profiler.lap("manage_users")
+
+# --- Undo / Redo ---
+with st.expander("↩️ Undo / Redo", expanded=False):
+    history_result = st.session_state.pop("history_result", None)
+    if history_result:
+        st.success(history_result)
+
+    col_undo, col_redo = st.columns([1, 1])
+    with col_undo:
+        next_undo = history.next_undo(mod_id()) # only this mod's own changes
+        undo_label = next_undo.label if next_undo else None
+        if st.button(f"Undo: {undo_label}" if undo_label else "Nothing to undo", key="undo_btn",
+                     disabled=undo_label is None, use_container_width=True):
+            action = history.undo(mod_id())
+            if action is not None:
+                st.session_state["history_result"] = f"Undid: {action.label}"
+            st.rerun()
+    with col_redo:
+        next_redo = history.next_redo(mod_id())
+        redo_label = next_redo.label if next_redo else None
+        if st.button(f"Redo: {redo_label}" if redo_label else "Nothing to redo", key="redo_btn",
+                     disabled=redo_label is None, use_container_width=True):
+            action = history.redo(mod_id())
+            if action is not None:
+                st.session_state["history_result"] = f"Redid: {action.label}"
+            st.rerun()
+
+    recent_actions = history.recent(10)
+    if recent_actions:
+        st.caption("Latest changes: " + " · ".join(
+            f"{datetime.datetime.fromtimestamp(action.time).strftime('%H:%M:%S')} {action.label}"
+            + (" (you)" if action.owner == mod_id() else "") for action in recent_actions
+        ))
+
+    # Point in time: rebuilt from the nearest checkpoint, then written back as one undoable change
+    restore_time = st.time_input("Put the leaderboard back as it was at", value=None, step=60, key="restore_time")
+    if restore_time is not None:
+        now = datetime.datetime.now()
+        restore_at = datetime.datetime.combine(now.date(), restore_time)
+        if restore_at > now:
+            restore_at -= datetime.timedelta(days=1) # streams run past midnight
+        past_users = history.state_at(restore_at.timestamp())
+        past_total = sum(data["monetary_total"] for data in past_users.values())
+        st.caption(f"At {restore_at:%H:%M}: {len(past_users)} users, {format_dollars(past_total)} total.")
+        if st.button(f"Restore to {restore_at:%H:%M}", key="restore_btn"):
+            history.restore(restore_at.timestamp(), owner=mod_id())
+            st.session_state["history_result"] = f"Restored the leaderboard to {restore_at:%H:%M} (undo puts it back)."
+            st.session_state.pop("restore_time", None)
+            st.rerun()
+
+profiler.lap("history")
 
 # --- Display Grand Totals ---
-if users:
-    st.markdown("---")
-    st.subheader("📊 Grand Totals")
+# No widgets of its own, so form and leaderboard interactions never redraw it
+@st.fragment
+def grand_totals_panel():
+    users = follow_storage()
+    grand_totals = get_totals().values
+    if users:
+        st.markdown("---")
+        st.subheader("📊 Grand Totals")
     
-    # 1. Calculate Grand Total Status
-    total_subs_count = int(grand_totals['total_subs_count'])
-    stream_sub_goal = 20 # Define the goal here for clarity
-    is_goal_reached = total_subs_count >= stream_sub_goal
+        # 1. Calculate Grand Total Status
+        total_subs_count = int(grand_totals['total_subs_count'])
+        stream_sub_goal = analytics.SUB_GOAL # also what archived streams are measured against
+        is_goal_reached = total_subs_count >= stream_sub_goal
     
-    if is_goal_reached:
-        status_color = '#FFD700' # Gold for Success
-        subs_needed_line = f'Stream Sub Goal Reached! 🎉'
-    else:
-        subs_needed = stream_sub_goal - total_subs_count
-        status_color = '#FFFFFF' # Default color
-        subs_needed_line = f'Need <b>{subs_needed}</b> more!'
+        if is_goal_reached:
+            status_color = '#FFD700' # Gold for Success
+            subs_needed_line = f'Stream Sub Goal Reached! 🎉'
+        else:
+            subs_needed = stream_sub_goal - total_subs_count
+            status_color = '#FFFFFF' # Default color
+            subs_needed_line = f'Need <b>{subs_needed}</b> more!'
 
-    # 2. Compile the Grand Contribution String (RAW AMOUNTS with singular/plural)
-    grand_contribution_parts = []
+        # 2. Compile the Grand Contribution String (RAW AMOUNTS with singular/plural)
+        grand_contribution_parts = []
     
-    # Gifted Subs
-    if grand_totals['total_gifted_subs_count'] > 0:
-        count = grand_totals['total_gifted_subs_count']
-        word = "gifted sub" if count == 1 else "gifted subs"
-        grand_contribution_parts.append(f"{count} {word}")
+        # Gifted Subs
+        if grand_totals['total_gifted_subs_count'] > 0:
+            count = grand_totals['total_gifted_subs_count']
+            word = "gifted sub" if count == 1 else "gifted subs"
+            grand_contribution_parts.append(f"{count} {word}")
         
-    # Resubs
-    if grand_totals['total_resubs_count'] > 0:
-        count = grand_totals['total_resubs_count']
-        word = "resub" if count == 1 else "resubs"
-        grand_contribution_parts.append(f"{count} {word}")
+        # Resubs
+        if grand_totals['total_resubs_count'] > 0:
+            count = grand_totals['total_resubs_count']
+            word = "resub" if count == 1 else "resubs"
+            grand_contribution_parts.append(f"{count} {word}")
         
-    # Bits
-    if grand_totals['total_bits_amount'] > 0:
-        count = grand_totals['total_bits_amount']
-        word = "bit" if count == 1 else "bits"
-        grand_contribution_parts.append(f"{count:,} {word}") 
+        # Bits
+        if grand_totals['total_bits_amount'] > 0:
+            count = grand_totals['total_bits_amount']
+            word = "bit" if count == 1 else "bits"
+            grand_contribution_parts.append(f"{count:,} {word}") 
         
-    # Donations
-    if grand_totals['total_donos'] > 0:
-        grand_contribution_parts.append(f"${grand_totals['total_donos']:.2f} in donos") 
+        # Donations
+        if grand_totals['total_donos'] > 0:
+            grand_contribution_parts.append(f"{format_dollars(grand_totals['total_donos'])} in donos") 
 
-    grand_contribution_string = ", ".join(grand_contribution_parts).capitalize()
-    if not grand_contribution_string:
-        grand_contribution_string = "No contributions recorded."
+        grand_contribution_string = ", ".join(grand_contribution_parts).capitalize()
+        if not grand_contribution_string:
+            grand_contribution_string = "No contributions recorded."
 
-    # 3. Display in a single line (using flexbox for left/right alignment)
-    total_monetary = f"${grand_totals['total_monetary']:.2f}"
+        # 3. Display in a single line (using flexbox for left/right alignment)
+        total_monetary = format_dollars(grand_totals['total_monetary'])
     
-    st.markdown(f"""
-    <div style="display: flex; justify-content: space-between; align-items: center;">
-        <span>
-            Total value: <b>{total_monetary}</b> | Subs: <span style="color: {status_color};"><b>{total_subs_count}</b> /{stream_sub_goal} - {subs_needed_line}</span>
-        </span>
-        <span style="flex-shrink: 0; margin-left: 10px;">
-            <i style="color: gray;">{grand_contribution_string}</i>
-        </span>
-    </div>
-    """, unsafe_allow_html=True)
-
-    st.markdown("---")
-
-    # Display detailed revenue breakdown in an expander
-    with st.expander("Detailed Revenue Breakdown"):
         st.markdown(f"""
-        * Total Resubs (Value): ${grand_totals['total_resubs_value']:.2f}
-        * Total Gifted Subs (Value): ${grand_totals['total_gifted_subs_value']:.2f}
-        * Total Donations: ${grand_totals['total_donos']:.2f}
-        * Total Bits (Amount): {grand_totals['total_bits_amount']:,}
-        ---
-        * Tier 1 Subs Gifted: {grand_totals['total_tier1']}
-        * Tier 2 Subs Gifted: {grand_totals['total_tier2']}
-        * Tier 3 Subs Gifted: {grand_totals['total_tier3']}
-        """)
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <span>
+                Total value: <b>{total_monetary}</b> | Subs: <span style="color: {status_color};"><b>{total_subs_count}</b> /{stream_sub_goal} - {subs_needed_line}</span>
+            </span>
+            <span style="flex-shrink: 0; margin-left: 10px;">
+                <i style="color: gray;">{grand_contribution_string}</i>
+            </span>
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("---")
+
+        # Display detailed revenue breakdown in an expander
+        with st.expander("Detailed Revenue Breakdown"):
+            st.markdown(f"""
+            * Total Resubs (Value): {format_dollars(grand_totals['total_resubs_value'])}
+            * Total Gifted Subs (Value): {format_dollars(grand_totals['total_gifted_subs_value'])}
+            * Total Donations: {format_dollars(grand_totals['total_donos'])}
+            * Total Bits (Amount): {grand_totals['total_bits_amount']:,}
+            ---
+            * Tier 1 Subs Gifted: {grand_totals['total_tier1']}
+            * Tier 2 Subs Gifted: {grand_totals['total_tier2']}
+            * Tier 3 Subs Gifted: {grand_totals['total_tier3']}
+            """)
+    redraw_if_users_changed()
+
+grand_totals_panel()
+
+profiler.lap("totals_panel")
+
+# --- Bulk Import ---
+st.subheader("Bulk Import")
+
+with st.expander("Import Activity Feed Export (CSV / JSONL)", expanded=False):
+    # Result of the last import survives the rerun that refreshes the leaderboard
+    import_result = st.session_state.pop("bulk_import_result", None)
+    if import_result:
+        st.success(import_result)
+
+    st.caption("One contribution per row with user, type (sub, resub, subgift, bits, dono), tier and amount columns.")
+    uploaded_export = st.file_uploader("Activity export", type=["csv", "jsonl", "ndjson"], key="bulk_import_file")
+
+    if uploaded_export is not None and st.button("Import Contributions", key="bulk_import_btn", type="primary"):
+        with history.action(f"Import {uploaded_export.name}", owner=mod_id()): # one undo takes back the whole file
+            st.session_state["bulk_import_result"] = str(import_upload(get_storage(), uploaded_export))
+        st.rerun()
+
+# --- Share with Other Mods ---
+st.subheader("Share with Other Mods")
+
+with st.expander("Spreadsheet Export (CSV / Excel)", expanded=False):
+    exporter = get_exporter()
+    export_on = st.toggle(
+        f"Keep {EXPORT_DIR}/leaderboard.csv, totals.csv and leaderboard.xlsx up to date",
+        value=exporter.running, key="export_toggle",
+    )
+    if export_on and not exporter.running:
+        exporter.start()
+    elif not export_on and exporter.running:
+        exporter.stop(timeout=0) # the thread finishes its last export on its own
+
+    st.caption(
+        "Written in the background a moment after the last change, never while you wait. "
+        "Put the folder in a shared drive to let other mods follow along."
+    )
+    st.caption(
+        "For an OBS browser source, run `python -m songbump.overlay` next to the app and add "
+        "http://127.0.0.1:8765/ (it reads the same files and never reruns this page)."
+    )
+    if exporter.stopping:
+        st.caption("Stopping after the last export is written.")
+    if exporter.last_export is not None:
+        st.caption(f"Last export at {datetime.datetime.fromtimestamp(exporter.last_export):%H:%M:%S} "
+                   f"({exporter.exports} exports for {exporter.changes} changes).")
+    for sink, error in list(exporter.errors.items()):
+        st.error(f"{sink}: {error} (retrying)")
+
+    for file_name, mime in (("leaderboard.csv", "text/csv"),
+                            ("leaderboard.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")):
+        path = os.path.join(EXPORT_DIR, file_name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                st.download_button(f"Download {file_name}", f.read(), file_name=file_name, mime=mime, key=f"download_{file_name}")
 
 # --- Clear All Users ---
 st.subheader("Clear All Users")
 
 with st.expander("Clear All Data", expanded=False):
+    # Result of the last clear survives the rerun that empties the leaderboard
+    clear_result = st.session_state.pop("clear_result", None)
+    if clear_result:
+        st.success(clear_result)
+
     with st.form("clear_all_form"):
         confirm_clear = st.checkbox("I confirm I want to permanently delete all users", key="clear_confirm")
+        archive_first = st.checkbox("Archive this stream first (kept in Stream History)", value=True, key="clear_archive")
+        stream_label = st.text_input("Stream label (optional)", key="clear_label")
         submitted = st.form_submit_button("Clear All Users")
 
         if submitted:
             if confirm_clear:
-                users.clear()
-                save_users(users)
+                if archive_first and users:
+                    stream_id = archive_session(get_storage(), stream_label.strip())
+                    st.session_state["clear_result"] = f"Stream archived as {stream_id}, all users have been cleared."
+                clear_users()
                 st.warning("All users have been cleared.")
                 st.session_state.editing_user = None # Clear edit state
                 st.session_state.current_new_user = None # Clear add state
@@ -710,19 +897,109 @@ with st.expander("Clear All Data", expanded=False):
             else:
                 st.info("Please confirm before clearing all users.")
 
+# --- Stream History ---
+st.subheader("Stream History")
+
+# The archive panels only read, so typing a name or changing a period reruns just the panel
+@st.fragment
+def stream_history_panel():
+    with st.expander("Look Up a Chatter's Past Streams", expanded=False):
+        archive = get_archive()
+        latest = archive.streams(limit=1)
+        if not latest:
+            st.caption("No archived streams yet. Clearing all users with \"Archive this stream first\" ticked adds one.")
+        else:
+            st.caption(f"Latest archived stream: {latest[0]['id']} {latest[0]['label']}")
+            col_name, col_last = st.columns([2, 1])
+            with col_name:
+                history_name = st.text_input("Chatter", key="history_name").strip()
+            with col_last:
+                history_last = st.number_input("Last N streams", min_value=1, max_value=1000, value=30, step=1, key="history_last")
+
+            if history_name:
+                # Answered from the index, no archive is opened
+                past_streams = archive.user_history(history_name, history_last)
+                history_total = sum(row["monetary_total"] for row in past_streams)
+                st.markdown(
+                    f"**{history_name}** gave **{format_dollars(history_total)}** "
+                    f"in {len(past_streams)} of the last {history_last} streams."
+                )
+                if past_streams:
+                    st.dataframe(
+                        [
+                            {
+                                "Stream": row["stream_id"],
+                                "Label": row["label"],
+                                "Total ($)": row["monetary_total"] / 100,
+                                "Gifted Subs": row["gifted_subs_count"],
+                                "Bits": row["num_bits"],
+                                "Donos ($)": row["donos"] / 100,
+                            }
+                            for row in past_streams
+                        ],
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config={
+                            "Total ($)": st.column_config.NumberColumn(format="$%.2f"),
+                            "Donos ($)": st.column_config.NumberColumn(format="$%.2f"),
+                        },
+                    )
+
+@st.fragment
+def analytics_panel():
+    with st.expander("Weekly / Monthly Analytics", expanded=False):
+        # Precomputed rollups, updated whenever a stream is archived
+        archive = get_archive()
+        col_period, col_last = st.columns([2, 1])
+        with col_period:
+            period = st.radio("Group by", analytics.PERIODS, format_func=str.capitalize, horizontal=True, key="analytics_period")
+        with col_last:
+            period_last = st.number_input("Last N", min_value=1, max_value=104, value=8, step=1, key="analytics_last")
+
+        revenue_rows = analytics.revenue(archive, period, period_last)
+        if not revenue_rows:
+            st.caption("Nothing archived yet.")
+        else:
+            goal_rate = analytics.goal_hit_rate(archive, period, period_last)
+            st.markdown(f"Sub goal ({analytics.SUB_GOAL}) reached in **{goal_rate:.0%}** of these streams.")
+            st.dataframe(
+                [
+                    {
+                        period.capitalize(): row["bucket"],
+                        "Streams": row["streams"],
+                        "Total ($)": row["monetary_total"] / 100,
+                        "Resubs ($)": row["resub_total"] / 100,
+                        "Gifted Subs ($)": row["gifted_subs_total"] / 100,
+                        "Bits ($)": row["bits_total"] / 100,
+                        "Donos ($)": row["donos"] / 100,
+                        "Sub Goal Hit": f"{row['goal_hits']}/{row['streams']}",
+                    }
+                    for row in revenue_rows
+                ],
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    column: st.column_config.NumberColumn(format="$%.2f")
+                    for column in ("Total ($)", "Resubs ($)", "Gifted Subs ($)", "Bits ($)", "Donos ($)")
+                },
+            )
+
+            supporter_bucket = st.selectbox(
+                "Top supporters of", [row["bucket"] for row in revenue_rows], key="analytics_bucket"
+            )
+            for rank, row in enumerate(analytics.top_supporters(archive, period, supporter_bucket), start=1):
+                st.markdown(f"{rank}. **{row['name']}** {format_dollars(row['monetary_total'])} in {row['streams']} streams")
+
+stream_history_panel()
+analytics_panel()
+
 st.subheader("Song Bump Rules")
 with st.expander("View Contribution Tiers and Bump Rules"):
-    st.markdown("""
-    A user is considered **Bumpable (🟢)** if they meet **ANY** of the following contribution thresholds:
-
-    * **Tier 2 Resub** or **Tier 3 Resub** is active.
-    * **Total Contributions** exceed **$5.99** (more than a Tier 1 Sub).
-    * **Bits** total **500** or more.
-    * **Donations** total **$5.00** or more.
-    * **Gifted Subs Count** is **2** or more (at any tier).
-    * **Gifted Tier 2** subs total **1** or more.
-    * **Gifted Tier 3** subs total **1** or more.
-    """)
+    # The rules are read from bump_rules.json, so this list always matches what is enforced
+    st.markdown(
+        "A user is considered **Bumpable (🟢)** if they meet **ANY** of the following contribution thresholds:\n\n"
+        + get_rules().describe()
+    )
 
 st.markdown("---")
 
@@ -739,4 +1016,20 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# -----------------------------------------------------------
\ No newline at end of file
+# -----------------------------------------------------------
+profiler.lap("import_clear_rules")
+
+# --- Debug panel (only shown while profiling) ---
+if profiler.enabled:
+    report = profiler.finish()
+    with st.expander("🛠 Debug: rerun timings", expanded=False):
+        st.checkbox("Capture cProfile on every rerun", key="debug_cprofile")
+        st.markdown(f"Last rerun took **{report['total_ms']:.1f} ms** (also appended to `{profiling.TRACE_FILE}`)")
+        st.table({"Phase": list(report["phases_ms"]), "ms": list(report["phases_ms"].values())})
+        st.markdown("**Storage this rerun**")
+        st.table({"Counter": list(report["storage"]), "Value": list(report["storage"].values())})
+        row_cache = get_row_cache()
+        st.caption(f"Row cache: {len(row_cache)} rows, {row_cache.hits} hits and {row_cache.misses} rebuilds since the server started")
+        if "profile_top" in report:
+            st.caption(f"cProfile saved to {report['profile']}")
+            st.code(report["profile_top"])
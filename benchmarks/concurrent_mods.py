@@ -0,0 +1,126 @@
+"""Load test: many moderators editing the same users at once.
+
+Starts several processes (think: Streamlit servers, the importer, the live
+ingest), each with a few threads sharing one storage the way Streamlit
+sessions do. Every thread adds random bits, donos and gifted subs to a small
+pool of users, so most writes collide with someone else's. At the end a
+fresh storage is opened and every user's totals are checked against what
+the threads say they added. Any difference is a lost contribution.
+
+    python benchmarks/concurrent_mods.py
+    python benchmarks/concurrent_mods.py --storage sqlite --processes 5 --threads 4 --edits 500
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from songbump.contributions import add_contribution, apply_delta, empty_delta # noqa: E402
+from songbump.storage import open_storage # noqa: E402
+
+CHECKED_FIELDS = ("num_bits", "donos", "gifted_subs_count", "gifted_subs_total")
+
+
+def _paths(folder):
+    return {
+        "snapshot_path": os.path.join(folder, "users.json"),
+        "journal_path": os.path.join(folder, "users.journal.jsonl"),
+        "db_path": os.path.join(folder, "users.db"),
+    }
+
+
+def random_delta(rng):
+    delta = empty_delta()
+    kind = rng.choice(("bits", "dono", "gifted"))
+    if kind == "bits":
+        add_contribution(delta, "bits", rng.randint(1, 500))
+    elif kind == "dono":
+        add_contribution(delta, "dono", rng.randint(1, 2000))
+    else:
+        add_contribution(delta, "gifted", rng.randint(1, 5), rng.randint(1, 3))
+    return delta
+
+
+def run_process(backend, folder, worker, threads, edits, user_count, results):
+    """One process: several session threads sharing one storage."""
+    storage = open_storage(backend, **_paths(folder))
+    added = {}
+    lock = threading.Lock()
+
+    def session(seed):
+        rng = random.Random(seed)
+        for _ in range(edits):
+            name = f"user{rng.randrange(user_count)}"
+            delta = random_delta(rng)
+            storage.update(name, lambda data: apply_delta(data, delta))
+            with lock:
+                totals = added.setdefault(name, dict.fromkeys(CHECKED_FIELDS, 0))
+                for field in CHECKED_FIELDS:
+                    totals[field] += delta[field]
+
+    sessions = [threading.Thread(target=session, args=(worker * 1000 + i,)) for i in range(threads)]
+    for thread in sessions:
+        thread.start()
+    for thread in sessions:
+        thread.join()
+    results.put((added, storage.conflicts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent moderator load test.")
+    parser.add_argument("--storage", choices=("journal", "sqlite"), default="journal")
+    parser.add_argument("--processes", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=2, help="session threads per process")
+    parser.add_argument("--edits", type=int, default=200, help="edits per thread")
+    parser.add_argument("--users", type=int, default=10, help="size of the user pool (smaller = more conflicts)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        open_storage(args.storage, **_paths(folder)) # create the files before the workers race for them
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=run_process,
+                args=(args.storage, folder, worker, args.threads, args.edits, args.users, results),
+            )
+            for worker in range(args.processes)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        reports = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        expected = {}
+        conflicts = 0
+        for added, retried in reports:
+            conflicts += retried
+            for name, totals in added.items():
+                merged = expected.setdefault(name, dict.fromkeys(CHECKED_FIELDS, 0))
+                for field in CHECKED_FIELDS:
+                    merged[field] += totals[field]
+
+        users = open_storage(args.storage, **_paths(folder)).users
+        lost = 0
+        for name, totals in expected.items():
+            for field in CHECKED_FIELDS:
+                if users.get(name, {}).get(field, 0) != totals[field]:
+                    lost += 1
+                    print(f"MISMATCH {name}.{field}: stored {users.get(name, {}).get(field)}, added {totals[field]}")
+
+    edits = args.processes * args.threads * args.edits
+    print(f"{args.storage}: {edits} edits by {args.processes * args.threads} sessions in {elapsed:.2f}s "
+          f"({edits / elapsed:.0f} edits/s, {conflicts} merged conflicts, {lost} lost)")
+    sys.exit(1 if lost else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,609 @@
+"""Benchmark suite for the CLI and Streamlit hot paths.
+
+Every case runs on the same synthetic stream (benchmarks/synthetic.py,
+10k chatters and 200k events with hype trains by default) and is timed
+best-of-N. Results go to a JSON file tagged with the git commit, so two
+runs can be compared:
+
+    python benchmarks/run.py                          # everything -> bench_results.json
+    python benchmarks/run.py --quick                  # 2k chatters, 20k events
+    python benchmarks/run.py --only cli,render        # just some groups
+    python benchmarks/run.py --output new.json --compare bench_results.json
+
+Groups:
+
+    cli       update_contributions driven by scripted input, batch mode on the whole stream, print_users_by_total
+    render    songbump.core.describe for every user, cold and through the render cache
+    recompute grand totals and leaderboard: full rebuild, the old loop-and-sort, one-user updates, pages,
+              and the Next Up panel: filtering the board vs. the bump queue
+    storage   journal, SQLite and binary snapshot reads and writes
+    import    streaming CSV import of the whole stream
+    analytics a year of daily streams rolled up one by one, then the weekly/monthly queries
+    history   recording every change of a 50k-event session, undoing a bulk entry, state as of any time
+    export    what the spreadsheet exporter costs the writer's thread, and one CSV + XLSX export
+    overlay   HTTP overlay server: full and 304 responses over keep-alive, idle storage polls
+    apptest   full Streamlit script runs through AppTest (cold and warm rerun)
+"""
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import synthetic # noqa: E402
+
+from songbump.money import dollars # noqa: E402
+
+APP_SCRIPT = "MonetaryLeaderboardStreamlitVersion-v2.py"
+APP_FILES = (APP_SCRIPT, "bump_rules.json", "background.jpg", "songbump", ".streamlit")
+DEFAULT_OUTPUT = "bench_results.json"
+SLOWER = 1.2 # --compare flags anything this much slower
+
+BENCHMARKS = {} # group -> function(ctx) yielding (name, seconds list, ops)
+
+
+def benchmark(group):
+    def register(fn):
+        BENCHMARKS[group] = fn
+        return fn
+    return register
+
+
+def timed(fn, repeat):
+    """Runs fn() repeat times and returns the wall times."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+class Context:
+    """The synthetic stream and everything derived from it, shared by every group."""
+
+    def __init__(self, chatters, events, repeat, seed):
+        self.repeat = repeat
+        self.events = synthetic.stream(chatters, events, seed)
+        self.users = synthetic.users_from_stream(self.events)
+        self.rng = random.Random(seed)
+        self.tmp = tempfile.mkdtemp(prefix="songbump-bench-")
+
+    def fresh_dir(self, name):
+        path = os.path.join(self.tmp, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return path
+
+    def copy_users(self):
+        return {name: dict(data) for name, data in self.users.items()}
+
+
+# --- CLI ---
+def _cli_inputs(events):
+    """The keystrokes a mod would type into update_contributions for each user, in stream order."""
+    script = {}
+    for user, kind, amount, tier in events:
+        keys = script.setdefault(user, [])
+        if kind == "resub":
+            keys += ["r", str(tier)]
+        elif kind == "gifted":
+            keys += ["g", str(amount), str(tier)]
+        elif kind == "bits":
+            keys += ["b", str(amount)]
+        else:
+            keys += ["d", dollars(amount)]
+    return script
+
+
+@benchmark("cli")
+def bench_cli(ctx):
+    import MonetaryLeaderboard as cli
+
+    events = ctx.events[:20000] # typing 200k contributions by hand is not a realistic session
+    script = _cli_inputs(events)
+
+    def enter_everything():
+        cli.clear_all()
+        for user, keys in script.items():
+            answers = iter(keys + ["q"])
+            builtins.input = lambda prompt="": next(answers)
+            cli.add_user(user)
+
+    real_input = builtins.input
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            times = timed(enter_everything, ctx.repeat)
+    finally:
+        builtins.input = real_input
+    yield "cli.update_contributions", times, len(events)
+
+    from songbump import batch
+
+    lines = [batch.command_line(*event) for event in ctx.events]
+
+    def run_batch():
+        cli.clear_all()
+        batch.run(cli.session, lines)
+
+    yield "cli.batch", timed(run_batch, ctx.repeat), len(lines)
+
+    cli.clear_all()
+    cli.session.put_many(ctx.copy_users())
+
+    def print_all():
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.print_users_by_total()
+
+    def print_all_cold():
+        cli.leaderboard_lines.reset(cli.users) # as if every user had just changed
+        print_all()
+
+    yield "cli.print_users_by_total_cold", timed(print_all_cold, ctx.repeat), len(cli.users)
+    yield "cli.print_users_by_total", timed(print_all, ctx.repeat), len(cli.users)
+
+
+# --- Rendering ---
+@benchmark("render")
+def bench_render(ctx):
+    from songbump.core import Contributor, describe
+
+    rows = [Contributor.from_row(name, data) for name, data in ctx.users.items()]
+
+    def render_all():
+        for data in rows:
+            describe(data)
+
+    yield "render.describe", timed(render_all, ctx.repeat), len(rows)
+
+    from songbump.render_cache import RenderCache
+
+    cache = RenderCache(lambda name, data: describe(data))
+    cache.reset(ctx.users)
+
+    def render_cached():
+        for data in rows:
+            cache.get(data.name, data)
+
+    render_cached() # warm, like every rerun after the first
+    yield "render.describe_cached", timed(render_cached, ctx.repeat), len(rows)
+
+
+# --- Recompute ---
+@benchmark("recompute")
+def bench_recompute(ctx):
+    from songbump.leaderboard import LeaderboardIndex
+    from songbump.totals import GrandTotals, empty_totals
+
+    users = ctx.users
+
+    def full_rebuild():
+        GrandTotals().reset(users)
+        LeaderboardIndex().reset(users)
+
+    old_rows = {name: dict(data) for name, data in users.items()} # the old loop writes into every row
+
+    def loop_and_sort():
+        # What every rerun used to do, line for line: recompute each user's total and bump
+        # status, add up the grand totals, then sort them all (thresholds in cents here)
+        totals = empty_totals()
+        for name, data in old_rows.items():
+            total = round(
+                data["resub_total"] + data["gifted_subs_total"] + data["bits_total"] + data["donos"], 2
+            )
+            bump_status = (
+                data["num_bits"] >= 500
+                or data["resub_tier"] >= 2
+                or data["gifted_subs_count"] >= 2
+                or data["donos"] >= 500
+                or data["tier2"] >= 1
+                or data["tier3"] >= 1
+                or total > 599
+            )
+            sub_count = (1 if data["resub_tier"] > 0 else 0) + data["gifted_subs_count"]
+            data["monetary_total"] = total
+            data["bumpable"] = bump_status
+            totals["total_monetary"] += total
+            totals["total_resubs_value"] += data["resub_total"]
+            totals["total_gifted_subs_value"] += data["gifted_subs_total"]
+            totals["total_donos"] += data["donos"]
+            totals["total_bits_value"] += data["bits_total"]
+            totals["total_bits_amount"] += data["num_bits"]
+            totals["total_subs_count"] += sub_count
+            totals["total_gifted_subs_count"] += data["gifted_subs_count"]
+            if data["resub_tier"] > 0:
+                totals["total_resubs_count"] += 1
+            totals["total_tier1"] += data["tier1"]
+            totals["total_tier2"] += data["tier2"]
+            totals["total_tier3"] += data["tier3"]
+        sorted(old_rows.items(), key=lambda item: item[1]["monetary_total"], reverse=True)
+
+    yield "recompute.full_rebuild", timed(full_rebuild, ctx.repeat), len(users)
+    yield "recompute.loop_and_sort", timed(loop_and_sort, ctx.repeat), len(users)
+
+    totals = GrandTotals()
+    totals.reset(users)
+    leaderboard = LeaderboardIndex()
+    leaderboard.reset(users)
+    names = ctx.rng.choices(list(users), k=1000)
+
+    def one_user_updates():
+        for name in names:
+            data = dict(users[name])
+            data["donos"] += 500
+            data["monetary_total"] += 500
+            totals.update(name, data)
+            leaderboard.update(name, data)
+
+    yield "recompute.one_user_update", timed(one_user_updates, ctx.repeat), len(names)
+
+    offsets = [ctx.rng.randrange(max(len(users) - 25, 1)) for _ in range(1000)]
+
+    def pages():
+        for offset in offsets:
+            leaderboard.page(offset, 25)
+
+    yield "recompute.leaderboard_page", timed(pages, ctx.repeat), len(offsets)
+
+    from songbump.bump_queue import BumpQueue, waiting
+
+    def next_up_scan():
+        # What finding the next bumps used to take: every bumpable, unplayed user, sorted
+        waiting_users = [name for name, data in users.items() if waiting(data)]
+        sorted(waiting_users, key=lambda name: users[name]["monetary_total"], reverse=True)[:5]
+
+    queue = BumpQueue()
+    queue.reset(users)
+
+    def queue_updates():
+        for name in names:
+            data = dict(users[name])
+            data["donos"] += 500
+            data["monetary_total"] += 500
+            queue.update(name, data)
+        for _ in range(100):
+            queue.peek(5)
+
+    yield "recompute.next_up_scan", timed(next_up_scan, ctx.repeat), 1
+    yield "recompute.bump_queue_reset", timed(lambda: BumpQueue().reset(users), ctx.repeat), len(users)
+    yield "recompute.bump_queue_update_and_peek", timed(queue_updates, ctx.repeat), len(names) + 100
+
+
+# --- Storage ---
+@benchmark("storage")
+def bench_storage(ctx):
+    from songbump import binary_snapshot
+    from songbump.journal import Journal
+    from songbump.sqlite_store import SQLiteStorage
+
+    names = ctx.rng.choices(list(ctx.users), k=200)
+
+    def single_edits(storage):
+        for name in names:
+            storage.update(name, lambda data: data.update(donos=data["donos"] + 100))
+
+    for backend in ("journal", "sqlite"):
+        folder = ctx.fresh_dir(backend)
+        paths = (os.path.join(folder, "users.json"), os.path.join(folder, "users.journal.jsonl"))
+
+        def open_storage():
+            if backend == "journal":
+                return Journal(*paths)
+            return SQLiteStorage(os.path.join(folder, "users.db"), *paths)
+
+        storage = open_storage()
+        yield f"storage.{backend}_put_many", timed(lambda: storage.put_many(ctx.copy_users()), ctx.repeat), len(ctx.users)
+        yield f"storage.{backend}_single_edit", timed(lambda: single_edits(storage), ctx.repeat), len(names)
+        storage.compact()
+        yield f"storage.{backend}_load", timed(open_storage, ctx.repeat), len(ctx.users)
+        yield f"storage.{backend}_sync_idle", timed(storage.sync, ctx.repeat * 100), 1
+
+    folder = ctx.fresh_dir("snapshots")
+    json_path = os.path.join(folder, "users.json")
+    binary_path = os.path.join(folder, "users.bin")
+    users = ctx.users
+
+    def write_json():
+        with open(json_path, "w") as f:
+            json.dump({"schema": 2, "users": users}, f, indent=4)
+
+    def read_json():
+        with open(json_path, "r") as f:
+            json.load(f)
+
+    def open_binary_page():
+        snapshot = binary_snapshot.BinarySnapshot(binary_path)
+        snapshot.page(0, 25)
+        snapshot.close()
+
+    yield "storage.json_snapshot_write", timed(write_json, ctx.repeat), len(users)
+    yield "storage.json_snapshot_read", timed(read_json, ctx.repeat), len(users)
+    yield "storage.binary_snapshot_write", timed(lambda: binary_snapshot.write(binary_path, users), ctx.repeat), len(users)
+    yield "storage.binary_snapshot_open_page", timed(open_binary_page, ctx.repeat), 1
+    yield "storage.binary_snapshot_read_all", timed(lambda: binary_snapshot.read(binary_path), ctx.repeat), len(users)
+
+
+# --- Import ---
+@benchmark("import")
+def bench_import(ctx):
+    from songbump.importer import import_file
+    from songbump.journal import Journal
+
+    folder = ctx.fresh_dir("import")
+    export = os.path.join(folder, "activity.csv")
+    synthetic.write_export(export, ctx.events)
+
+    def import_all():
+        for name in ("users.json", "users.journal.jsonl"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(folder, name))
+        import_file(Journal(os.path.join(folder, "users.json"), os.path.join(folder, "users.journal.jsonl")), export)
+
+    yield "import.csv_stream", timed(import_all, ctx.repeat), len(ctx.events)
+
+
+# --- Analytics ---
+STREAMS_PER_YEAR = 365
+USERS_PER_STREAM = 500
+
+
+@benchmark("analytics")
+def bench_analytics(ctx):
+    from songbump import analytics
+    from songbump.archive import ArchiveIndex
+
+    names = list(ctx.users)
+    day = 86400
+    start = time.mktime((2025, 1, 1, 20, 0, 0, 0, 0, -1))
+    streams = []
+    for number in range(STREAMS_PER_YEAR):
+        users = {name: ctx.users[name] for name in ctx.rng.sample(names, min(USERS_PER_STREAM, len(names)))}
+        meta = {
+            "id": f"stream-{number:03d}",
+            "archived_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start + number * day)),
+            "label": "",
+            "users": len(users),
+            "monetary_total": sum(data["monetary_total"] for data in users.values()),
+            "sub_goal": analytics.SUB_GOAL,
+        }
+        streams.append((meta, users))
+
+    index = None
+
+    def index_year():
+        nonlocal index
+        if index is not None:
+            index.close()
+        index = ArchiveIndex(ctx.fresh_dir("archive"))
+        for meta, users in streams:
+            index.add(meta, users, meta["id"] + ".zip")
+
+    yield "analytics.index_stream", timed(index_year, 1), len(streams)
+
+    def queries():
+        for period in analytics.PERIODS:
+            analytics.revenue(index, period, 12)
+            analytics.goal_hit_rate(index, period, 12)
+            analytics.top_supporters(index, period, limit=10)
+
+    yield "analytics.queries", timed(lambda: [queries() for _ in range(100)], ctx.repeat), 100
+    index.close()
+
+
+# --- History ---
+HISTORY_EVENTS = 50000
+BULK_ENTRY = 5000 # users touched by the bulk entry that gets undone
+
+
+@benchmark("history")
+def bench_history(ctx):
+    from songbump.core import Session
+    from songbump.history import History
+
+    events = (ctx.events * (HISTORY_EVENTS // len(ctx.events) + 1))[:HISTORY_EVENTS]
+
+    def play(session):
+        for user, kind, amount, tier in events:
+            session.update(user, lambda data: data.update(donos=data.donos + amount) if kind == "dono" else data.update(num_bits=data.num_bits + 1))
+
+    yield "history.session_without", timed(lambda: play(Session()), 1), len(events)
+
+    session = Session()
+    history = History(session)
+    started = time.time()
+    yield "history.session_with", timed(lambda: play(session), 1), len(events)
+    ended = time.time()
+
+    bulk = list(session.users)[:BULK_ENTRY]
+    with history.action("bulk entry", owner="bench"):
+        session.update_many({name: (lambda data: data.update(donos=data.donos + 100)) for name in bulk})
+    yield "history.undo_bulk_entry", timed(lambda: history.undo("bench"), 1), len(bulk)
+    yield "history.redo_bulk_entry", timed(lambda: history.redo("bench"), 1), len(bulk)
+
+    moments = [ctx.rng.uniform(started, ended) for _ in range(20)]
+    yield "history.state_at", timed(lambda: [history.state_at(moment) for moment in moments], ctx.repeat), len(moments)
+
+
+# --- Export ---
+@benchmark("export")
+def bench_export(ctx):
+    from songbump.core import Contributor
+    from songbump.exporter import Export, Exporter, file_sinks
+
+    users = {name: Contributor.from_row(name, data) for name, data in ctx.users.items()}
+    names = ctx.rng.choices(list(users), k=10000)
+    exporter = Exporter(file_sinks(ctx.fresh_dir("export")))
+    exporter.reset(users)
+
+    def listener_updates():
+        for name in names:
+            exporter.update(name, users[name])
+
+    yield "export.listener_update", timed(listener_updates, ctx.repeat), len(names)
+    yield "export.build", timed(lambda: Export(users), ctx.repeat), len(users)
+    yield "export.write_csv_xlsx", timed(exporter.flush, ctx.repeat), len(users)
+
+
+# --- Overlay ---
+@benchmark("overlay")
+def bench_overlay(ctx):
+    import http.client
+    import threading
+
+    from songbump.journal import Journal
+    from songbump.overlay import make_server
+
+    folder = ctx.fresh_dir("overlay")
+    with open(os.path.join(folder, "users.json"), "w") as f:
+        json.dump({"schema": 2, "users": ctx.users}, f)
+    storage = Journal(os.path.join(folder, "users.json"), os.path.join(folder, "users.journal.jsonl"), read_only=True)
+    server, feed = make_server(storage, port=0, poll_interval=3600) # polled by hand below
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    requests = 500
+
+    def get(headers):
+        for _ in range(requests):
+            client.request("GET", "/leaderboard.json?top=10", headers=headers)
+            client.getresponse().read()
+
+    try:
+        client.request("GET", "/leaderboard.json?top=10")
+        response = client.getresponse()
+        response.read()
+        etag = response.getheader("ETag")
+        yield "overlay.full_response", timed(lambda: get({}), ctx.repeat), requests
+        yield "overlay.not_modified", timed(lambda: get({"If-None-Match": etag}), ctx.repeat), requests
+        yield "overlay.idle_poll", timed(lambda: [feed.poll() for _ in range(100)], ctx.repeat), 100
+    finally:
+        client.close()
+        feed.stop()
+        server.shutdown()
+        server.server_close()
+
+
+# --- Streamlit ---
+@benchmark("apptest")
+def bench_apptest(ctx):
+    from streamlit import logger as streamlit_logger
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_logger.set_log_level("error") # AppTest runs log bare-mode warnings
+    folder = ctx.fresh_dir("app")
+    for name in APP_FILES:
+        source = os.path.join(ROOT, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(folder, name), ignore=shutil.ignore_patterns("__pycache__"))
+        elif os.path.exists(source):
+            shutil.copy(source, folder)
+    with open(os.path.join(folder, "users.json"), "w") as f:
+        json.dump({"schema": 2, "users": ctx.users}, f)
+
+    cwd = os.getcwd()
+    os.chdir(folder) # the app keeps its data files next to where it runs
+    try:
+        app = AppTest.from_file(os.path.join(folder, APP_SCRIPT), default_timeout=120)
+        cold = timed(app.run, 1)
+        if app.exception:
+            raise RuntimeError(f"App raised: {app.exception[0].message}")
+        yield "apptest.cold_run", cold, 1
+        yield "apptest.rerun", timed(app.run, ctx.repeat), 1
+    finally:
+        os.chdir(cwd)
+
+
+# --- Results ---
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(times, ops):
+    best = min(times)
+    return {
+        "best_s": best,
+        "median_s": statistics.median(times),
+        "runs": len(times),
+        "ops": ops,
+        "per_op_us": best / ops * 1e6 if ops else None,
+    }
+
+
+def compare(results, old_path):
+    with open(old_path, "r") as f:
+        old = json.load(f)
+    print(f"\nCompared with {old_path} (commit {old.get('commit')}):")
+    for name, result in results.items():
+        before = old.get("results", {}).get(name)
+        if not before:
+            continue
+        ratio = result["best_s"] / before["best_s"] if before["best_s"] else float("inf")
+        flag = "  SLOWER" if ratio > SLOWER else ""
+        print(f"  {name:<40} {before['best_s'] * 1000:>10.2f} ms -> {result['best_s'] * 1000:>10.2f} ms  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the song bump tracker on a synthetic stream.")
+    parser.add_argument("--chatters", type=int, default=synthetic.CHATTERS)
+    parser.add_argument("--events", type=int, default=synthetic.EVENTS)
+    parser.add_argument("--seed", type=int, default=synthetic.SEED)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best one counts")
+    parser.add_argument("--quick", action="store_true", help="2k chatters and 20k events")
+    parser.add_argument("--only", help=f"comma-separated groups: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+    if args.quick:
+        args.chatters, args.events = 2000, 20000
+
+    groups = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [group for group in groups if group not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(unknown)}")
+
+    ctx = Context(args.chatters, args.events, args.repeat, args.seed)
+    print(f"{len(ctx.events)} events from {len(ctx.users)} chatters")
+    results = {}
+    try:
+        for group in groups:
+            for name, times, ops in BENCHMARKS[group](ctx):
+                results[name] = summarize(times, ops)
+                result = results[name]
+                print(f"  {name:<40} {result['best_s'] * 1000:>10.2f} ms  ({result['per_op_us']:.2f} us/op)")
+    finally:
+        shutil.rmtree(ctx.tmp, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"chatters": args.chatters, "events": args.events, "seed": args.seed, "repeat": args.repeat},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Synthetic Twitch streams for benchmarks.
+
+A stream is a list of (user, kind, amount, tier) contributions, the same
+tuples songbump.importer works with. A few chatters do most of the giving
+(a Pareto-weighted pick), and every so often a hype train hits: a burst of
+gifted subs and big cheers from a handful of heavy hitters.
+
+    python benchmarks/synthetic.py activity.csv --chatters 10000 --events 200000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from songbump.contributions import apply_delta, new_user # noqa: E402
+from songbump.importer import aggregate # noqa: E402
+
+# --- Stream shape ---
+CHATTERS = 10000
+EVENTS = 200000
+HYPE_TRAIN_EVERY = 5000 # events between hype trains
+HYPE_TRAIN_LENGTH = 600
+SEED = 1
+
+KIND_WEIGHTS = {"bits": 45, "resub": 20, "gifted": 25, "dono": 10}
+GIFT_SIZES = (1, 1, 1, 5, 5, 10, 20, 50)
+CHEERS = (1, 50, 100, 100, 300, 500, 1000, 5000)
+TIER_WEIGHTS = (85, 10, 5)
+
+
+def chatter_names(count):
+    return [f"chatter_{i:05d}" for i in range(count)]
+
+
+def stream(chatters=CHATTERS, events=EVENTS, seed=SEED):
+    """Returns the contribution tuples for one synthetic stream."""
+    rng = random.Random(seed)
+    names = chatter_names(chatters)
+    weights = [rng.paretovariate(1.2) for _ in names]
+    kinds = list(KIND_WEIGHTS)
+    kind_weights = list(KIND_WEIGHTS.values())
+
+    # Pick users in chunks, much faster than one weighted choice per event
+    users = rng.choices(names, weights, k=events)
+    hype_crew = rng.choices(names, weights, k=25)
+    out = []
+    for i, user in enumerate(users):
+        in_hype_train = i % HYPE_TRAIN_EVERY < HYPE_TRAIN_LENGTH and i >= HYPE_TRAIN_EVERY
+        if in_hype_train and rng.random() < 0.6:
+            user = rng.choice(hype_crew)
+            kind = "gifted" if rng.random() < 0.7 else "bits"
+        else:
+            kind = rng.choices(kinds, kind_weights)[0]
+        tier = rng.choices((1, 2, 3), TIER_WEIGHTS)[0]
+        if kind == "gifted":
+            amount = rng.choice(GIFT_SIZES)
+        elif kind == "bits":
+            amount = rng.choice(CHEERS)
+        elif kind == "dono":
+            amount = rng.choice((100, 300, 500, 500, 1000, 2000, 5000)) + rng.choice((0, 0, 0, 99, 50))
+        else:
+            amount = 1
+        out.append((user, kind, amount, tier))
+    return out
+
+
+def users_from_stream(events):
+    """Folds a stream into a users dict, as if every event had been entered."""
+    return {name: apply_delta(new_user(), delta) for name, delta in aggregate(events).items()}
+
+
+def write_export(path, events):
+    """Writes a stream as an activity-feed export the importer reads (CSV or JSONL by extension)."""
+    rows = (
+        {"user": user, "type": kind, "tier": tier, "amount": f"{amount / 100:.2f}" if kind == "dono" else amount}
+        for user, kind, amount, tier in events
+    )
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        else:
+            writer = csv.DictWriter(f, ("user", "type", "tier", "amount"))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic activity-feed export.")
+    parser.add_argument("path", help=".csv or .jsonl")
+    parser.add_argument("--chatters", type=int, default=CHATTERS)
+    parser.add_argument("--events", type=int, default=EVENTS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    write_export(args.path, stream(args.chatters, args.events, args.seed))
+    print(f"Wrote {args.events} events from up to {args.chatters} chatters to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
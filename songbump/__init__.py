@@ -0,0 +1 @@
+"""Shared building blocks for the Twitch Song Bump Calculator front ends."""
@@ -0,0 +1,153 @@
+"""Weekly and monthly rollups over the archived streams.
+
+The archive index (songbump/archive.py) has one row per user per stream.
+Summing that up for every chart would mean scanning a year of streams on
+each rerun, so the index also keeps rollup tables that are updated
+incrementally, in the same transaction that indexes a stream:
+
+    rollups            one row per week and per month: streams, sub goal
+                       hits, subs and revenue by type (the fields of the
+                       "Detailed Revenue Breakdown")
+    supporter_rollups  one row per user per week and per month with what
+                       they gave, for top supporter lists
+    rolled_up          which buckets and sub goal each stream was counted
+                       in, so re-indexing a stream takes its old share back
+                       out first
+
+Weeks are ISO weeks ("2026-W42"), months are "2026-10". Every query reads
+a handful of rows by primary key or index, no matter how many streams
+have been archived.
+"""
+import datetime
+
+PERIODS = ("week", "month")
+SUB_GOAL = 20 # the stream sub goal shown under Grand Totals
+REVENUE = ("monetary_total", "resub_total", "gifted_subs_total", "bits_total", "donos") # cents
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS rollups (period TEXT NOT NULL, bucket TEXT NOT NULL, streams INTEGER NOT NULL, "
+    "goal_hits INTEGER NOT NULL, subs INTEGER NOT NULL, "
+    + ", ".join(f"{column} INTEGER NOT NULL" for column in REVENUE)
+    + ", PRIMARY KEY (period, bucket))",
+    "CREATE TABLE IF NOT EXISTS supporter_rollups (period TEXT NOT NULL, bucket TEXT NOT NULL, "
+    "name TEXT NOT NULL, streams INTEGER NOT NULL, "
+    + ", ".join(f"{column} INTEGER NOT NULL" for column in REVENUE)
+    + ", PRIMARY KEY (period, bucket, name))",
+    "CREATE INDEX IF NOT EXISTS supporters_by_total ON supporter_rollups (period, bucket, monetary_total DESC)",
+    "CREATE TABLE IF NOT EXISTS rolled_up (stream_id TEXT PRIMARY KEY, week TEXT NOT NULL, month TEXT NOT NULL, "
+    "sub_goal INTEGER NOT NULL)",
+]
+
+_ADD = ", ".join(f"{column} = {column} + excluded.{column}" for column in ("streams", "goal_hits", "subs") + REVENUE)
+_ADD_SUPPORTER = ", ".join(f"{column} = {column} + excluded.{column}" for column in ("streams",) + REVENUE)
+_SHARE_SQL = (
+    f"SELECT name, {', '.join(REVENUE)}, (resub_tier > 0) + gifted_subs_count FROM totals WHERE stream_id = ?"
+)
+
+
+def buckets(archived_at):
+    """The (week, month) buckets of a stream archived at an ISO timestamp."""
+    year, week, _ = datetime.date.fromisoformat(archived_at[:10]).isocalendar()
+    return f"{year}-W{week:02d}", archived_at[:7]
+
+
+def stream_subs(users):
+    """Subs towards the sub goal, counted like the Grand Totals do (active resubs plus gifted subs)."""
+    return sum((data["resub_tier"] > 0) + data["gifted_subs_count"] for data in users.values())
+
+
+def _shares(users):
+    return [
+        (name, *(int(data[column]) for column in REVENUE), (data["resub_tier"] > 0) + data["gifted_subs_count"])
+        for name, data in users.items()
+    ]
+
+
+def _apply(db, week, month, sub_goal, shares, sign):
+    """Adds (sign 1) or takes back (sign -1) one stream's shares in both of its buckets."""
+    subs = sum(row[-1] for row in shares)
+    revenue = [sign * sum(row[i] for row in shares) for i in range(1, len(REVENUE) + 1)]
+    goal_hit = int(subs >= sub_goal)
+    for period, bucket in zip(PERIODS, (week, month)):
+        db.execute(
+            f"INSERT INTO rollups VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(REVENUE))}) "
+            f"ON CONFLICT (period, bucket) DO UPDATE SET {_ADD}",
+            (period, bucket, sign, sign * goal_hit, sign * subs, *revenue),
+        )
+        db.executemany(
+            f"INSERT INTO supporter_rollups VALUES (?, ?, ?, ?, {', '.join('?' * len(REVENUE))}) "
+            f"ON CONFLICT (period, bucket, name) DO UPDATE SET {_ADD_SUPPORTER}",
+            [(period, bucket, row[0], sign, *(sign * value for value in row[1:-1])) for row in shares],
+        )
+    if sign < 0:
+        db.execute("DELETE FROM rollups WHERE streams = 0")
+        db.execute("DELETE FROM supporter_rollups WHERE streams = 0")
+
+
+# --- Updates (called by ArchiveIndex inside its write transaction) ---
+def add_stream(db, meta, users):
+    week, month = buckets(meta["archived_at"])
+    sub_goal = meta.get("sub_goal", SUB_GOAL)
+    _apply(db, week, month, sub_goal, _shares(users), 1)
+    db.execute("INSERT INTO rolled_up VALUES (?, ?, ?, ?)", (meta["id"], week, month, sub_goal))
+
+
+def remove_stream(db, stream_id):
+    """Takes a stream back out of the rollups, using its rows in the totals table. Call before those are deleted."""
+    row = db.execute("SELECT week, month, sub_goal FROM rolled_up WHERE stream_id = ?", (stream_id,)).fetchone()
+    if row is None:
+        return
+    _apply(db, *row, db.execute(_SHARE_SQL, (stream_id,)).fetchall(), -1)
+    db.execute("DELETE FROM rolled_up WHERE stream_id = ?", (stream_id,))
+
+
+def clear(db):
+    for table in ("rollups", "supporter_rollups", "rolled_up"):
+        db.execute(f"DELETE FROM {table}")
+
+
+def catch_up(db):
+    """Rolls up indexed streams that aren't in the rollups yet, each against its own sub goal."""
+    missing = db.execute(
+        "SELECT id, archived_at, sub_goal FROM streams WHERE id NOT IN (SELECT stream_id FROM rolled_up) "
+        "ORDER BY archived_at"
+    ).fetchall()
+    for stream_id, archived_at, sub_goal in missing:
+        week, month = buckets(archived_at)
+        _apply(db, week, month, sub_goal, db.execute(_SHARE_SQL, (stream_id,)).fetchall(), 1)
+        db.execute("INSERT INTO rolled_up VALUES (?, ?, ?, ?)", (stream_id, week, month, sub_goal))
+    return len(missing)
+
+
+# --- Queries ---
+def revenue(index, period="week", last=12):
+    """Revenue by type, subs and sub goal hit rate for the last N weeks or months, newest first."""
+    rows = index.query(
+        f"SELECT bucket, streams, goal_hits, subs, {', '.join(REVENUE)} FROM rollups "
+        "WHERE period = ? ORDER BY bucket DESC LIMIT ?",
+        (period, last),
+    )
+    for row in rows:
+        row["goal_rate"] = row["goal_hits"] / row["streams"]
+    return rows
+
+
+def goal_hit_rate(index, period="week", last=12):
+    """Share of streams that reached their sub goal over the last N weeks or months (None without streams)."""
+    rows = revenue(index, period, last)
+    streams = sum(row["streams"] for row in rows)
+    return sum(row["goal_hits"] for row in rows) / streams if streams else None
+
+
+def top_supporters(index, period="week", bucket=None, limit=10):
+    """Biggest supporters of one week or month (the latest one by default), biggest first."""
+    if bucket is None:
+        latest = revenue(index, period, 1)
+        if not latest:
+            return []
+        bucket = latest[0]["bucket"]
+    return index.query(
+        f"SELECT name, streams, {', '.join(REVENUE)} FROM supporter_rollups "
+        "WHERE period = ? AND bucket = ? ORDER BY monetary_total DESC LIMIT ?",
+        (period, bucket, limit),
+    )
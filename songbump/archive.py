@@ -0,0 +1,284 @@
+"""Stream history: one compressed archive per stream plus a lookup index.
+
+Rolling over a session (instead of just clearing it) first archives the
+stream, then clears it:
+
+    archive/<stream id>.zip   meta.json   - id, time, label, user count, total
+                              users.bin   - final state as a binary snapshot
+                              events.jsonl - the change records the storage still
+                                             had (the journal since its last
+                                             compaction, nothing for SQLite)
+    archive/index.db          SQLite: one row per stream (with its sub goal) and one row per user
+                              per stream with their final totals
+
+Questions about past streams ("what did this chatter give in the last 30
+streams") are answered from the index alone, and so are the weekly and
+monthly rollups it keeps (see songbump/analytics.py). The zip files are only opened
+to look at one stream in full, and the index can always be rebuilt from
+them with reindex.
+
+    python -m songbump.archive rollover --label "Friday karaoke"
+    python -m songbump.archive streams
+    python -m songbump.archive user some_chatter --last 30
+    python -m songbump.archive show 2025-11-28_210455 --top 10
+    python -m songbump.archive report --period month
+    python -m songbump.archive reindex
+"""
+import argparse
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+
+from songbump import analytics, binary_snapshot
+from songbump.core import FIELDS
+from songbump.money import format_dollars
+
+ARCHIVE_DIR = "archive"
+INDEX_FILE = "index.db"
+SUFFIX = ".zip"
+LAST_STREAMS = 30 # default window for per-user history
+INDEX_VERSION = 3 # bump when the index tables change; older indexes are rebuilt from the archives
+
+# Totals kept per user per stream (flags and versions only matter live)
+TOTAL_COLUMNS = tuple(field for field in FIELDS if field not in ("bumpable", "song_played", "version"))
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS streams (id TEXT PRIMARY KEY, archived_at TEXT NOT NULL, label TEXT NOT NULL, "
+    "users INTEGER NOT NULL, monetary_total INTEGER NOT NULL, sub_goal INTEGER NOT NULL, file TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS streams_by_time ON streams (archived_at DESC)",
+    # Names compare exactly, like the live storage and the leaderboard do
+    "CREATE TABLE IF NOT EXISTS totals (name TEXT NOT NULL, stream_id TEXT NOT NULL, "
+    + ", ".join(f"{column} INTEGER NOT NULL" for column in TOTAL_COLUMNS)
+    + ", PRIMARY KEY (name, stream_id))",
+    "CREATE INDEX IF NOT EXISTS totals_by_stream ON totals (stream_id)",
+]
+
+
+# --- Writing archives ---
+def _new_stream_id(archive_dir, now):
+    stream_id = time.strftime("%Y-%m-%d_%H%M%S", time.localtime(now))
+    candidate, n = stream_id, 1
+    while os.path.exists(os.path.join(archive_dir, candidate + SUFFIX)):
+        n += 1
+        candidate = f"{stream_id}-{n}"
+    return candidate
+
+
+def write_archive(path, meta, users, events):
+    """Writes one stream archive (see the module docstring for the members)."""
+    events_text = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in events)
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        archive.writestr("meta.json", json.dumps(meta, indent=4))
+        archive.writestr("users.bin", binary_snapshot.encode(users))
+        archive.writestr("events.jsonl", events_text)
+    os.replace(tmp_path, path)
+
+
+def read_archive(path):
+    """Returns (meta, users, events) from one stream archive."""
+    with zipfile.ZipFile(path) as archive:
+        meta = json.loads(archive.read("meta.json"))
+        snapshot = binary_snapshot.BinarySnapshot.from_bytes(archive.read("users.bin"))
+        users = snapshot.to_users()
+        snapshot.close()
+        events = [json.loads(line) for line in io.TextIOWrapper(archive.open("events.jsonl"), encoding="utf-8")]
+    return meta, users, events
+
+
+def archive_session(session, label="", archive_dir=ARCHIVE_DIR, now=None):
+    """Archives a session's final state and event log, indexes it and returns the stream id.
+
+    The session is left as it is, see rollover() for archive-then-clear.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    now = time.time() if now is None else now
+    session.sync()
+    users = dict(session.users)
+    stream_id = _new_stream_id(archive_dir, now)
+    meta = {
+        "id": stream_id,
+        "archived_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now)),
+        "label": label,
+        "users": len(users),
+        "monetary_total": sum(data["monetary_total"] for data in users.values()),
+        "subs": analytics.stream_subs(users),
+        "sub_goal": analytics.SUB_GOAL,
+    }
+    path = os.path.join(archive_dir, stream_id + SUFFIX)
+    write_archive(path, meta, users, session.events())
+    index = ArchiveIndex(archive_dir)
+    try:
+        index.add(meta, users, os.path.basename(path))
+    finally:
+        index.close()
+    return stream_id
+
+
+def rollover(session, label="", archive_dir=ARCHIVE_DIR):
+    """Archives the current stream and starts an empty one. Returns the stream id."""
+    stream_id = archive_session(session, label, archive_dir)
+    session.clear()
+    return stream_id
+
+
+# --- Index ---
+class ArchiveIndex:
+    """Stream list and per-user totals of every archived stream."""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock() # shared by Streamlit session threads
+        self._db = sqlite3.connect(os.path.join(archive_dir, INDEX_FILE), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL") # like sqlite_store, the zip files are the real copy anyway
+        outdated = self._db.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION
+        with self._db:
+            if outdated:
+                # Version 1 merged names that differ only in case and version 2 had no sub goal per stream,
+                # so start over from the archives
+                for table in ("totals", "streams", "rollups", "supporter_rollups", "rolled_up"):
+                    self._db.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in _SCHEMA + analytics.SCHEMA:
+                self._db.execute(statement)
+            analytics.catch_up(self._db)
+        if outdated:
+            self.reindex()
+            self._db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add(self, meta, users, file_name):
+        """Indexes one stream (replacing it if it was indexed before) and adds it to the rollups."""
+        rows = [(name, meta["id"], *(int(data[column]) for column in TOTAL_COLUMNS)) for name, data in users.items()]
+        with self._lock, self._db:
+            analytics.remove_stream(self._db, meta["id"])
+            self._db.execute("DELETE FROM totals WHERE stream_id = ?", (meta["id"],))
+            self._db.execute(
+                "INSERT OR REPLACE INTO streams VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    meta["id"], meta["archived_at"], meta["label"], meta["users"], meta["monetary_total"],
+                    meta.get("sub_goal", analytics.SUB_GOAL), file_name,
+                ),
+            )
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO totals VALUES ({', '.join('?' * (len(TOTAL_COLUMNS) + 2))})", rows
+            )
+            analytics.add_stream(self._db, meta, users)
+
+    def reindex(self):
+        """Rebuilds the index from the archive files. Returns the number of streams."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM totals")
+            self._db.execute("DELETE FROM streams")
+            analytics.clear(self._db)
+        count = 0
+        for file_name in sorted(os.listdir(self.archive_dir)):
+            if file_name.endswith(SUFFIX):
+                meta, users, _ = read_archive(os.path.join(self.archive_dir, file_name))
+                self.add(meta, users, file_name)
+                count += 1
+        return count
+
+    # --- Queries ---
+    def query(self, sql, params=()):
+        """Runs one SELECT and returns the rows as dicts."""
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def streams(self, limit=None):
+        """Archived streams as dicts, newest first."""
+        return self.query(
+            "SELECT id, archived_at, label, users, monetary_total, file FROM streams ORDER BY archived_at DESC LIMIT ?",
+            (-1 if limit is None else limit,),
+        )
+
+    def user_history(self, name, last=LAST_STREAMS):
+        """What one user gave in each of the last streams they were in (out of the last N streams), newest first."""
+        return self.query(
+            "SELECT s.id AS stream_id, s.archived_at, s.label, " + ", ".join(f"t.{column}" for column in TOTAL_COLUMNS)
+            + " FROM (SELECT id, archived_at, label FROM streams ORDER BY archived_at DESC LIMIT ?) AS s"
+            " JOIN totals AS t ON t.stream_id = s.id AND t.name = ?"
+            " ORDER BY s.archived_at DESC",
+            (last, name),
+        )
+
+    def user_totals(self, name, last=LAST_STREAMS):
+        """One user's totals added up over the last N streams, plus how many of them they were in."""
+        history = self.user_history(name, last)
+        totals = {column: sum(row[column] for row in history) for column in TOTAL_COLUMNS if column != "resub_tier"}
+        totals["streams"] = len(history)
+        return totals
+
+    def stream_path(self, stream_id):
+        return os.path.join(self.archive_dir, stream_id + SUFFIX)
+
+
+# --- Command line ---
+def main():
+    from songbump.storage import add_storage_arguments, storage_from_args
+
+    parser = argparse.ArgumentParser(description="Archive streams and look up stream history.")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="archive folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    roll = commands.add_parser("rollover", help="archive the current stream, then clear it")
+    roll.add_argument("--label", default="")
+    add_storage_arguments(roll)
+    commands.add_parser("streams", help="list archived streams")
+    user = commands.add_parser("user", help="one chatter's history")
+    user.add_argument("name")
+    user.add_argument("--last", type=int, default=LAST_STREAMS)
+    show = commands.add_parser("show", help="leaderboard of one archived stream")
+    show.add_argument("stream_id")
+    show.add_argument("--top", type=int, default=10)
+    report = commands.add_parser("report", help="weekly or monthly revenue, sub goal hit rate and top supporters")
+    report.add_argument("--period", choices=analytics.PERIODS, default="week")
+    report.add_argument("--last", type=int, default=8)
+    report.add_argument("--top", type=int, default=5)
+    commands.add_parser("reindex", help="rebuild index.db from the archive files")
+    args = parser.parse_args()
+
+    if args.command == "rollover":
+        print(f"Archived stream {rollover(storage_from_args(args), args.label, args.archive)}")
+        return
+    index = ArchiveIndex(args.archive)
+    if args.command == "streams":
+        for stream in index.streams():
+            label = f" ({stream['label']})" if stream["label"] else ""
+            print(f"{stream['id']}{label}: {stream['users']} users, {format_dollars(stream['monetary_total'])}")
+    elif args.command == "user":
+        history = index.user_history(args.name, args.last)
+        for row in history:
+            print(f"{row['stream_id']}: {format_dollars(row['monetary_total'])}")
+        totals = index.user_totals(args.name, args.last)
+        print(f"{args.name}: {format_dollars(totals['monetary_total'])} over {totals['streams']} of the last {args.last} streams")
+    elif args.command == "show":
+        with zipfile.ZipFile(index.stream_path(args.stream_id)) as archive:
+            snapshot = binary_snapshot.BinarySnapshot.from_bytes(archive.read("users.bin"))
+        for rank, (name, data) in enumerate(snapshot.page(0, args.top), start=1):
+            print(f"{rank}. {name}: {format_dollars(data['monetary_total'])}")
+    elif args.command == "report":
+        for row in analytics.revenue(index, args.period, args.last):
+            print(
+                f"{row['bucket']}: {format_dollars(row['monetary_total'])} over {row['streams']} streams "
+                f"(resubs {format_dollars(row['resub_total'])}, gifted {format_dollars(row['gifted_subs_total'])}, "
+                f"bits {format_dollars(row['bits_total'])}, donos {format_dollars(row['donos'])}), "
+                f"sub goal hit {row['goal_hits']}/{row['streams']}"
+            )
+        for rank, row in enumerate(analytics.top_supporters(index, args.period, limit=args.top), start=1):
+            print(f"{rank}. {row['name']}: {format_dollars(row['monetary_total'])} in {row['streams']} streams")
+    elif args.command == "reindex":
+        print(f"Indexed {index.reindex()} streams")
+
+
+if __name__ == "__main__":
+    main()
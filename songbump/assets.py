@@ -0,0 +1,71 @@
+"""Background image pipeline for the Streamlit app.
+
+The background used to be base64-encoded and inlined into the page on every
+rerun. Here it is resized and recompressed once into the app's static
+folder (a full-size and a mobile variant) so the browser downloads and
+caches it like any other image.
+"""
+import base64
+import os
+import shutil
+
+try:
+    from PIL import Image
+except ImportError: # Pillow is optional, without it the original file is served as-is
+    Image = None
+
+FULL_WIDTH = 1920
+MOBILE_WIDTH = 960
+JPEG_QUALITY = 80
+
+
+def build_background(image_file, static_dir, full_width=FULL_WIDTH, mobile_width=MOBILE_WIDTH, quality=JPEG_QUALITY):
+    """Writes the background variants into static_dir and returns their file names (full, mobile)."""
+    os.makedirs(static_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(image_file))[0]
+    full_name = f"{base}.jpg"
+    mobile_name = f"{base}-mobile.jpg"
+
+    if Image is None:
+        shutil.copyfile(image_file, os.path.join(static_dir, full_name))
+        return full_name, full_name
+
+    with Image.open(image_file) as image:
+        image = image.convert("RGB")
+        _save_variant(image, full_width, os.path.join(static_dir, full_name), quality)
+        _save_variant(image, mobile_width, os.path.join(static_dir, mobile_name), quality)
+    return full_name, mobile_name
+
+
+def _save_variant(image, width, path, quality):
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    tmp_path = path + ".tmp"
+    image.save(tmp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp_path, path) # never serve a half-written image
+
+
+def data_uri(image_file):
+    """Inline fallback for when static file serving is turned off."""
+    with open(image_file, "rb") as f:
+        data = base64.b64encode(f.read()).decode("utf-8")
+    return f"data:image/jpeg;base64,{data}"
+
+
+def background_css(full_url, mobile_url=None):
+    """Custom CSS for setting the background, with a smaller image on narrow screens."""
+    css = f"""
+        .stApp {{
+            background-image: url("{full_url}");
+            background-size: cover; /* Ensures the image covers the entire viewport */
+            background-attachment: fixed; /* Keeps the background fixed when scrolling */
+            background-position: center; /* Centers the image */
+        }}
+        """
+    if mobile_url and mobile_url != full_url:
+        css += f"""
+        @media (max-width: 768px) {{
+            .stApp {{ background-image: url("{mobile_url}"); }}
+        }}
+        """
+    return f"<style>{css}</style>"
@@ -0,0 +1,144 @@
+"""Headless command streams for the command line leaderboard.
+
+One command per line, words separated by spaces, # starts a comment:
+
+    add <user>                   put a user on the board with nothing yet
+    resub <user> [tier]
+    gift <user> [count] [tier]   also subgift, gifted
+    bits <user> <count>          also cheer
+    dono <user> <dollars>        also donation, tip
+    delete <user>
+    clear
+    print                        show the leaderboard at this point
+
+Tiers are 1/2/3, 1000/2000/3000 or prime, like in the importer. Negative
+counts and amounts subtract, like edit mode does. Twitch names have no
+spaces, so the user is always the second word.
+
+Contributions are folded into one delta per user and only applied (in one
+update_many) when a delete, clear, print or the end of the stream needs
+the board to be current, so a long stream costs one dict update per line.
+
+    python MonetaryLeaderboard.py --batch events.txt
+    bot | python MonetaryLeaderboard.py --batch - --every 1000 --top 10
+"""
+from songbump.contributions import add_contribution, empty_delta
+from songbump.importer import KINDS, TIERS, commit_deltas
+from songbump.money import dollars, to_cents
+
+DELETE = ("delete", "del", "remove")
+
+
+class BatchSummary:
+    """Counts reported back after a batch run."""
+
+    def __init__(self):
+        self.commands = 0
+        self.skipped = 0
+        self.errors = [] # "line N: reason" for every skipped command
+
+    def __str__(self):
+        return f"Applied {self.commands - self.skipped} of {self.commands} commands ({self.skipped} skipped)"
+
+
+def _tier(word):
+    tier = TIERS.get(word.lower())
+    if tier is None:
+        raise ValueError(f"unknown tier {word!r}")
+    return tier
+
+
+def _count(word):
+    try:
+        return int(word)
+    except ValueError:
+        raise ValueError(f"{word!r} is not a whole number") from None
+
+
+def parse_command(line):
+    """Turns one line into (op, user, kind, amount, tier). Raises ValueError if it makes no sense."""
+    words = line.split()
+    verb = words[0].lower()
+    if verb in ("clear", "print"):
+        return verb, None, None, None, None
+    if len(words) < 2:
+        raise ValueError(f"{verb} needs a user")
+    user, args = words[1], words[2:]
+    if verb == "add":
+        return "add", user, None, None, None
+    if verb in DELETE:
+        return "delete", user, None, None, None
+
+    kind = KINDS.get(verb)
+    if kind is None:
+        raise ValueError(f"unknown command {verb!r}")
+    if kind == "resub":
+        return "contribute", user, kind, 1, _tier(args[0]) if args else 1
+    if kind == "gifted":
+        return "contribute", user, kind, _count(args[0]) if args else 1, _tier(args[1]) if len(args) > 1 else 1
+    if not args:
+        raise ValueError(f"{verb} needs an amount")
+    if kind == "bits":
+        return "contribute", user, kind, _count(args[0]), 1
+    return "contribute", user, kind, to_cents(args[0]), 1
+
+
+def command_line(user, kind, amount=1, tier=1):
+    """The command for one (user, kind, amount, tier) contribution, e.g. for replaying an export."""
+    if kind == "resub":
+        return f"resub {user} {tier}"
+    if kind == "gifted":
+        return f"gift {user} {amount} {tier}"
+    if kind == "bits":
+        return f"bits {user} {amount}"
+    return f"dono {user} {dollars(amount)}"
+
+
+def run(session, lines, show=None, every=0):
+    """Applies a stream of command lines to a session (or any storage) and returns a BatchSummary.
+
+    show() is called for every print command and, if every is set, after
+    every that many commands.
+    """
+    summary = BatchSummary()
+    pending = {} # user -> delta not applied yet
+
+    def flush():
+        if pending:
+            commit_deltas(session, pending)
+            pending.clear()
+
+    for number, line in enumerate(lines, start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        summary.commands += 1
+        try:
+            op, user, kind, amount, tier = parse_command(line)
+        except ValueError as e:
+            summary.skipped += 1
+            summary.errors.append(f"line {number}: {e}")
+            continue
+
+        if op == "contribute":
+            delta = pending.get(user)
+            if delta is None:
+                delta = pending[user] = empty_delta()
+            add_contribution(delta, kind, amount, tier)
+        elif op == "add":
+            pending.setdefault(user, empty_delta()) # an empty delta still creates the row
+        elif op == "delete":
+            flush()
+            session.delete(user)
+        elif op == "clear":
+            pending.clear()
+            session.clear()
+        elif show is not None:
+            flush()
+            show()
+
+        if every and summary.commands % every == 0 and show is not None:
+            flush()
+            show()
+    flush()
+    return summary
@@ -0,0 +1,265 @@
+"""Compact binary session snapshots, loaded with mmap.
+
+Layout (all little-endian):
+
+    header   - magic b"SBMP", format version, schema version, user count and
+               the byte offsets of the three sections below
+    records  - one fixed-width record per user in session order: the name's
+               place in the name table, tier and gifted counts, bits, cents
+               and the bumpable/song_played flags
+    order    - record numbers sorted by monetary total (highest first, then
+               by name), so a leaderboard page is a slice
+    names    - every distinct username once, UTF-8, back to back
+
+Opening a snapshot maps the file and wraps the records in a NumPy view
+without reading them, so a huge archive opens instantly. Rows are only
+turned back into dicts when asked for, and whole-session sums run on the
+mapped columns directly.
+
+Converting users.json to binary and back gives the same rows, and the same
+bytes for files the app wrote:
+
+    python -m songbump.binary_snapshot to-bin users.json users.bin
+    python -m songbump.binary_snapshot to-json users.bin users.json
+    python -m songbump.binary_snapshot top users.bin 10
+"""
+import json
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from songbump.contributions import new_user
+from songbump.core import field_values
+from songbump.money import format_dollars
+
+# --- File layout ---
+MAGIC = b"SBMP"
+SUFFIX = ".bin" # journal snapshots with this suffix are written in this format
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIQQQ") # magic, format, schema, count, then the records, order and names offsets
+
+RECORD = np.dtype([
+    ("name_offset", "<u4"),
+    ("name_length", "<u2"),
+    ("resub_tier", "<i1"),
+    ("flags", "<u1"),
+    ("tier1", "<i4"),
+    ("tier2", "<i4"),
+    ("tier3", "<i4"),
+    ("gifted_subs_count", "<i4"),
+    ("version", "<i4"),
+    ("num_bits", "<i8"),
+    ("resub_total", "<i8"), # cents from here down
+    ("gifted_subs_total", "<i8"),
+    ("bits_total", "<i8"),
+    ("donos", "<i8"),
+    ("monetary_total", "<i8"),
+])
+FLAGS = {"bumpable": 1, "song_played": 2}
+
+ROW_FIELDS = tuple(new_user()) # key order of a row, as the app writes it
+INT_FIELDS = tuple(field for field in ROW_FIELDS if field in RECORD.names)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+# --- Writing ---
+def encode(users, schema=None):
+    """Packs a users dict into the binary snapshot format and returns the bytes."""
+    from songbump.journal import SCHEMA_VERSION
+
+    count = len(users)
+    rows = list(users.values())
+    records = np.zeros(count, RECORD)
+    for field in INT_FIELDS:
+        records[field] = np.fromiter(field_values(rows, field), RECORD[field], count=count)
+    for field, bit in FLAGS.items():
+        records["flags"] |= np.fromiter(map(bool, field_values(rows, field, False)), np.bool_, count=count) * np.uint8(bit)
+
+    # Each distinct name is stored once
+    names = bytearray()
+    interned = {}
+    for row, name in enumerate(users):
+        encoded = name.encode("utf-8")
+        offset = interned.get(encoded)
+        if offset is None:
+            offset = interned[encoded] = len(names)
+            names += encoded
+        records["name_offset"][row] = offset
+        records["name_length"][row] = len(encoded)
+
+    # Same order as the leaderboard: highest total first, ties by name
+    order = np.lexsort((np.array(list(users), dtype=str), -records["monetary_total"])).astype("<u4")
+
+    records_offset = _align(HEADER.size)
+    order_offset = _align(records_offset + records.nbytes)
+    names_offset = order_offset + order.nbytes
+    out = bytearray(HEADER.pack(
+        MAGIC, FORMAT_VERSION, schema or SCHEMA_VERSION, count, records_offset, order_offset, names_offset
+    ))
+    out += bytes(records_offset - len(out))
+    out += records.tobytes()
+    out += bytes(order_offset - len(out))
+    out += order.tobytes()
+    out += names
+    return bytes(out)
+
+
+def write(path, users, schema=None):
+    from songbump.journal import _atomic_write
+
+    _atomic_write(path, encode(users, schema))
+
+
+def is_binary(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+# --- Reading ---
+class BinarySnapshot:
+    """A memory-mapped binary snapshot. Nothing is decoded until it is asked for."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._open(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), path)
+
+    @classmethod
+    def from_bytes(cls, payload):
+        """Wraps a snapshot that is already in memory, e.g. one read out of a stream archive."""
+        snapshot = cls.__new__(cls)
+        snapshot._open(payload, "payload")
+        return snapshot
+
+    def _open(self, buffer, source):
+        self._map = buffer
+        magic, version, self.schema, self.count, records_offset, order_offset, names_offset = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{source} is not a version {FORMAT_VERSION} binary snapshot")
+        self.records = np.frombuffer(self._map, RECORD, self.count, records_offset)
+        self.order = np.frombuffer(self._map, "<u4", self.count, order_offset)
+        self._names_offset = names_offset
+        self._index = None
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return name in self.index()
+
+    def close(self):
+        self.records = self.order = None # views must go before the map can close
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def name(self, row):
+        record = self.records[row]
+        start = self._names_offset + int(record["name_offset"])
+        return self._map[start:start + int(record["name_length"])].decode("utf-8")
+
+    def row(self, row):
+        """Decodes one record back into a users.json row."""
+        record = self.records[row]
+        flags = int(record["flags"])
+        data = {}
+        for field in ROW_FIELDS:
+            if field in FLAGS:
+                data[field] = bool(flags & FLAGS[field])
+            else:
+                data[field] = int(record[field])
+        return data
+
+    def index(self):
+        """name -> record number, built the first time a lookup by name needs it."""
+        if self._index is None:
+            self._index = {name: row for row, name in enumerate(self.names())}
+        return self._index
+
+    def get(self, name):
+        row = self.index().get(name)
+        return None if row is None else self.row(row)
+
+    # --- Leaderboard ---
+    def page(self, offset, limit):
+        """Returns (name, data) pairs for one leaderboard page, decoding only those rows."""
+        return [(self.name(row), self.row(row)) for row in self.order[offset:offset + limit].tolist()]
+
+    def columns(self):
+        """Mapped columns for vectorized math (see songbump.totals.share_columns)."""
+        columns = {field: self.records[field] for field in INT_FIELDS}
+        for field, bit in FLAGS.items():
+            columns[field] = (self.records["flags"] & bit) != 0
+        return columns
+
+    def names(self):
+        """Every name in record order."""
+        blob = self._map[self._names_offset:]
+        return [
+            blob[start:start + length].decode("utf-8")
+            for start, length in zip(self.records["name_offset"].tolist(), self.records["name_length"].tolist())
+        ]
+
+    def to_users(self):
+        """Decodes the whole snapshot into a users dict, one column at a time."""
+        columns = self.columns()
+        values = zip(*(columns[field].tolist() for field in ROW_FIELDS))
+        return {name: dict(zip(ROW_FIELDS, row)) for name, row in zip(self.names(), values)}
+
+
+def read(path):
+    """Returns (users, schema version) from a binary snapshot, like journal.read_snapshot."""
+    snapshot = BinarySnapshot(path)
+    try:
+        return snapshot.to_users(), snapshot.schema
+    finally:
+        snapshot.close()
+
+
+# --- Converter ---
+def to_binary(json_path, binary_path):
+    from songbump.journal import SCHEMA_VERSION, load_user, read_snapshot
+
+    users, schema = read_snapshot(json_path)
+    if schema < SCHEMA_VERSION:
+        # Old float-dollar files have to become cents before they fit the records,
+        # and fields those versions didn't store get their defaults, like the journal does
+        users = {name: load_user(name, data, schema).to_row() for name, data in users.items()}
+        schema = SCHEMA_VERSION
+    write(binary_path, users, schema)
+    return len(users)
+
+
+def to_json(binary_path, json_path):
+    from songbump.journal import _atomic_write
+
+    users, schema = read(binary_path)
+    # Same layout the journal writes for its snapshots
+    _atomic_write(json_path, json.dumps({"schema": schema, "users": users}, indent=4).encode("utf-8"))
+    return len(users)
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "to-bin":
+        print(f"Wrote {to_binary(argv[1], argv[2])} users to {argv[2]}")
+    elif len(argv) >= 3 and argv[0] == "to-json":
+        print(f"Wrote {to_json(argv[1], argv[2])} users to {argv[2]}")
+    elif len(argv) >= 2 and argv[0] == "top":
+        snapshot = BinarySnapshot(argv[1])
+        limit = int(argv[2]) if len(argv) > 2 else 10
+        for rank, (name, data) in enumerate(snapshot.page(0, limit), start=1):
+            print(f"{rank}. {name}: {format_dollars(data['monetary_total'])}")
+    else:
+        print(*__doc__.strip().splitlines()[-3:], sep="\n")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
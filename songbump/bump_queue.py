@@ -0,0 +1,100 @@
+"""Song request queue: bumpable users whose song hasn't been played yet.
+
+Finding the next bump used to mean scanning the whole leaderboard for
+"Bumpable 🟢" next to "Song Played Status: ❌". The queue keeps exactly
+those users in a binary heap ordered by monetary total (highest first),
+ties going to whoever joined the queue first.
+
+It follows the session or storage like the leaderboard index does. A new
+contribution re-prioritizes a user (keeping their place among equal
+totals), and marking their song played or losing bump status takes them
+out. Each of these is O(log n):
+
+- changed or removed users leave their old heap entry behind, marked
+  stale, instead of being searched for; peek() skips stale entries, and
+  the heap is rebuilt once they outnumber the live ones;
+- peek(k) walks the heap best-first, so the "Next up" panel reads k
+  users in O(k log k) without popping or sorting anything.
+
+After a reset (load or clear) arrival order is the order users were
+added to the session, the closest thing to arrival a snapshot has.
+"""
+import heapq
+import itertools
+
+COMPACT_MIN = 64 # stale entries tolerated before a rebuild is even considered
+
+# Heap entry fields: [-monetary_total, arrival, push, name]. push is unique, so
+# entries never compare by name; name is None once the entry is stale.
+_NAME = 3
+
+
+def waiting(data):
+    """True if a user is owed a song: bumpable and not played yet."""
+    return data["bumpable"] and not data["song_played"]
+
+
+class BumpQueue:
+    """Session listener that keeps the users waiting for a song in priority order."""
+
+    def __init__(self):
+        self.reset({})
+
+    def reset(self, users):
+        self._arrivals = itertools.count()
+        self._pushes = itertools.count()
+        self._entries = {} # name -> live heap entry
+        for name, data in users.items():
+            if waiting(data):
+                self._entries[name] = [-data["monetary_total"], next(self._arrivals), next(self._pushes), name]
+        self._heap = list(self._entries.values())
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    def update(self, name, data):
+        """Adds, re-prioritizes or removes one user (data is None on delete)."""
+        entry = self._entries.get(name)
+        if data is None or not waiting(data):
+            if entry is not None:
+                self._discard(name)
+            return
+        if entry is None:
+            arrival = next(self._arrivals)
+        elif entry[0] == -data["monetary_total"]:
+            return
+        else:
+            arrival = entry[1] # a bigger total moves them up, not to the back of their new tier
+            self._discard(name)
+        entry = [-data["monetary_total"], arrival, next(self._pushes), name]
+        self._entries[name] = entry
+        heapq.heappush(self._heap, entry)
+
+    # --- Queue operations ---
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def peek(self, k=1):
+        """Returns the names of the next k users in line without removing them."""
+        heap = self._heap
+        names = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(names) < k:
+            entry, i = heapq.heappop(frontier)
+            if entry[_NAME] is not None:
+                names.append(entry[_NAME])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return names
+
+    # --- Internals ---
+    def _discard(self, name):
+        self._entries.pop(name)[_NAME] = None
+        self._stale += 1
+        if self._stale > COMPACT_MIN and self._stale > len(self._entries):
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+            self._stale = 0
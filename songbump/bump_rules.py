@@ -0,0 +1,115 @@
+"""Song bump rules, loaded from bump_rules.json and compiled once into fast checks.
+
+A user is bumpable if ANY rule matches. Each rule compares one contribution
+field against a threshold, for example {"field": "num_bits", "op": ">=",
+"value": 500}. Channels can change the thresholds in the JSON file without
+touching the code.
+
+Rules on the same field and operator are merged into their loosest
+threshold before compiling, so the check grows with the number of fields
+used, not with the number of rules in the file.
+
+Thresholds on money fields are written in dollars in the file and compared
+as integer cents.
+"""
+import functools
+import json
+import operator
+import os
+
+from songbump.money import MONEY_FIELDS, to_cents
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bump_rules.json")
+
+# Fields a rule can compare: each is a Contributor attribute and a ColumnarStore column
+RULE_FIELDS = (
+    "monetary_total", "resub_tier", "resub_total", "tier1", "tier2", "tier3", "gifted_subs_count",
+    "gifted_subs_total", "num_bits", "bits_total", "donos", "song_played",
+)
+
+# --- Supported comparisons ---
+OPERATORS = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+}
+# For merging: which of two thresholds lets more users through
+LOOSEST = {">=": min, ">": min, "<=": max, "<": max}
+
+
+def load_rules(path=RULES_FILE):
+    """Reads and validates the rule list from a JSON config file."""
+    with open(path, "r") as f:
+        rules = json.load(f)["rules"]
+    for rule in rules:
+        if rule["op"] not in OPERATORS:
+            raise ValueError(f"Unknown operator {rule['op']!r} in bump rule {rule.get('name', rule['field'])!r}")
+        if not isinstance(rule["field"], str) or rule["field"] not in RULE_FIELDS:
+            raise ValueError(
+                f"Bump rule {rule.get('name', rule['field'])!r} compares unknown field {rule['field']!r}, "
+                f"expected one of {', '.join(RULE_FIELDS)}"
+            )
+        if not isinstance(rule["value"], (int, float)) or isinstance(rule["value"], bool):
+            raise ValueError(f"Bump rule {rule.get('name', rule['field'])!r} needs a numeric value")
+        rule.setdefault("name", f"{rule['field']} {rule['op']} {rule['value']}")
+        if rule["field"] in MONEY_FIELDS:
+            rule["value"] = to_cents(rule["value"])
+    return rules
+
+
+def merge_rules(rules):
+    """Collapses rules on the same field and operator into one (field, op, value) check."""
+    merged = {}
+    exact = []
+    for rule in rules:
+        field, op, value = rule["field"], rule["op"], rule["value"]
+        if op in LOOSEST:
+            key = (field, op)
+            merged[key] = LOOSEST[op](merged[key], value) if key in merged else value
+        else:
+            exact.append((field, op, value)) # "==" rules can't share one threshold
+    return [(field, op, value) for (field, op), value in merged.items()] + exact
+
+
+class BumpRules:
+    """Compiled bump rules for single users (dicts or Contributors) and whole sessions (column arrays)."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.checks = merge_rules(rules)
+        # Generate one short-circuiting expression, e.g. d['num_bits'] >= 500 or d['tier2'] >= 1
+        expression = " or ".join(f"d[{field!r}] {op} {value!r}" for field, op, value in self.checks) or "False"
+        self.is_bumpable = eval(compile(f"lambda d: bool({expression})", RULES_FILE, "eval"))
+        # The same check reading attributes, for songbump.core.Contributor
+        expression = " or ".join(f"c.{field} {op} {value!r}" for field, op, value in self.checks) or "False"
+        self.is_bumpable_contributor = eval(compile(f"lambda c: bool({expression})", RULES_FILE, "eval"))
+
+    def reason(self, data):
+        """Returns the name of the first rule (in file order) that makes a user bumpable, or None."""
+        for rule in self.rules:
+            if OPERATORS[rule["op"]](data[rule["field"]], rule["value"]):
+                return rule["name"]
+        return None
+
+    def mask(self, cols):
+        """Vectorized check over column arrays, e.g. ColumnarStore.columns()."""
+        result = None
+        for field, op, value in self.checks:
+            hits = OPERATORS[op](cols[field], value)
+            result = hits if result is None else result | hits
+        if result is None:
+            import numpy as np # only needed for this edge case, keeps the CLI free of numpy
+            return np.zeros(len(cols["monetary_total"]), dtype=bool) # no rules, nobody is bumpable
+        return result
+
+    def describe(self):
+        """Markdown bullet list of the rules for display."""
+        return "\n".join(f"* {rule.get('description', rule['name'])}" for rule in self.rules)
+
+
+@functools.lru_cache(maxsize=None)
+def get_rules(path=RULES_FILE):
+    """Loads and compiles the rules once per process."""
+    return BumpRules(load_rules(path))
@@ -0,0 +1,104 @@
+"""Columnar contributor store: one NumPy array per field plus a name -> row index.
+
+Whole-session numbers (monetary totals, bump flags, grand totals) become a
+handful of array expressions instead of a Python loop over user dicts,
+which matters when recomputing a large archive.
+
+Run it on a saved session to recompute everything in one go:
+
+    python -m songbump.columnar users.json
+"""
+import sys
+
+import numpy as np
+
+from songbump.bump_rules import get_rules
+from songbump.core import field_values
+from songbump.money import format_dollars
+
+# --- Stored fields and their array types ---
+FIELDS = {
+    "resub_tier": np.int8,
+    "resub_total": np.int64, # cents
+    "tier1": np.int32,
+    "tier2": np.int32,
+    "tier3": np.int32,
+    "gifted_subs_count": np.int32,
+    "gifted_subs_total": np.int64, # cents
+    "num_bits": np.int64,
+    "bits_total": np.int64, # cents
+    "donos": np.int64, # cents
+    "monetary_total": np.int64, # cents
+    "song_played": np.bool_,
+}
+
+
+class ColumnarStore:
+    """Contributors stored column by column, rows packed with no gaps.
+
+    Built in one go from a users dict (see from_users); single-user changes
+    are followed in plain Python by the listeners that need them (see
+    songbump.totals.GrandTotals).
+    """
+
+    def __init__(self, capacity=0):
+        self.index = {} # name -> row
+        self.names = [] # row -> name
+        self.size = 0
+        self._arrays = {field: np.zeros(capacity, dtype) for field, dtype in FIELDS.items()}
+
+    @classmethod
+    def from_users(cls, users):
+        """Builds the store from a users dict, recomputing every monetary total in one pass."""
+        count = len(users)
+        store = cls(capacity=count)
+        store.names = list(users)
+        store.index = {name: row for row, name in enumerate(store.names)}
+        store.size = count
+        rows = list(users.values())
+        for field, dtype in FIELDS.items():
+            if field != "monetary_total":
+                store._arrays[field][:count] = np.fromiter(field_values(rows, field), dtype, count=count)
+        store._arrays["monetary_total"][:count] = store.monetary_totals()
+        return store
+
+    # --- Rows ---
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def columns(self, name=None):
+        """Returns views of every column, for the whole session or just one user's row."""
+        if name is None:
+            rows = slice(0, self.size)
+        else:
+            row = self.index[name]
+            rows = slice(row, row + 1)
+        return {field: array[rows] for field, array in self._arrays.items()}
+
+    # --- Vectorized math ---
+    def monetary_totals(self):
+        cols = self.columns()
+        return cols["resub_total"] + cols["gifted_subs_total"] + cols["bits_total"] + cols["donos"]
+
+    def bumpable(self, rules=None):
+        return (rules or get_rules()).mask(self.columns())
+
+
+def main(path):
+    from songbump.journal import read_snapshot, upgrade_user
+    from songbump.totals import MONEY_KEYS, grand_totals
+
+    users, schema = read_snapshot(path)
+    for data in users.values():
+        upgrade_user(data, schema)
+    store = ColumnarStore.from_users(users)
+    print(f"{len(store)} users, {int(store.bumpable().sum())} bumpable")
+    for key, value in grand_totals(store).items():
+        print(f"{key}: {format_dollars(value) if key in MONEY_KEYS else value}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "users.json")
@@ -0,0 +1,86 @@
+"""Per-user contribution math shared by the front ends."""
+from songbump.bump_rules import get_rules
+from songbump.money import BIT_VALUE, TIER_PRICES
+
+# Fields that a batch of contributions adds to (resub_tier is replaced, not added)
+DELTA_FIELDS = (
+    "resub_total",
+    "tier1",
+    "tier2",
+    "tier3",
+    "gifted_subs_count",
+    "gifted_subs_total",
+    "num_bits",
+    "bits_total",
+    "donos",
+)
+
+
+def new_user():
+    """Fresh totals for a user with no contributions yet (money in cents)."""
+    return {
+        "monetary_total": 0,
+        "resub_tier": 0,
+        "resub_total": 0,
+        "tier1": 0,
+        "tier2": 0,
+        "tier3": 0,
+        "gifted_subs_count": 0,
+        "gifted_subs_total": 0,
+        "num_bits": 0,
+        "bits_total": 0,
+        "donos": 0,
+        "bumpable": False,
+        "song_played": False,
+        "version": 0, # bumped by the storage on every write
+    }
+
+
+def recalculate(data):
+    """Refreshes a user's monetary total and bump status from their contributions."""
+    if not isinstance(data, dict):
+        return data.recalculate() # a songbump.core.Contributor, which does it with attribute access
+    # All amounts are integer cents, so the total is exact without rounding
+    data["monetary_total"] = data["resub_total"] + data["gifted_subs_total"] + data["bits_total"] + data["donos"]
+    data["bumpable"] = get_rules().is_bumpable(data)
+    return data
+
+
+def empty_delta():
+    delta = dict.fromkeys(DELTA_FIELDS, 0)
+    delta["resub_tier"] = None # None = no resub in this batch
+    return delta
+
+
+def add_contribution(delta, kind, amount=1, tier=1):
+    """Folds one contribution into a delta.
+
+    kind is "resub", "gifted", "bits" or "dono". amount is the number of
+    gifted subs, the number of bits or the donation in cents (unused for resubs).
+    """
+    if kind == "resub":
+        delta["resub_total"] += TIER_PRICES[tier]
+        delta["resub_tier"] = tier # the latest resub sets the tier, like the forms do
+    elif kind == "gifted":
+        delta["gifted_subs_total"] += amount * TIER_PRICES[tier]
+        delta["gifted_subs_count"] += amount
+        delta[f"tier{tier}"] += amount
+    elif kind == "bits":
+        delta["num_bits"] += amount
+        delta["bits_total"] += amount * BIT_VALUE
+    elif kind == "dono":
+        delta["donos"] += amount
+    else:
+        raise ValueError(f"Unknown contribution type: {kind!r}")
+    return delta
+
+
+def apply_delta(data, delta):
+    """Adds a delta to a user's totals and recalculates them."""
+    if not isinstance(data, dict):
+        return data.apply_delta(delta)
+    for field in DELTA_FIELDS:
+        data[field] += delta[field]
+    if delta["resub_tier"] is not None:
+        data["resub_tier"] = delta["resub_tier"]
+    return recalculate(data)
@@ -0,0 +1,269 @@
+"""Contributor model shared by the command line and Streamlit front ends.
+
+A Contributor holds one user's totals in __slots__ attributes instead of a
+dict, which makes every user smaller and every field read faster. It still
+answers data["field"], data.get() and data.update() the way the old row
+dicts did, so the bump rules, the journal and the leaderboard index work
+with it unchanged. to_row() gives the plain dict that is written to disk.
+
+A Session is the set of contributors for one stream (name -> Contributor)
+plus the listeners that follow every change (a ChangeCounter is the
+smallest one: it only counts them). The command line keeps a
+Session in memory, and every storage backend is a Session that also saves
+its rows (see songbump.storage).
+
+The functions at the bottom are pure: they return a new Contributor or a
+string and never change the one they are given.
+"""
+from operator import attrgetter
+
+from songbump.bump_rules import get_rules
+from songbump.contributions import DELTA_FIELDS, apply_delta, new_user, recalculate
+from songbump.money import format_dono
+
+FIELDS = tuple(new_user()) # same fields, same order as a users.json row
+_DEFAULTS = tuple(new_user().items())
+_get_fields = attrgetter(*FIELDS)
+
+
+class Contributor:
+    """One user's totals (money in cents), stored as attributes."""
+
+    __slots__ = ("name",) + FIELDS
+
+    def __init__(self, name=""):
+        self.name = name
+        for field, value in _DEFAULTS:
+            setattr(self, field, value)
+
+    @classmethod
+    def from_row(cls, name, data):
+        """Builds a contributor from a users.json row. Missing fields get new_user() defaults."""
+        contributor = cls.__new__(cls)
+        contributor.name = name
+        for field, value in _DEFAULTS:
+            setattr(contributor, field, data.get(field, value))
+        return contributor
+
+    @classmethod
+    def from_values(cls, name, values):
+        """Builds a contributor from values in FIELDS order, e.g. a database row."""
+        contributor = cls.__new__(cls)
+        contributor.name = name
+        for field, value in zip(FIELDS, values):
+            setattr(contributor, field, value)
+        return contributor
+
+    def to_row(self):
+        """The plain dict that is written to users.json and the journal."""
+        return dict(zip(FIELDS, _get_fields(self)))
+
+    def copy(self):
+        contributor = Contributor.__new__(Contributor)
+        contributor.name = self.name
+        for field, value in zip(FIELDS, _get_fields(self)):
+            setattr(contributor, field, value)
+        return contributor
+
+    # --- Contribution math (contributions.recalculate and apply_delta hand Contributors to these) ---
+    def recalculate(self):
+        self.monetary_total = self.resub_total + self.gifted_subs_total + self.bits_total + self.donos
+        self.bumpable = get_rules().is_bumpable_contributor(self)
+        return self
+
+    def apply_delta(self, delta):
+        for field in DELTA_FIELDS:
+            setattr(self, field, getattr(self, field) + delta[field])
+        if delta["resub_tier"] is not None:
+            self.resub_tier = delta["resub_tier"]
+        return self.recalculate()
+
+    # --- Dict-style access, so code written for row dicts keeps working ---
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return field in FIELDS
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def keys(self):
+        return FIELDS
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def update(self, values=(), **more):
+        for field, value in dict(values, **more).items():
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        if isinstance(other, Contributor):
+            return self.name == other.name and self.to_row() == other.to_row()
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Contributor({self.name!r}, monetary_total={self.monetary_total})"
+
+
+def field_values(rows, field, default=0):
+    """Iterates one field over a list of rows, all dicts or all Contributors (for bulk column builds)."""
+    if rows and isinstance(rows[0], Contributor):
+        return map(attrgetter(field), rows)
+    return (data.get(field, default) for data in rows)
+
+
+def as_contributor(name, data):
+    """Returns data as a Contributor named name, wrapping plain row dicts."""
+    if isinstance(data, Contributor):
+        data.name = name
+        return data
+    return Contributor.from_row(name, data)
+
+
+class Session:
+    """The contributors of one stream, kept in memory.
+
+    users maps names to Contributors. Listeners (the leaderboard index, the
+    grand totals) are told about every change, so nothing has to be
+    recomputed from scratch. Storage backends extend this with saving.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, name):
+        return name in self.users
+
+    def get(self, name):
+        return self.users.get(name)
+
+    def subscribe(self, listener):
+        """Registers an object with reset(users) and update(name, data) that should follow every change."""
+        self.listeners.append(listener)
+        listener.reset(self.users)
+
+    def sync(self):
+        """Picks up changes made elsewhere (nothing to do for a session held only in memory)."""
+
+    def events(self):
+        """Change records kept since the last snapshot, oldest first (none for a session held only in memory)."""
+        return []
+
+    # --- Changes ---
+    def update(self, name, change):
+        """Applies change(contributor) to a copy of one user (a new one if needed), stores and returns it."""
+        return self.update_many({name: change})[name]
+
+    def update_many(self, changes):
+        rows = {name: self._copy(name) for name in changes}
+        for name, change in changes.items():
+            change(rows[name])
+        self.put_many(rows)
+        return rows
+
+    def put(self, name, data):
+        """Stores one full row as is."""
+        self.put_many({name: data})
+
+    def put_many(self, rows):
+        for name, data in rows.items():
+            data = as_contributor(name, data)
+            data.version = self.users[name].version + 1 if name in self.users else 1 # like the storages do
+            self.users[name] = recalculate(data)
+            self._notify(name)
+
+    def delete(self, name):
+        self.users.pop(name, None)
+        self._notify(name)
+
+    def clear(self):
+        self.users.clear()
+        self._notify_reset()
+
+    def _copy(self, name):
+        data = self.users.get(name)
+        return Contributor(name) if data is None else data.copy()
+
+    def _notify(self, name):
+        data = self.users.get(name)
+        for listener in self.listeners:
+            listener.update(name, data)
+
+    def _notify_reset(self):
+        for listener in self.listeners:
+            listener.reset(self.users)
+
+
+class ChangeCounter:
+    """Session listener that counts changes, so a reader can tell whether anything changed since it last looked.
+
+    value counts every change, user_set only the ones that add or remove users.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.user_set = 0
+        self._names = set()
+
+    def reset(self, users):
+        self.value += 1
+        self.user_set += 1
+        self._names = set(users)
+
+    def update(self, name, data):
+        self.value += 1
+        if data is None and name in self._names:
+            self._names.discard(name)
+            self.user_set += 1
+        elif data is not None and name not in self._names:
+            self._names.add(name)
+            self.user_set += 1
+
+
+# --- Pure functions ---
+def apply(contributor, delta):
+    """Returns a copy of contributor with a whole delta added and the totals recalculated."""
+    return apply_delta(contributor.copy(), delta)
+
+
+def describe(contributor, tier1_label="Tier 1 ", empty="No contributions yet."):
+    """Lists what a user has given, e.g. "Tier 2 resub, 5 tier 1 gifted subs, 500 bits, $5 dono".
+
+    The command line leaves out the "Tier 1" label on gifted subs and prints
+    nothing for a user without contributions, hence the two options.
+    """
+    c = contributor
+    parts = []
+    if c.resub_tier == 3:
+        parts.append("tier 3 resub")
+    elif c.resub_tier == 2:
+        parts.append("tier 2 resub")
+    elif c.resub_tier == 1:
+        parts.append("resub")
+
+    for count, label in ((c.tier1, tier1_label), (c.tier2, "tier 2 "), (c.tier3, "tier 3 ")):
+        if count > 1:
+            parts.append(f"{count} {label}gifted subs")
+        elif count == 1:
+            parts.append(f"{label}gifted sub")
+
+    if c.num_bits > 1:
+        parts.append(f"{c.num_bits} bits")
+    elif c.num_bits == 1:
+        parts.append("1 bit")
+
+    if c.donos > 0:
+        parts.append(f"{format_dono(c.donos)} dono") # whole-dollar donos drop the cents
+
+    if not parts:
+        return empty
+    return ", ".join(parts).capitalize()
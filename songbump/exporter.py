@@ -0,0 +1,358 @@
+"""Write-behind export of the leaderboard and grand totals to spreadsheet files.
+
+Other mods can follow the stream from a shared file instead of the app:
+the exporter follows the session or storage as a listener and keeps
+leaderboard.csv, totals.csv and leaderboard.xlsx (two sheets) up to date.
+
+Nothing is written on the thread that made the change. A listener
+update only copies the changed user and wakes a background thread, which
+waits until the changes have stopped for DEBOUNCE seconds (or MAX_DELAY
+has passed since the first one, so a busy hype train still gets
+exported) and then writes every sink once. A burst of edits or a bulk
+import is a single export.
+
+Sinks are anything with a write(export) method (see Sink). The file sinks
+below are what ships; a Google Sheets client would be one more sink that
+pushes export.leaderboard and export.totals to its worksheets. A sink
+that fails is retried after RETRY_DELAY without holding up the others.
+
+    exporter = Exporter([CSVSink("exports"), XLSXSink("exports/leaderboard.xlsx")])
+    storage.subscribe(exporter)
+    exporter.start()
+"""
+import csv
+import io
+import os
+import threading
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+from songbump.columnar import ColumnarStore
+from songbump.core import Contributor, describe
+from songbump.money import dollars
+from songbump.totals import GRAND_TOTAL_KEYS, MONEY_KEYS, grand_totals
+
+EXPORT_DIR = "exports"
+DEBOUNCE = 1.0 # seconds without changes before exporting
+MAX_DELAY = 5.0 # longest a change waits while edits keep coming
+RETRY_DELAY = 10.0 # seconds before a failed sink is tried again
+
+LEADERBOARD_COLUMNS = (
+    "Rank", "User", "Total ($)", "Bumpable", "Song Played", "Resub Tier",
+    "Gifted Subs", "Bits", "Donos ($)", "Contributions",
+)
+
+
+class Export:
+    """One consistent copy of the leaderboard and grand totals, ready for a sink."""
+
+    def __init__(self, users, when=None):
+        self.time = time.time() if when is None else when
+        ranked = sorted(users.items(), key=lambda item: (-item[1].monetary_total, item[0]))
+        self.leaderboard = [
+            (
+                rank, name, float(dollars(data.monetary_total)), "yes" if data.bumpable else "no",
+                "yes" if data.song_played else "no", data.resub_tier, data.gifted_subs_count,
+                data.num_bits, float(dollars(data.donos)), describe(data, empty=""),
+            )
+            for rank, (name, data) in enumerate(ranked, start=1)
+        ]
+        totals = grand_totals(ColumnarStore.from_users(users))
+        self.totals = [
+            (key.removeprefix("total_").replace("_", " ").capitalize(),
+             float(dollars(totals[key])) if key in MONEY_KEYS else totals[key])
+            for key in GRAND_TOTAL_KEYS
+        ]
+
+
+# --- Sinks ---
+class Sink:
+    """Where exports go. Subclasses implement write(export), and may raise to be retried later."""
+
+    def write(self, export):
+        raise NotImplementedError
+
+    def __str__(self):
+        return type(self).__name__
+
+
+class CSVSink(Sink):
+    """leaderboard.csv and totals.csv in a folder, each replaced in one step."""
+
+    def __init__(self, folder=EXPORT_DIR):
+        self.folder = folder
+
+    def write(self, export):
+        os.makedirs(self.folder, exist_ok=True)
+        _replace(os.path.join(self.folder, "leaderboard.csv"), _csv(LEADERBOARD_COLUMNS, export.leaderboard))
+        _replace(os.path.join(self.folder, "totals.csv"), _csv(("Total", "Value"), export.totals))
+
+    def __str__(self):
+        return f"CSV in {self.folder}"
+
+
+class XLSXSink(Sink):
+    """One workbook with a Leaderboard and a Totals sheet.
+
+    Written with zipfile, since an .xlsx is a zip of a few XML parts, so no
+    spreadsheet library is needed.
+    """
+
+    def __init__(self, path=os.path.join(EXPORT_DIR, "leaderboard.xlsx")):
+        self.path = path
+
+    def write(self, export):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        sheets = [("Leaderboard", [LEADERBOARD_COLUMNS, *export.leaderboard]), ("Totals", [("Total", "Value"), *export.totals])]
+        _replace(self.path, _xlsx(sheets))
+
+    def __str__(self):
+        return f"XLSX at {self.path}"
+
+
+def file_sinks(folder=EXPORT_DIR):
+    """The CSV and XLSX sinks for one folder."""
+    return [CSVSink(folder), XLSXSink(os.path.join(folder, "leaderboard.xlsx"))]
+
+
+# --- Exporter ---
+class Exporter:
+    """Session listener that mirrors the session into its sinks from a background thread."""
+
+    def __init__(self, sinks=(), debounce=DEBOUNCE, max_delay=MAX_DELAY, retry_delay=RETRY_DELAY):
+        self.sinks = list(sinks)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.exports = 0 # exports run (a failing sink still counts, see errors)
+        self.changes = 0 # changes seen, most of them folded into a later export
+        self.last_export = None # time.time() of the last export
+        self.errors = {} # str(sink) -> last error, while it keeps failing
+        self._users = {} # name -> copy of the user, as the next export will see them
+        self._changed = 0 # self.changes at the time of the last snapshot
+        self._done = 0 # self.changes as of the last finished export
+        self._first_change = self._last_change = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    # --- Listener (runs on the writer's thread, so it only copies and signals) ---
+    def reset(self, users):
+        copies = {name: _copy(name, data) for name, data in users.items()}
+        with self._cond:
+            self._users = copies
+            self._changed_now()
+
+    def update(self, name, data):
+        copy = None if data is None else _copy(name, data)
+        with self._cond:
+            if copy is None:
+                self._users.pop(name, None)
+            else:
+                self._users[name] = copy
+            self._changed_now()
+
+    def _changed_now(self):
+        now = time.monotonic()
+        if self.changes == self._changed:
+            self._first_change = now
+        self._last_change = now
+        self.changes += 1
+        self._cond.notify()
+
+    # --- Thread ---
+    def start(self):
+        """Starts the background thread (once) and exports the current state.
+
+        Calling it while a stop is still writing its last export cancels the
+        stop, so there is never more than one thread writing the files.
+        """
+        with self._cond:
+            self._stopping = False
+            if self._thread is not None:
+                self._cond.notify()
+                return
+            if self.changes == self._changed:
+                self._changed_now() # nothing pending, export what's there now
+            self._thread = threading.Thread(target=self._run, name="songbump-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Writes anything still pending and stops the thread. Returns True once it has exited.
+
+        With timeout=0 this only asks the thread to stop and returns straight
+        away. The thread stays this exporter's until it has finished writing.
+        """
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return True
+            self._stopping = True
+            self._cond.notify()
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    @property
+    def running(self):
+        """True while the thread is on and not stopping."""
+        return self._thread is not None and not self._stopping
+
+    @property
+    def stopping(self):
+        """True while a stopped thread is still writing its last export."""
+        return self._thread is not None and self._stopping
+
+    def flush(self, timeout=None):
+        """Exports every change seen so far now, skipping the debounce. Returns False on timeout.
+
+        Without a running thread the export is written on the calling thread.
+        """
+        if self._thread is None:
+            with self._cond:
+                users = dict(self._users)
+                self._changed = self._done = self.changes
+            self._export(users)
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self.changes
+            self._first_change = self._last_change = 0.0
+            self._cond.notify()
+            while self._done < target:
+                if self._thread is None:
+                    return False # the thread died before getting there
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        try:
+            self._export_until_stopped()
+        finally:
+            with self._cond:
+                self._thread = None # only now can start() make a new one
+                self._cond.notify_all()
+
+    def _export_until_stopped(self):
+        while True:
+            with self._cond:
+                while self.changes == self._changed and not self._stopping:
+                    self._cond.wait()
+                while self.changes != self._changed and not self._stopping:
+                    # Debounce: wait for a quiet moment, but never longer than max_delay
+                    ready_at = min(self._last_change + self.debounce, self._first_change + self.max_delay)
+                    wait = ready_at - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self.changes == self._changed:
+                    return # stopping with nothing left to write
+                users = dict(self._users)
+                self._changed = upto = self.changes
+            failed = self._export(users)
+            with self._cond:
+                self._done = upto
+                if failed and not self._stopping:
+                    # Try the failed sinks again later (the next change retries sooner)
+                    self._changed -= 1
+                    self._first_change = self._last_change = time.monotonic() + self.retry_delay - self.debounce
+                self._cond.notify_all()
+
+    def _export(self, users):
+        export = Export(users)
+        failed = False
+        for sink in list(self.sinks):
+            try:
+                sink.write(export)
+                self.errors.pop(str(sink), None)
+            except Exception as e: # a broken sink must not stop the others, or the thread
+                self.errors[str(sink)] = f"{type(e).__name__}: {e}"
+                failed = True
+        self.exports += 1
+        self.last_export = export.time
+        return failed
+
+
+def _copy(name, data):
+    return data.copy() if isinstance(data, Contributor) else Contributor.from_row(name, data)
+
+
+def _csv(header, rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue().encode("utf-8")
+
+
+def _replace(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path) # readers see the old file or the new one, never half of it
+
+
+# --- Minimal .xlsx writer ---
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    "{sheets}</Types>"
+)
+_SHEET_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>'
+)
+_SHEET_REL = (
+    '<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+_WORKSHEET = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>{rows}</sheetData></worksheet>'
+)
+
+
+def _cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx(sheets):
+    """Builds a workbook from [(sheet name, rows)], with the first row of each sheet as its header."""
+    out = io.BytesIO()
+    numbers = range(1, len(sheets) + 1)
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as book:
+        book.writestr("[Content_Types].xml", _CONTENT_TYPES.format(sheets="".join(_SHEET_TYPE.format(n=n) for n in numbers)))
+        book.writestr("_rels/.rels", _ROOT_RELS)
+        book.writestr("xl/workbook.xml", _WORKBOOK.format(sheets="".join(
+            f'<sheet name="{escape(name)}" sheetId="{n}" r:id="rId{n}"/>' for n, (name, _) in zip(numbers, sheets)
+        )))
+        book.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(rels="".join(_SHEET_REL.format(n=n) for n in numbers)))
+        for n, (_, rows) in zip(numbers, sheets):
+            xml_rows = "".join("<row>" + "".join(_cell(value) for value in row) + "</row>" for row in rows)
+            book.writestr(f"xl/worksheets/sheet{n}.xml", _WORKSHEET.format(rows=xml_rows))
+    return out.getvalue()
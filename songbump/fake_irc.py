@@ -0,0 +1,91 @@
+"""Local fake Twitch chat server that replays recorded IRC traffic.
+
+Good enough to exercise songbump.twitch_ingest without a network: every
+client that connects and JOINs gets the recording played back, optionally
+several times over and at a fixed rate. Lines starting with "# " in the
+recording are comments.
+
+    python -m songbump.fake_irc samples/hype_train.irc --port 6667 --loops 1000
+"""
+import argparse
+import asyncio
+
+DRAIN_EVERY = 1000 # lines written between waits on the client when replaying at full speed
+
+
+def load_recording(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\r\n") for line in f if line.strip() and not line.startswith("# ")]
+
+
+class FakeChatServer:
+    """Replays the same recorded lines to every client after it joins a channel."""
+
+    def __init__(self, lines, loops=1, rate=0):
+        self.lines = lines
+        self.loops = loops
+        self.rate = rate # lines per second, 0 = as fast as the client reads
+        self.clients = 0
+
+    async def handle(self, reader, writer):
+        self.clients += 1
+        try:
+            # Wait for the client's JOIN like Twitch does before it sends channel traffic
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    return
+                if raw.upper().startswith(b"JOIN"):
+                    break
+
+            # Keep reading (PONGs etc.) so the client's writes never pile up unread
+            listener = asyncio.create_task(self._discard_input(reader))
+
+            delay = 1 / self.rate if self.rate else 0
+            written = 0
+            for _ in range(self.loops):
+                for line in self.lines:
+                    writer.write(line.encode("utf-8") + b"\r\n")
+                    written += 1
+                    if delay:
+                        await writer.drain()
+                        await asyncio.sleep(delay)
+                    elif written % DRAIN_EVERY == 0:
+                        await writer.drain() # lets a slow client push back
+            await writer.drain()
+            writer.write_eof()
+            await listener # the client hangs up once it has read everything
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _discard_input(self, reader):
+        while await reader.readline():
+            pass
+
+    async def serve(self, host="127.0.0.1", port=6667):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Twitch chat traffic to local clients.")
+    parser.add_argument("recording")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    parser.add_argument("--loops", type=int, default=1, help="times to play the recording per client")
+    parser.add_argument("--rate", type=float, default=0, help="lines per second (0 = unthrottled)")
+    args = parser.parse_args()
+
+    server = FakeChatServer(load_recording(args.recording), args.loops, args.rate)
+    print(f"Replaying {len(server.lines)} lines x{args.loops} on {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Undo/redo and point-in-time state for a session, by event sourcing.
+
+Edits used to be applied as signed deltas (subtract mode is the same
+delta times -1), which can't always take a mistake back: subtracting a
+resub sets resub_tier to 0 and forgets what it was. The history follows
+the session or storage as a listener and keeps every change as an event
+with the user's full row before and after it:
+
+    events       (time, action id, name, before, after), oldest first;
+                 rows are tuples of STATE_FIELDS, None if the user didn't exist
+    actions      what one mod did in one go: a single save, or everything
+                 written inside a `with history.action(label):` block
+                 (a bulk import, a clear), and who did it (the owner)
+    checkpoints  a copy of every user's row every CHECKPOINT_EVERY events
+
+Undo and redo work on actions. For each user in the action, the row is
+put back exactly if nobody has touched it since; otherwise only the
+action's own change is taken out of the current row (counts and money
+are adjusted by the difference, a tier or song played flag is only reset
+if it still has the value the action gave it), so later edits by other
+mods survive. An undo is itself recorded, so redo and the timeline stay
+right.
+
+Every mod undoes only their own actions: undo(owner) and redo(owner) pick
+the latest action with that owner. Changes written without one (the
+importer or the live ingest) and changes synced in from another process
+are in the timeline and in recent(), but nobody can undo them. A sync
+that happens in the middle of a mod's save (every storage write syncs
+first) is kept out of the mod's action.
+
+state_at(when) rebuilds the session as it was at any moment by starting
+from the last checkpoint before it and replaying at most CHECKPOINT_EVERY
+events, however long the stream has been. restore(when) writes that state
+back as one action, which can be undone like any other.
+
+The history lives in memory, alongside the storage it follows. It keeps
+the last MAX_EVENTS events (trimmed a checkpoint at a time, so state_at()
+before that gives the oldest state still kept) and the last MAX_ACTIONS
+undoable actions.
+"""
+import bisect
+import contextlib
+import threading
+import time
+from operator import attrgetter, itemgetter
+
+from songbump.contributions import DELTA_FIELDS, new_user
+from songbump.core import FIELDS, Contributor
+from songbump.money import format_dollars
+
+CHECKPOINT_EVERY = 1000 # events between checkpoints, the most state_at() ever replays
+MAX_EVENTS = 20 * CHECKPOINT_EVERY # events kept for state_at(), about a long stream's worth
+MAX_ACTIONS = 200 # actions kept for undo and redo, across all mods
+
+STATE_FIELDS = tuple(field for field in FIELDS if field != "version") # versions only matter to the storage
+_MONEY = STATE_FIELDS.index("monetary_total")
+_PLAYED = STATE_FIELDS.index("song_played")
+_ADDITIVE = tuple(STATE_FIELDS.index(field) for field in DELTA_FIELDS)
+_FLAGS = tuple(STATE_FIELDS.index(field) for field in ("resub_tier", "song_played")) # set, not added up
+_EMPTY = tuple(new_user()[field] for field in STATE_FIELDS)
+
+_from_contributor = attrgetter(*STATE_FIELDS)
+_from_dict = itemgetter(*STATE_FIELDS)
+
+
+def row_state(data):
+    """A user's row as a tuple of STATE_FIELDS (None for a missing user)."""
+    if data is None:
+        return None
+    if isinstance(data, Contributor):
+        return _from_contributor(data)
+    return _from_dict(data)
+
+
+def _rebase(current, source, target):
+    """Moves current by the change from source to target (None = a user with nothing yet)."""
+    source = source or _EMPTY
+    target = target or _EMPTY
+    if current == source:
+        return target
+    values = list(current)
+    for i in _ADDITIVE:
+        values[i] += target[i] - source[i]
+    for i in _FLAGS:
+        if current[i] == source[i]:
+            values[i] = target[i]
+    return tuple(values)
+
+
+def describe_change(name, before, after):
+    """A short label for one user's change, e.g. "alice +$5.00" or "Deleted bob"."""
+    if before is None:
+        return f"Added {name}" if after == _EMPTY else f"Added {name} with {format_dollars(after[_MONEY])}"
+    if after is None:
+        return f"Deleted {name}"
+    change = after[_MONEY] - before[_MONEY]
+    if change:
+        return f"{name} {'+' if change > 0 else '-'}{format_dollars(abs(change))}"
+    if after[_PLAYED] != before[_PLAYED]:
+        return f"{name} song {'played' if after[_PLAYED] else 'not played'}"
+    return f"{name} edited"
+
+
+class Action:
+    """One mod's change to one or more users, the unit of undo and redo."""
+
+    __slots__ = ("id", "label", "kind", "owner", "time", "changes")
+
+    def __init__(self, action_id, label, kind, owner=None):
+        self.id = action_id
+        self.label = label # None until closed for a single save, then described from its change
+        self.kind = kind # "edit", "undo", "redo" or "restore"
+        self.owner = owner # who can undo it, None for changes from elsewhere
+        self.time = time.time()
+        self.changes = {} # name -> [row before the action, row after it]
+
+    def add(self, name, before, after):
+        change = self.changes.get(name)
+        if change is None:
+            self.changes[name] = [before, after]
+        else:
+            change[1] = after
+
+    def __repr__(self):
+        return f"Action({self.id}, {self.label!r}, {len(self.changes)} users)"
+
+
+class History:
+    """Session listener that records every change for undo, redo and point-in-time replay."""
+
+    def __init__(self, storage, checkpoint_every=CHECKPOINT_EVERY, max_events=MAX_EVENTS, max_actions=MAX_ACTIONS):
+        self.storage = storage
+        self.checkpoint_every = checkpoint_every
+        self.max_events = max_events
+        self.max_actions = max_actions
+        self.events = []
+        self.checkpoints = [] # (event number, time, name -> row); event numbers count trimmed events too
+        self.trimmed = 0 # events dropped from the front of events
+        self.undo_stack = []
+        self.redo_stack = []
+        self._rows = None # name -> row, as of the last event
+        self._ids = 0
+        self._lock = threading.Lock() # never held while writing to the storage
+        self._local = threading.local() # the action open in this thread, if any
+        storage.subscribe(self)
+
+    # --- Listener ---
+    def reset(self, users):
+        rows = {name: row_state(data) for name, data in users.items()}
+        with self._lock:
+            if self._rows is None:
+                self._rows = rows
+                self.checkpoints.append((0, time.time(), dict(rows)))
+                return
+            changed = [name for name in self._rows.keys() | rows.keys() if self._rows.get(name) != rows.get(name)]
+        if not changed:
+            return # reloaded, but nothing changed
+        action = self._current_action()
+        standalone = action is None
+        if standalone:
+            label = f"Cleared {len(changed)} users" if not rows else f"Reloaded {len(changed)} users"
+            with self._lock:
+                self._ids += 1
+                action = Action(self._ids, label, "edit")
+        for name in changed:
+            self._record(name, rows.get(name), action)
+        if standalone and action.changes:
+            self._close(action)
+
+    def update(self, name, data):
+        self._record(name, row_state(data))
+
+    # --- Actions ---
+    @contextlib.contextmanager
+    def action(self, label=None, kind="edit", owner=None):
+        """Groups every change this thread makes inside the block into one action that owner can undo.
+
+        Without a label, the action is described from its change like a single save.
+        """
+        if getattr(self._local, "action", None) is not None:
+            yield self._local.action # already inside one, e.g. a clear during an import
+            return
+        with self._lock:
+            self._ids += 1
+            action = Action(self._ids, label, kind, owner)
+        self._local.action = action
+        try:
+            yield action
+        finally:
+            self._local.action = None
+            if action.changes:
+                self._close(action)
+
+    def _current_action(self):
+        # Rows read from other processes are nobody's, even when the sync runs inside this thread's save
+        if getattr(self.storage, "syncing", False):
+            return None
+        return getattr(self._local, "action", None)
+
+    def _record(self, name, after, action=None):
+        if action is None:
+            action = self._current_action()
+        with self._lock:
+            before = self._rows.get(name)
+            if before == after:
+                return # a write that changed nothing, or one replayed by a sync
+            standalone = action is None
+            if standalone:
+                self._ids += 1
+                action = Action(self._ids, describe_change(name, before, after), "edit")
+            action.add(name, before, after)
+            if after is None:
+                del self._rows[name]
+            else:
+                self._rows[name] = after
+            self.events.append((time.time(), action.id, name, before, after))
+            recorded = self.trimmed + len(self.events)
+            if recorded % self.checkpoint_every == 0:
+                self.checkpoints.append((recorded, self.events[-1][0], dict(self._rows)))
+                self._trim()
+        if standalone:
+            self._close(action)
+
+    def _trim(self):
+        # Drops whole checkpoint intervals from the front, so every event kept
+        # can still be replayed from a checkpoint
+        while len(self.events) > self.max_events and len(self.checkpoints) > 1:
+            start = self.checkpoints[1][0]
+            del self.events[:start - self.trimmed]
+            del self.checkpoints[0]
+            self.trimmed = start
+
+    def _close(self, action):
+        if action.label is None:
+            if len(action.changes) == 1:
+                name, (before, after) = next(iter(action.changes.items()))
+                action.label = describe_change(name, before, after)
+            else:
+                action.label = f"Changed {len(action.changes)} users"
+        with self._lock:
+            if action.kind in ("edit", "restore"):
+                self.undo_stack.append(action)
+                self.redo_stack = [done for done in self.redo_stack if done.owner != action.owner]
+                del self.undo_stack[:-self.max_actions]
+
+    def next_undo(self, owner):
+        """The action undo(owner) would take back, or None."""
+        with self._lock:
+            return _last_owned(self.undo_stack, owner)
+
+    def next_redo(self, owner):
+        """The action redo(owner) would apply again, or None."""
+        with self._lock:
+            return _last_owned(self.redo_stack, owner)
+
+    def undo(self, owner):
+        """Takes back owner's last action. Returns it, or None if there is nothing to undo."""
+        with self._lock:
+            action = _last_owned(self.undo_stack, owner)
+            if action is None:
+                return None
+            self.undo_stack.remove(action)
+        self._apply(action, forward=False)
+        with self._lock:
+            self.redo_stack.append(action)
+        return action
+
+    def redo(self, owner):
+        """Applies owner's last undone action again. Returns it, or None if there is nothing to redo."""
+        with self._lock:
+            action = _last_owned(self.redo_stack, owner)
+            if action is None:
+                return None
+            self.redo_stack.remove(action)
+        self._apply(action, forward=True)
+        with self._lock:
+            self.undo_stack.append(action)
+        return action
+
+    def _apply(self, action, forward):
+        changes = {}
+        deletes = []
+        with self._lock:
+            current = {name: self._rows.get(name) for name in action.changes}
+        for name, (before, after) in action.changes.items():
+            source, target = (before, after) if forward else (after, before)
+            if target is None and current.get(name) == source:
+                deletes.append(name) # nobody touched it since, so it can go entirely
+            else:
+                changes[name] = lambda data, source=source, target=target: _set_state(
+                    data, _rebase(row_state(data), source, target)
+                )
+        with self.action(f"{'Redo' if forward else 'Undo'}: {action.label}", "redo" if forward else "undo", action.owner):
+            if changes:
+                self.storage.update_many(changes)
+            for name in deletes:
+                self.storage.delete(name)
+
+    # --- Point in time ---
+    def state_at(self, when):
+        """Every user's row (name -> dict) as of a time.time() timestamp.
+
+        Starts from the last checkpoint at or before that time, so at most
+        checkpoint_every events are replayed. Times before the oldest event
+        kept give the oldest state kept.
+        """
+        with self._lock:
+            i = max(bisect.bisect_right([checkpoint[1] for checkpoint in self.checkpoints], when) - 1, 0)
+            start, _, rows = self.checkpoints[i]
+            rows = dict(rows)
+            start -= self.trimmed
+            for event_time, _, name, _, after in self.events[start:start + self.checkpoint_every]:
+                if event_time > when:
+                    break
+                if after is None:
+                    rows.pop(name, None)
+                else:
+                    rows[name] = after
+        return {name: dict(zip(STATE_FIELDS, row)) for name, row in rows.items()}
+
+    def restore(self, when, label=None, owner=None):
+        """Puts every user back the way they were at a time, as one action that owner can undo."""
+        target = {name: row_state(data) for name, data in self.state_at(when).items()}
+        with self._lock:
+            current = dict(self._rows)
+        label = label or "Restored to " + time.strftime("%H:%M:%S", time.localtime(when))
+        with self.action(label, "restore", owner):
+            rows = {name: _set_state(Contributor(name), row) for name, row in target.items() if current.get(name) != row}
+            if rows:
+                self.storage.put_many(rows)
+            for name in current.keys() - target.keys():
+                self.storage.delete(name)
+
+    def recent(self, limit=20):
+        """The last actions anyone can undo, newest first."""
+        with self._lock:
+            return self.undo_stack[-limit:][::-1]
+
+
+def _last_owned(actions, owner):
+    for action in reversed(actions):
+        if action.owner is not None and action.owner == owner:
+            return action
+    return None
+
+
+def _set_state(data, row):
+    data.update(zip(STATE_FIELDS, row))
+    return data
@@ -0,0 +1,174 @@
+"""Streaming bulk import of Twitch activity-feed exports (CSV or JSONL).
+
+Each row is one contribution. The column names are matched loosely:
+
+    user   - user, username, user_name, name, display_name
+    type   - type, event, kind: sub/resub, subgift/gift/gifted/submysterygift,
+             bits/cheer, dono/donation/tip
+    tier   - tier, plan: 1/2/3, 1000/2000/3000 or Prime (counts as tier 1)
+    amount - amount, count, quantity, bits: gifted subs, bits, or dollars for donos
+
+The file is read line by line through a chain of generators and folded into
+one delta per user, so memory grows with the number of chatters, not with
+the size of the file. Everything is committed to the journal in one write
+at the end.
+
+    python -m songbump.importer activity.csv [more files...]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.money import to_cents
+
+# --- Column and value aliases ---
+USER_COLUMNS = ("user", "username", "user_name", "name", "display_name")
+TYPE_COLUMNS = ("type", "event", "kind")
+TIER_COLUMNS = ("tier", "plan", "sub_plan")
+AMOUNT_COLUMNS = ("amount", "count", "quantity", "bits")
+
+KINDS = {
+    "sub": "resub",
+    "resub": "resub",
+    "subgift": "gifted",
+    "gift": "gifted",
+    "gifted": "gifted",
+    "submysterygift": "gifted",
+    "bits": "bits",
+    "cheer": "bits",
+    "dono": "dono",
+    "donation": "dono",
+    "tip": "dono",
+}
+TIERS = {"1": 1, "2": 2, "3": 3, "1000": 1, "2000": 2, "3000": 3, "prime": 1}
+
+
+class ImportSummary:
+    """Counts reported back to whoever ran the import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.users = 0
+        self.new_users = 0
+
+    def __str__(self):
+        return (
+            f"Imported {self.rows - self.skipped} of {self.rows} rows for {self.users} users "
+            f"({self.new_users} new, {self.skipped} skipped)"
+        )
+
+
+# --- Pipeline stages ---
+def read_rows(stream, fmt):
+    """Yields one dict per line of a CSV or JSONL text stream."""
+    if fmt == "jsonl":
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield row if isinstance(row, dict) else {} # counted as skipped further down
+    else:
+        yield from csv.DictReader(stream)
+
+
+def _pick(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def parse_events(rows, summary):
+    """Turns raw rows into (user, kind, amount, tier) tuples, skipping rows that don't make sense."""
+    for row in rows:
+        summary.rows += 1
+        row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+        user = _pick(row, USER_COLUMNS)
+        kind = KINDS.get((_pick(row, TYPE_COLUMNS) or "").lower())
+        tier = TIERS.get((_pick(row, TIER_COLUMNS) or "1").lower())
+        amount = _pick(row, AMOUNT_COLUMNS)
+        try:
+            if kind == "dono":
+                amount = to_cents(amount)
+            elif kind in ("gifted", "bits"):
+                amount = int(float(amount if amount is not None else 1))
+            else:
+                amount = 1
+        except (TypeError, ValueError):
+            amount = None
+
+        if not user or kind is None or tier is None or amount is None or amount < 0:
+            summary.skipped += 1
+            continue
+        yield user, kind, amount, tier
+
+
+def aggregate(events):
+    """Folds the events into one delta per user in a single pass."""
+    deltas = {}
+    for user, kind, amount, tier in events:
+        delta = deltas.get(user)
+        if delta is None:
+            delta = deltas[user] = empty_delta()
+        add_contribution(delta, kind, amount, tier)
+    return deltas
+
+
+def detect_format(file_name):
+    return "jsonl" if os.path.splitext(file_name)[1].lower() in (".jsonl", ".ndjson") else "csv"
+
+
+def commit_deltas(journal, deltas, summary=None):
+    """Adds per-user deltas to the latest rows in one write, merged with anything written meanwhile."""
+    if summary is not None:
+        journal.sync()
+        summary.new_users += sum(1 for name in deltas if name not in journal.users)
+    # One write and one fsync for the whole batch
+    rows = journal.update_many({name: lambda data, delta=delta: apply_delta(data, delta) for name, delta in deltas.items()})
+    if summary is not None:
+        summary.users += len(rows)
+    return rows
+
+
+def import_stream(journal, stream, fmt="csv"):
+    """Imports one text stream into the journal and returns an ImportSummary."""
+    summary = ImportSummary()
+    deltas = aggregate(parse_events(read_rows(stream, fmt), summary))
+    commit_deltas(journal, deltas, summary)
+    return summary
+
+
+def import_upload(journal, uploaded_file):
+    """Imports a Streamlit UploadedFile (or any binary file object with a name)."""
+    stream = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+    return import_stream(journal, stream, detect_format(uploaded_file.name))
+
+
+def import_file(journal, path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return import_stream(journal, f, detect_format(path))
+
+
+def main():
+    from songbump.storage import add_storage_arguments, storage_from_args
+
+    parser = argparse.ArgumentParser(description="Import Twitch activity exports into the song bump tracker.")
+    parser.add_argument("files", nargs="+", help="CSV or JSONL activity exports")
+    add_storage_arguments(parser)
+    args = parser.parse_args()
+
+    storage = storage_from_args(args)
+    for path in args.files:
+        print(f"{path}: {import_file(storage, path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Append-only contribution journal with periodic compacted snapshots.
+
+Every change to a user is written as one small JSON line to the journal
+instead of rewriting the whole users file. The snapshot (the old users.json
+layout wrapped with a schema version) is only rewritten when the journal
+is compacted. A snapshot path ending in .bin uses the binary format from
+songbump.binary_snapshot instead.
+
+Records are full-row upserts, so replaying a journal on top of a snapshot
+that already contains some of its records gives the same result. That is
+what keeps compaction and crash recovery simple.
+"""
+import json
+import os
+from contextlib import contextmanager
+
+from songbump.contributions import recalculate
+from songbump.core import Contributor, as_contributor
+from songbump.money import migrate_user
+from songbump.storage import ConflictError, Storage, synced_in
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# --- Files ---
+SNAPSHOT_FILE = "users.json"
+JOURNAL_FILE = "users.journal.jsonl"
+COMPACT_EVERY = 500 # journal records before the snapshot is rewritten
+SCHEMA_VERSION = 2 # 1 = float dollars (plain users dict), 2 = integer cents
+
+
+def upgrade_user(data, schema=SCHEMA_VERSION):
+    """Fills in fields that older versions of the app did not store."""
+    if schema < 2:
+        migrate_user(data)
+    if "song_played" not in data:
+        data["song_played"] = False
+    data.setdefault("version", 0)
+    return recalculate(data)
+
+
+def load_user(name, data, schema=SCHEMA_VERSION):
+    """Turns a stored row into a Contributor, like upgrade_user but without patching the dict first."""
+    if schema < 2:
+        migrate_user(data)
+    return recalculate(Contributor.from_row(name, data)) # fields the row lacks get their defaults
+
+
+def read_snapshot(path):
+    """Returns (users, schema version) from a snapshot file, or an empty session if there is none."""
+    from songbump import binary_snapshot
+
+    if binary_snapshot.is_binary(path):
+        return binary_snapshot.read(path)
+    try:
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return {}, SCHEMA_VERSION
+    if isinstance(snapshot.get("schema"), int) and isinstance(snapshot.get("users"), dict):
+        return snapshot["users"], snapshot["schema"]
+    return snapshot, 1 # users.json from before the schema version was added
+
+
+class Journal(Storage):
+    """In-memory session backed by a snapshot file plus an append-only journal."""
+
+    def __init__(self, snapshot_path=SNAPSHOT_FILE, journal_path=JOURNAL_FILE, compact_every=COMPACT_EVERY, read_only=False):
+        super().__init__(read_only)
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.lock_path = journal_path + ".lock"
+        self._lock_file = None # open while this process holds the write lock
+        self._offset = 0 # how far into the journal we have replayed
+        self._inode = None # journal file identity, changes when it is compacted
+        self._records = 0 # records in the current journal
+        self._snapshot_id = None
+        self.load()
+
+    # --- Loading ---
+    @synced_in
+    def load(self):
+        """Rebuilds users from the latest snapshot plus the whole journal."""
+        self._snapshot_id = _file_id(self.snapshot_path)
+        users, schema = read_snapshot(self.snapshot_path)
+        self.users = {name: load_user(name, data, schema) for name, data in users.items()}
+        self.stats["rows_read"] += len(users)
+        self._offset = 0
+        self._records = 0
+        self._inode = None
+        self._replay()
+        if schema < SCHEMA_VERSION and not self.read_only:
+            self.compact() # migrate the files once, not on every load (read-only migrates in memory only)
+        self._notify_reset()
+
+    def sync(self):
+        """Applies records appended by other processes since the last load or sync."""
+        with self._lock:
+            self.stats["syncs"] += 1
+            self._sync()
+
+    @synced_in
+    def _sync(self):
+        try:
+            stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            stat = None
+
+        compacted = _file_id(self.snapshot_path) != self._snapshot_id or (
+            self._inode is not None and (stat is None or stat.st_ino != self._inode or stat.st_size < self._offset)
+        )
+        if compacted:
+            # Someone else wrote a new snapshot, start over from it
+            self.load()
+        elif stat is not None and stat.st_size > self._offset:
+            for name in self._replay():
+                self._notify(name)
+
+    def _replay(self):
+        """Applies journal records past the current offset and returns the names they touched."""
+        touched = set()
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return touched
+        with f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # half-written last record from a crash or a writer mid-append
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(record)
+                touched.add(record.get("name"))
+                self._records += 1
+                self.stats["rows_read"] += 1
+        return touched
+
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "put":
+            name = record["name"]
+            self.users[name] = load_user(name, record["data"], record.get("v", 1))
+        elif op == "del":
+            self.users.pop(record["name"], None)
+
+    def events(self):
+        """The put/del records in the journal, i.e. every change since the last compaction."""
+        records = []
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return records
+        with f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue # torn record from a crash
+        return records
+
+    # --- Writing ---
+    @contextmanager
+    def _locked(self):
+        """Holds the journal's lock file so no other process appends or compacts meanwhile."""
+        self._check_writable()
+        with self._lock:
+            if self._lock_file is not None:
+                yield # already held further up the stack
+                return
+            with open(self.lock_path, "a+b") as f:
+                _lock_file(f)
+                self._lock_file = f
+                try:
+                    yield
+                finally:
+                    self._lock_file = None
+                    _unlock_file(f)
+
+    def put(self, name, data, expected_version=None):
+        """Stores the full row for one user."""
+        self.put_many({name: data}, None if expected_version is None else {name: expected_version})
+
+    def put_many(self, rows, expected=None):
+        """Stores several full rows (name -> data) with a single journal write and fsync.
+
+        expected maps names to the version the caller read them at. If any of
+        them has been written since, nothing is stored and ConflictError is raised.
+        """
+        if not rows:
+            return
+        with self._locked():
+            self._sync() # nobody else can append while we hold the lock, so this is the latest
+            self._check_versions(expected, self.version)
+            records = []
+            for name, data in rows.items():
+                data = as_contributor(name, data)
+                data.version = self.version(name) + 1
+                self.users[name] = recalculate(data)
+                self._notify(name)
+                records.append({"op": "put", "name": name, "v": SCHEMA_VERSION, "data": data.to_row()})
+            self._append(*records)
+
+    def delete(self, name):
+        with self._locked():
+            self.users.pop(name, None)
+            self._notify(name)
+            self._append({"op": "del", "name": name})
+
+    def clear(self):
+        # Clearing everything is a natural point to start a fresh snapshot
+        with self._locked():
+            self._sync()
+            self.users.clear()
+            self._write_snapshot()
+            self._notify_reset()
+
+    def _append(self, *records):
+        line = b"".join((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8") for record in records)
+        with open(self.journal_path, "ab+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line # close off a record torn by a crash so ours stays readable
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno()) # a crash loses at most this write
+            end = f.tell()
+            if self._inode is None:
+                self._inode = os.fstat(f.fileno()).st_ino
+        # Only skip past our own records if nobody else appended before them,
+        # otherwise the next sync replays both (re-applying ours is harmless)
+        if end - len(line) == self._offset:
+            self._offset = end
+        self._records += len(records)
+        self.stats["writes"] += 1
+        self.stats["rows_written"] += len(records)
+        self.stats["bytes_written"] += len(line)
+
+        if self._records >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Writes the current users as the new snapshot and starts an empty journal."""
+        with self._locked():
+            self._sync()
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        from songbump import binary_snapshot
+
+        if self.snapshot_path.endswith(binary_snapshot.SUFFIX):
+            payload = binary_snapshot.encode(self.users)
+        else:
+            users = {name: data.to_row() for name, data in self.users.items()}
+            payload = json.dumps({"schema": SCHEMA_VERSION, "users": users}, indent=4).encode("utf-8")
+        _atomic_write(self.snapshot_path, payload)
+        self.stats["writes"] += 1
+        self.stats["rows_written"] += len(self.users)
+        self.stats["bytes_written"] += len(payload)
+        _atomic_write(self.journal_path, b"")
+        self._snapshot_id = _file_id(self.snapshot_path)
+        self._inode = os.stat(self.journal_path).st_ino
+        self._offset = 0
+        self._records = 0
+
+
+def _file_id(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass # LK_LOCK gives up after about 10 seconds, keep waiting
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _atomic_write(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
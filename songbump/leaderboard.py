@@ -0,0 +1,151 @@
+"""Ordered leaderboard index with O(log n) updates and rank lookups.
+
+Users are kept in an indexable skip list ordered by (monetary_total
+descending, name). Each link remembers how many entries it jumps over, so
+the list can answer "who is at position i" and "what rank is this user" in
+O(log n) without re-sorting the whole leaderboard after every entry.
+"""
+import random
+
+MAX_LEVELS = 32 # enough for far more chatters than a stream will ever see
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels # entries skipped by each link, counting the one it lands on
+
+
+class LeaderboardIndex:
+    """Journal listener that keeps users sorted by monetary total, highest first."""
+
+    def __init__(self):
+        self.reset({})
+
+    def reset(self, users):
+        self._head = _Node(None, MAX_LEVELS)
+        self._keys = {} # name -> key currently in the list
+        for name, data in users.items():
+            self.update(name, data)
+
+    def update(self, name, data):
+        """Moves one user to their new position (data is None on delete)."""
+        new_key = None if data is None else (-data["monetary_total"], name)
+        old_key = self._keys.get(name)
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            self._remove(old_key)
+            del self._keys[name]
+        if new_key is not None:
+            self._insert(new_key)
+            self._keys[name] = new_key
+
+    # --- Queries ---
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        return name in self._keys
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key[1]
+            node = node.next[0]
+
+    def top(self, k):
+        """Returns the names of the k highest contributors."""
+        return self.page(0, k)
+
+    def page(self, offset, limit):
+        """Returns up to limit names starting at the 0-based position offset."""
+        names = []
+        node = self._node_at(offset)
+        while node is not None and len(names) < limit:
+            names.append(node.key[1])
+            node = node.next[0]
+        return names
+
+    def rank(self, name):
+        """Returns the 0-based position of a user, or None if they are not on the board."""
+        key = self._keys.get(name)
+        if key is None:
+            return None
+        position = 0
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def between(self, low, high):
+        """Returns the names whose monetary total is within [low, high], highest first."""
+        names = []
+        node = self._head
+        start = (-high,)
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < start:
+                node = node.next[level]
+        node = node.next[0]
+        while node is not None and -node.key[0] >= low:
+            names.append(node.key[1])
+            node = node.next[0]
+        return names
+
+    # --- Skip list internals ---
+    def _node_at(self, index):
+        if index < 0 or index >= len(self._keys):
+            return None
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def _insert(self, key):
+        chain = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = 1
+        while levels < MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+
+    def _remove(self, key):
+        chain = [None] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        node = chain[0].next[0]
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
@@ -0,0 +1,50 @@
+"""Integer-cents money model.
+
+Every dollar amount is stored and added up as a whole number of cents, so
+totals are exact no matter how many add and subtract edits a user gets.
+Dollars only appear when text is shown to a person (format_dollars) or
+typed in by one (to_cents).
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# --- Prices in cents ---
+TIER_PRICES = {1: 599, 2: 999, 3: 2499}
+BIT_VALUE = 1 # one bit is worth one cent
+
+# Per-user fields that hold money (everything else is a count or a flag)
+MONEY_FIELDS = ("monetary_total", "resub_total", "gifted_subs_total", "bits_total", "donos")
+
+
+def to_cents(amount):
+    """Converts a dollar amount (number or string) to whole cents, rounding half up."""
+    try:
+        return int((Decimal(str(amount).strip()) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, OverflowError):
+        raise ValueError(f"Not a dollar amount: {amount!r}") from None
+
+
+def dollars(cents):
+    """Formats cents as a plain dollar string, e.g. 1234 -> '12.34'."""
+    sign = "-" if cents < 0 else ""
+    whole, part = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{part:02d}"
+
+
+def format_dollars(cents):
+    """Formats cents for display, e.g. 1234 -> '$12.34'."""
+    return "$" + dollars(cents)
+
+
+def format_dono(cents):
+    """Like format_dollars, but drops the cents on whole-dollar donations ($5 instead of $5.00)."""
+    if cents % 100 == 0:
+        return f"${cents // 100}"
+    return format_dollars(cents)
+
+
+def migrate_user(data):
+    """Converts a user saved by the float-dollar versions of the app to integer cents."""
+    for field in MONEY_FIELDS:
+        if field in data:
+            data[field] = to_cents(data[field])
+    return data
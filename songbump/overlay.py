@@ -0,0 +1,315 @@
+"""Small HTTP server for OBS browser sources and other read-only viewers.
+
+The Streamlit app re-runs its whole script for every viewer, which is far
+too much for an overlay that a dozen people (and OBS) keep open all
+stream. This server follows the persisted state on its own instead: one
+thread syncs the storage every POLL_INTERVAL seconds, the leaderboard
+index, grand totals and bump queue follow it as listeners, and after
+each change one immutable snapshot is published for the request threads.
+Viewers never cause a Streamlit rerun, and nothing is recomputed per
+request:
+
+    GET /                       the overlay page (add it as a browser source)
+    GET /leaderboard.json       leaderboard, grand totals and next up as JSON
+        ?top=10                 how many leaderboard rows (at most MAX_TOP)
+        ?wait=25                long poll: with If-None-Match, hold the request
+                                until the data changes (or the wait runs out)
+    GET /events?top=10          the same JSON as server-sent events, one per change
+
+Each JSON body is serialized once per change and top, and its ETag is a
+hash of the body, so a conditional request for unchanged data is a 304
+with no body at all. A change that doesn't touch the top rows doesn't
+wake anyone up.
+
+    python -m songbump.overlay --port 8765
+    python -m songbump.overlay --storage sqlite     then http://127.0.0.1:8765/?top=5 in OBS
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from songbump.analytics import SUB_GOAL
+from songbump.bump_queue import BumpQueue
+from songbump.core import describe
+from songbump.leaderboard import LeaderboardIndex
+from songbump.money import format_dollars
+from songbump.totals import GrandTotals
+
+DEFAULT_HOST = "127.0.0.1" # only this machine; use --host 0.0.0.0 to share on the LAN
+DEFAULT_PORT = 8765
+POLL_INTERVAL = 0.5 # seconds between storage syncs
+DEFAULT_TOP = 10
+MAX_TOP = 100
+NEXT_UP = 3
+MAX_WAIT = 60 # longest long poll a client may ask for, in seconds
+HEARTBEAT = 15 # seconds between keep-alive comments on an idle event stream
+
+
+class Snapshot:
+    """What the overlay shows at one moment, shared read-only by the request threads."""
+
+    def __init__(self, version, rows, totals, next_up):
+        self.version = version
+        self.rows = rows # up to MAX_TOP leaderboard rows
+        self.totals = totals
+        self.next_up = next_up
+        self._bodies = {} # top -> (etag, body), filled in on first request
+        self._lock = threading.Lock() # request threads fill _bodies concurrently
+
+    def body(self, top):
+        """The JSON body for the top rows and its ETag, serialized once per snapshot."""
+        cached = self._bodies.get(top)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._bodies.get(top)
+            if cached is None:
+                payload = { # only what is shown, so an unrelated change keeps the same ETag
+                    "leaderboard": self.rows[:top],
+                    "totals": self.totals,
+                    "next_up": self.next_up,
+                }
+                body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+                cached = self._bodies[top] = ('"' + hashlib.blake2s(body, digest_size=8).hexdigest() + '"', body)
+        return cached
+
+
+class Feed:
+    """Follows a storage from a polling thread and publishes a Snapshot after every change."""
+
+    def __init__(self, storage, poll_interval=POLL_INTERVAL):
+        self.storage = storage
+        self.poll_interval = poll_interval
+        self.leaderboard = LeaderboardIndex()
+        self.totals = GrandTotals()
+        self.queue = BumpQueue()
+        self._version = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        for listener in (self.leaderboard, self.totals, self.queue, self):
+            storage.subscribe(listener)
+        self.snapshot = self._build()
+
+    # --- Listener: only counts changes, the snapshot is rebuilt once per sync ---
+    def reset(self, users):
+        self._version += 1
+
+    def update(self, name, data):
+        self._version += 1
+
+    # --- Polling ---
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="songbump-overlay-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def poll(self):
+        """Syncs the storage and publishes a new snapshot if anything changed."""
+        seen = self._version
+        self.storage.sync()
+        if self._version != seen:
+            snapshot = self._build()
+            with self._cond:
+                self.snapshot = snapshot
+                self._cond.notify_all()
+
+    def _build(self):
+        users = self.storage.users
+        rows = []
+        for rank, name in enumerate(self.leaderboard.top(MAX_TOP), start=1):
+            data = users[name]
+            rows.append({
+                "rank": rank,
+                "name": name,
+                "total": data.monetary_total, # cents
+                "total_text": format_dollars(data.monetary_total),
+                "bumpable": bool(data.bumpable),
+                "song_played": bool(data.song_played),
+                "contributions": describe(data, empty=""),
+            })
+        values = self.totals.values
+        totals = {
+            "monetary": values["total_monetary"],
+            "monetary_text": format_dollars(values["total_monetary"]),
+            "subs": values["total_subs_count"],
+            "sub_goal": SUB_GOAL,
+            "bits": values["total_bits_amount"],
+            "donos_text": format_dollars(values["total_donos"]),
+        }
+        return Snapshot(self._version, rows, totals, self.queue.peek(NEXT_UP))
+
+    def wait_for_change(self, top, etag, timeout):
+        """Waits until the body for top no longer has the given ETag. Returns the latest snapshot."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.snapshot.body(top)[0] == etag and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.snapshot
+
+
+# --- HTTP ---
+class OverlayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, so polling viewers reuse their connection
+    wbufsize = 64 * 1024 # headers and body leave in one write (flushed after every request)
+    disable_nagle_algorithm = True # small responses go out now, not after the client's delayed ACK
+    feed = None # set by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            top = min(max(int(query.get("top", [DEFAULT_TOP])[0]), 1), MAX_TOP)
+            wait = min(max(float(query.get("wait", [0])[0]), 0), MAX_WAIT)
+        except ValueError:
+            self._send(400, b"top and wait must be numbers\n", "text/plain; charset=utf-8")
+            return
+        if url.path in ("/", "/overlay"):
+            self._send_cached(OVERLAY_ETAG, OVERLAY_PAGE, "text/html; charset=utf-8")
+        elif url.path == "/leaderboard.json":
+            etag = self.headers.get("If-None-Match")
+            snapshot = self.feed.wait_for_change(top, etag, wait) if etag and wait else self.feed.snapshot
+            etag, body = snapshot.body(top)
+            self._send_cached(etag, body, "application/json")
+        elif url.path == "/events":
+            self._stream(top)
+        else:
+            self._send(404, b"not found\n", "text/plain; charset=utf-8")
+
+    def _send_cached(self, etag, body, content_type):
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send(200, body, content_type, etag)
+
+    def _send(self, status, body, content_type, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache") # always revalidate, the ETag makes that cheap
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, top):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        etag = None
+        try:
+            while not self.feed._stop.is_set():
+                snapshot = self.feed.wait_for_change(top, etag, HEARTBEAT)
+                new_etag, body = snapshot.body(top)
+                if new_etag == etag:
+                    self.wfile.write(b": still here\n\n")
+                else:
+                    etag = new_etag
+                    self.wfile.write(b"data: " + body + b"\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass # the viewer went away
+
+    def log_message(self, format, *args):
+        pass # a request per viewer per change would drown the console
+
+
+def make_server(storage, host=DEFAULT_HOST, port=DEFAULT_PORT, poll_interval=POLL_INTERVAL):
+    """Returns (server, feed). Call feed.start() and server.serve_forever() to run them."""
+    feed = Feed(storage, poll_interval)
+    handler = type("Handler", (OverlayHandler,), {"feed": feed})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, feed
+
+
+OVERLAY_PAGE = b"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Song Bump Leaderboard</title>
+<style>
+  body { margin: 0; background: transparent; color: #fff; font: 600 22px/1.35 system-ui, sans-serif;
+         text-shadow: 0 0 4px #000, 0 0 2px #000; }
+  #board { padding: 12px 16px; }
+  .row { display: flex; gap: 10px; }
+  .rank { width: 2em; text-align: right; opacity: .8; }
+  .name { flex: 1; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
+  .bump { color: #7CFC8A; }
+  .played { opacity: .55; }
+  #totals, #next { margin-top: 8px; font-size: 18px; opacity: .9; }
+</style>
+</head>
+<body>
+<div id="board"><div id="rows"></div><div id="totals"></div><div id="next"></div></div>
+<script>
+  const params = new URLSearchParams(location.search);
+  const top = params.get("top") || "10";
+  const esc = (s) => String(s).replace(/[&<>"]/g, (c) => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c]));
+
+  function render(data) {
+    document.getElementById("rows").innerHTML = data.leaderboard.map((row) =>
+      `<div class="row ${row.bumpable ? (row.song_played ? "played" : "bump") : ""}">` +
+      `<span class="rank">${row.rank}.</span><span class="name">${esc(row.name)}</span>` +
+      `<span>${esc(row.total_text)}</span></div>`).join("");
+    const t = data.totals;
+    document.getElementById("totals").textContent =
+      `Total ${t.monetary_text} \\u00b7 Subs ${t.subs}/${t.sub_goal}`;
+    document.getElementById("next").textContent =
+      data.next_up.length ? `Next up: ${data.next_up.join(", ")}` : "";
+  }
+
+  // Server-sent events reconnect on their own if the server restarts
+  new EventSource(`events?top=${encodeURIComponent(top)}`).onmessage = (event) => render(JSON.parse(event.data));
+</script>
+</body>
+</html>
+"""
+OVERLAY_ETAG = '"' + hashlib.blake2s(OVERLAY_PAGE, digest_size=8).hexdigest() + '"'
+
+
+def main():
+    from songbump.storage import add_storage_arguments, storage_from_args
+
+    parser = argparse.ArgumentParser(description="Serve the live leaderboard to OBS browser sources and other viewers.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--poll", type=float, default=POLL_INTERVAL, help="seconds between storage syncs")
+    add_storage_arguments(parser)
+    args = parser.parse_args()
+
+    # Read-only: the overlay never migrates, compacts or writes the app's files
+    server, feed = make_server(storage_from_args(args, read_only=True), args.host, args.port, args.poll)
+    feed.start()
+    print(f"Overlay at http://{args.host}:{args.port}/ (add ?top=5 for fewer rows), JSON at /leaderboard.json")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
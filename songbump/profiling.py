@@ -0,0 +1,120 @@
+"""Opt-in timing for Streamlit reruns.
+
+Turn it on with ?debug=1 in the page URL or SONGBUMP_PROFILE=1 in the
+environment. Each rerun then records:
+
+- the wall time of every named phase (the script calls lap(name) at the
+  end of each section, so no code has to be re-indented);
+- how many syncs and writes the storage did, the rows read and written,
+  and the bytes written (journal backend only, SQLite doesn't say);
+- optionally a cProfile capture of the whole rerun.
+
+Every report is appended as one JSON line to songbump-trace.jsonl, and
+cProfile captures are saved under profiles/ for snakeviz or pstats.
+
+When it is off, start() hands back a shared object whose lap() does
+nothing, so the instrumented script costs a few method calls per rerun.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+
+TRACE_FILE = "songbump-trace.jsonl"
+PROFILE_DIR = "profiles"
+TOP_FUNCTIONS = 25 # rows of the cProfile summary shown in the debug panel
+
+
+def enabled(query_params=None):
+    """True if profiling was asked for by the environment or a ?debug=1 URL."""
+    if os.environ.get("SONGBUMP_PROFILE", "") not in ("", "0"):
+        return True
+    return query_params is not None and query_params.get("debug") == "1"
+
+
+class RerunProfiler:
+    """Times one rerun, phase by phase."""
+
+    enabled = True
+
+    def __init__(self, storage=None, cprofile=False, trace_path=TRACE_FILE, profile_dir=PROFILE_DIR):
+        self.storage = storage
+        self.trace_path = trace_path
+        self.profile_dir = profile_dir
+        self.phases = {} # phase -> seconds, in the order they ran
+        self.report = None
+        self._stats_before = dict(storage.stats) if storage is not None else {}
+        self._profile = None
+        if cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._started = self._last = time.perf_counter()
+
+    def lap(self, name):
+        """Charges the time since the previous lap to the named phase."""
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last)
+        self._last = now
+
+    def finish(self):
+        """Stops the clock, writes the trace line and returns the report."""
+        total = time.perf_counter() - self._started
+        report = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_ms": round(total * 1000, 3),
+            "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+            "storage": self._storage_delta(),
+        }
+        if self._profile is not None:
+            self._profile.disable()
+            report["profile"] = self._save_profile()
+            report["profile_top"] = self._top_functions()
+        self.report = report
+        self._append_trace(report)
+        return report
+
+    def _storage_delta(self):
+        if self.storage is None:
+            return {}
+        return {key: value - self._stats_before.get(key, 0) for key, value in self.storage.stats.items()}
+
+    def _save_profile(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, time.strftime("rerun-%Y%m%d-%H%M%S") + f"-{os.getpid()}.prof")
+        self._profile.dump_stats(path)
+        return path
+
+    def _top_functions(self):
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        return out.getvalue()
+
+    def _append_trace(self, report):
+        line = {key: value for key, value in report.items() if key != "profile_top"}
+        with open(self.trace_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+
+
+class _Disabled:
+    """Stands in for RerunProfiler when profiling is off."""
+
+    enabled = False
+    report = None
+
+    def lap(self, name):
+        pass
+
+    def finish(self):
+        return None
+
+
+DISABLED = _Disabled()
+
+
+def start(enabled, storage=None, cprofile=False):
+    """Returns a profiler for this rerun, or the do-nothing one when profiling is off."""
+    if not enabled:
+        return DISABLED
+    return RerunProfiler(storage, cprofile=cprofile)
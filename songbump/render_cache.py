@@ -0,0 +1,44 @@
+"""Per-user render cache for leaderboard rows.
+
+A rerun usually changes one user at most, but every visible row used to
+rebuild its contribution text, bump badge and markup from scratch. The
+cache keeps whatever render(name, data) returned for each user together
+with the row version it was built from.
+
+It subscribes to the session or storage like the leaderboard index does:
+a changed user is evicted on update(), a deleted one too, and reset()
+(load or clear) empties it. The version check on every lookup catches
+anything that slipped past the listener, e.g. a row read by another
+Streamlit session thread just before someone else's write.
+"""
+
+
+class RenderCache:
+    """Session listener that remembers render(name, data) per user until that user changes."""
+
+    def __init__(self, render):
+        self.render = render
+        self.hits = 0
+        self.misses = 0
+        self._entries = {} # name -> (version, rendered)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name, data):
+        """Returns the rendered row for a user, building it only if their data changed."""
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == data.version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        rendered = self.render(name, data)
+        self._entries[name] = (data.version, rendered)
+        return rendered
+
+    # --- Listener ---
+    def update(self, name, data):
+        self._entries.pop(name, None)
+
+    def reset(self, users):
+        self._entries.clear()
@@ -0,0 +1,325 @@
+"""SQLite storage backend (WAL mode) for the users table.
+
+One row per user, with the totals in plain integer columns so the
+leaderboard and the bump queue can be read straight off an index:
+
+    users_by_total - monetary_total DESC, for leaderboard pages
+    users_by_bump  - bumpable, song_played, monetary_total DESC, for the next bumps
+
+page(), bump_queue() and count() use them for tools that only want a
+slice of a database, like the inspector at the bottom. The app doesn't:
+like every storage this one keeps all rows in memory for its listeners,
+and the app pages from its LeaderboardIndex and BumpQueue, so a rerun
+only touches the database for the sync.
+
+Writes are single-row upserts inside a short transaction, never a rewrite of
+the whole session. WAL mode lets any number of readers (other Streamlit
+processes, the overlay, a mod running the CLI) keep reading while one
+process writes.
+
+Every write stamps the rows it touched with the next change number. A sync
+reads one meta row and, only if something changed, fetches just the rows
+stamped after the last one it saw. Clearing the session bumps a generation
+number instead, which makes every other process reload.
+
+The first time a database is opened next to an existing users.json and
+journal, they are loaded (running the usual schema migration) and copied
+in. After that the JSON files are left alone. A read-only storage skips
+all of that and expects a database the app has already set up.
+
+    python -m songbump.sqlite_store users.db
+"""
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+from songbump.contributions import new_user, recalculate
+from songbump.core import Contributor, as_contributor
+from songbump.journal import JOURNAL_FILE, SCHEMA_VERSION, SNAPSHOT_FILE
+from songbump.money import format_dollars
+from songbump.storage import DB_FILE, ReadOnlyError, Storage, synced_in
+
+# --- Columns ---
+COLUMNS = tuple(new_user()) # same fields, same order as a users.json row
+BOOL_COLUMNS = ("bumpable", "song_played")
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS users (name TEXT PRIMARY KEY, "
+    + ", ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in COLUMNS)
+    + ", seq INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS users_by_total ON users (monetary_total DESC, name)",
+    "CREATE INDEX IF NOT EXISTS users_by_bump ON users (bumpable, song_played, monetary_total DESC, name)",
+    "CREATE INDEX IF NOT EXISTS users_by_seq ON users (seq)",
+    # Deleted names, so other processes can drop them on their next sync
+    "CREATE TABLE IF NOT EXISTS deleted (name TEXT PRIMARY KEY, seq INTEGER NOT NULL)",
+]
+_SELECT = "SELECT name, " + ", ".join(COLUMNS) + " FROM users"
+_UPSERT = (
+    "INSERT INTO users (name, " + ", ".join(COLUMNS) + ", seq) VALUES (" + ", ".join("?" * (len(COLUMNS) + 2)) + ") "
+    "ON CONFLICT (name) DO UPDATE SET " + ", ".join(f"{column} = excluded.{column}" for column in COLUMNS)
+    + ", seq = excluded.seq"
+)
+
+
+def _row_to_user(row):
+    data = Contributor.from_values(row[0], row[1:])
+    for column in BOOL_COLUMNS:
+        setattr(data, column, bool(getattr(data, column)))
+    return data
+
+
+def _user_to_row(name, data, seq):
+    return (name, *(int(data.get(column, 0)) for column in COLUMNS), seq)
+
+
+class SQLiteStorage(Storage):
+    """In-memory session backed by an SQLite database."""
+
+    def __init__(self, db_path=DB_FILE, snapshot_path=SNAPSHOT_FILE, journal_path=JOURNAL_FILE, read_only=False):
+        super().__init__(read_only)
+        self.db_path = db_path
+        self._seq = 0 # last change number we have applied
+        self._generation = None
+        if read_only:
+            self._open_read_only()
+            self.load()
+            return
+        self._db = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL") # safe in WAL mode, commits only fsync at checkpoints
+        with self._transaction():
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            existing = {row[1] for row in self._db.execute("PRAGMA table_info(users)")}
+            for column in COLUMNS:
+                if column not in existing: # database from an older version of the app
+                    self._db.execute(f"ALTER TABLE users ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            if self._meta("schema") is None:
+                self._import_json(snapshot_path, journal_path)
+        self.load()
+
+    def _open_read_only(self):
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"No database at {self.db_path}, start the app with --storage sqlite first")
+        uri = "file:" + pathname2url(os.path.abspath(self.db_path)) + "?mode=ro"
+        self._db = sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None, check_same_thread=False)
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(users)")}
+        if not existing.issuperset(COLUMNS) or self._meta("schema") is None:
+            self._db.close()
+            raise ReadOnlyError(f"{self.db_path} needs setting up or migrating, open it once with the app first")
+
+    # --- Transactions and meta ---
+    def _transaction(self, write=True):
+        if write:
+            self._check_writable()
+        return _Transaction(self._db, self._lock, write)
+
+    def _meta(self, key, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _next_seq(self):
+        seq = self._meta("seq", 0) + 1
+        self._set_meta("seq", seq)
+        return seq
+
+    def _import_json(self, snapshot_path, journal_path):
+        """Copies an existing JSON session into a brand new database (runs once)."""
+        if os.path.exists(snapshot_path) or os.path.exists(journal_path):
+            from songbump.journal import Journal
+            users = Journal(snapshot_path, journal_path).users # migrates old float-dollar files on the way
+            self._db.executemany(_UPSERT, (_user_to_row(name, data, 1) for name, data in users.items()))
+        self._set_meta("schema", SCHEMA_VERSION)
+        self._set_meta("seq", 1)
+        self._set_meta("generation", 1)
+
+    # --- Loading ---
+    @synced_in
+    def load(self):
+        """Reads every user. Only needed once per process, later changes come in through sync."""
+        with self._transaction(write=False):
+            self._generation = self._meta("generation")
+            self._seq = self._meta("seq", 0)
+            self.users = {row[0]: _row_to_user(row) for row in self._db.execute(_SELECT)}
+        self.stats["rows_read"] += len(self.users)
+        self._refresh_bump_flags()
+        self._notify_reset()
+
+    def _refresh_bump_flags(self):
+        # bump_rules.json may have been edited since these rows were written
+        changed = {}
+        for name, data in self.users.items():
+            was_bumpable = data.bumpable
+            if recalculate(data).bumpable != was_bumpable:
+                changed[name] = data
+        if changed and not self.read_only: # read-only just shows the recalculated flags
+            self.put_many(changed)
+
+    @synced_in
+    def sync(self):
+        """Applies rows changed by other processes since the last load or sync."""
+        with self._lock:
+            self.stats["syncs"] += 1
+            meta = dict(self._db.execute("SELECT key, value FROM meta WHERE key IN ('seq', 'generation')"))
+            if meta.get("generation") != self._generation:
+                self.load() # someone cleared the session
+                return
+            if meta.get("seq", 0) == self._seq:
+                return # nothing new, which is the usual case for a rerun
+
+            with self._transaction(write=False):
+                seq = self._meta("seq", 0)
+                changed = {row[0]: _row_to_user(row) for row in self._db.execute(_SELECT + " WHERE seq > ?", (self._seq,))}
+                deleted = [row[0] for row in self._db.execute("SELECT name FROM deleted WHERE seq > ?", (self._seq,))]
+            self._seq = seq
+            self.stats["rows_read"] += len(changed) + len(deleted)
+            for name in deleted:
+                if name not in changed and self.users.pop(name, None) is not None:
+                    self._notify(name)
+            for name, data in changed.items():
+                self.users[name] = data
+                self._notify(name)
+
+    # --- Writing ---
+    def put(self, name, data, expected_version=None):
+        """Stores the full row for one user."""
+        self.put_many({name: data}, None if expected_version is None else {name: expected_version})
+
+    def put_many(self, rows, expected=None):
+        """Stores several full rows (name -> data) in one transaction.
+
+        expected maps names to the version the caller read them at. If any of
+        them has been written since, nothing is stored and ConflictError is raised.
+        """
+        if not rows:
+            return
+        rows = {name: as_contributor(name, data) for name, data in rows.items()}
+        with self._lock:
+            with self._transaction():
+                # The write transaction keeps every other process out until we commit
+                versions = {}
+                for name in rows:
+                    row = self._db.execute("SELECT version FROM users WHERE name = ?", (name,)).fetchone()
+                    versions[name] = 0 if row is None else row[0]
+                self._check_versions(expected, versions.get)
+                for name, data in rows.items():
+                    data["version"] = versions[name] + 1
+                    recalculate(data)
+                seq = self._next_seq()
+                self._db.executemany(_UPSERT, (_user_to_row(name, data, seq) for name, data in rows.items()))
+                self._db.executemany("DELETE FROM deleted WHERE name = ?", ((name,) for name in rows))
+            self._advance(seq)
+            self.stats["writes"] += 1
+            self.stats["rows_written"] += len(rows)
+            for name, data in rows.items():
+                self.users[name] = data
+                self._notify(name)
+
+    def delete(self, name):
+        self._check_writable()
+        with self._lock:
+            self.users.pop(name, None)
+            self._notify(name)
+            with self._transaction():
+                seq = self._next_seq()
+                self._db.execute("DELETE FROM users WHERE name = ?", (name,))
+                self._db.execute("INSERT OR REPLACE INTO deleted (name, seq) VALUES (?, ?)", (name, seq))
+            self._advance(seq)
+            self.stats["writes"] += 1
+            self.stats["rows_written"] += 1
+
+    def clear(self):
+        with self._lock:
+            with self._transaction():
+                self._db.execute("DELETE FROM users")
+                self._db.execute("DELETE FROM deleted")
+                self._generation = self._meta("generation", 0) + 1
+                self._set_meta("generation", self._generation)
+                self._seq = self._next_seq()
+            self.stats["writes"] += 1
+            self.users.clear()
+            self._notify_reset()
+
+    def _advance(self, seq):
+        # Only skip past our own write if nobody else wrote before it,
+        # otherwise the next sync fetches both (re-reading ours is harmless)
+        if seq == self._seq + 1:
+            self._seq = seq
+
+    def compact(self):
+        """Folds the WAL back into the database file."""
+        self._check_writable()
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- Indexed queries ---
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def page(self, offset, limit):
+        """Returns one leaderboard page as (name, data) pairs, highest total first."""
+        with self._lock:
+            rows = self._db.execute(
+                _SELECT + " ORDER BY monetary_total DESC, name LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [(row[0], _row_to_user(row)) for row in rows]
+
+    def bump_queue(self, limit=None):
+        """Returns bumpable users whose song has not been played yet, highest total first."""
+        with self._lock:
+            rows = self._db.execute(
+                _SELECT + " WHERE bumpable = 1 AND song_played = 0 ORDER BY monetary_total DESC, name LIMIT ?",
+                (-1 if limit is None else limit,),
+            ).fetchall()
+        return [(row[0], _row_to_user(row)) for row in rows]
+
+
+class _Transaction:
+    """BEGIN ... COMMIT under the storage lock, rolled back on errors.
+
+    Reads get a consistent snapshot without blocking anyone. Writes take the
+    database write lock up front, so they never fail half way through.
+    """
+
+    def __init__(self, db, lock, write=True):
+        self.db = db
+        self.lock = lock
+        self.write = write
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE" if self.write else "BEGIN")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+def main(path):
+    storage = SQLiteStorage(path)
+    print(f"{storage.count()} users")
+    for rank, (name, data) in enumerate(storage.page(0, 10), start=1):
+        print(f"{rank}. {name}: {format_dollars(data['monetary_total'])}")
+    queue = storage.bump_queue()
+    print("Next bumps: " + (", ".join(name for name, _ in queue) if queue else "none"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else DB_FILE)
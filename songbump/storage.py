@@ -0,0 +1,155 @@
+"""Pluggable storage for the users table.
+
+Every backend is a songbump.core.Session: it keeps the session's users in
+memory as Contributors (name -> Contributor) and exposes the same handful
+of calls, so the front ends, the importer
+and the live ingest don't care where the rows end up:
+
+    users                 name -> Contributor, current as of the last sync or write
+    subscribe(listener)   listener.reset(users) now, listener.update(name, data) on every change
+    sync()                pick up changes written by other processes
+    update(name, change)  apply change(data) to the latest copy of one row and store it
+    update_many(changes)  the same for several users in one write
+    put(name, data)       store one full row as is (last writer wins)
+    put_many(rows)        store several rows in one write
+    delete(name) / clear()
+
+Several moderators (and the importer and live ingest) can write at once.
+Every row carries a version number that goes up on each write. update()
+is optimistic: it computes the new row from a fresh copy without holding
+any lock, then the backend stores it only if the version is still the one
+it started from (the journal checks under a lock file, SQLite inside a
+write transaction). If someone else got there first, their row is synced
+in and the change is applied again on top of it, so both edits survive.
+
+Backends:
+
+    journal - users.json snapshot plus an append-only JSONL journal (default)
+    sqlite  - one SQLite database in WAL mode (songbump.sqlite_store)
+
+Pick one with the SONGBUMP_STORAGE environment variable, e.g.
+SONGBUMP_STORAGE=sqlite.
+
+Viewers that only follow along (the overlay) open storage with
+read_only=True: nothing is migrated, compacted or created, and every
+write raises ReadOnlyError.
+"""
+import functools
+import os
+import threading
+
+from songbump.core import Session
+
+BACKENDS = ("journal", "sqlite")
+DEFAULT_BACKEND = "journal"
+DB_FILE = "users.db"
+MAX_RETRIES = 50 # conflicting writes in a row before update() gives up
+
+# Running counters every backend keeps (see songbump.profiling)
+STAT_KEYS = ("syncs", "rows_read", "writes", "rows_written", "bytes_written")
+
+
+class ConflictError(Exception):
+    """Raised when a user was written by someone else after the version the caller read."""
+
+
+class ReadOnlyError(Exception):
+    """Raised when a storage opened with read_only=True would have to write."""
+
+
+class Storage(Session):
+    """Optimistic updates and counters shared by every backend."""
+
+    def __init__(self, read_only=False):
+        super().__init__()
+        self.read_only = read_only
+        self.conflicts = 0 # writes that had to be merged and retried
+        self.stats = dict.fromkeys(STAT_KEYS, 0)
+        self._lock = threading.RLock() # one storage is shared by every Streamlit session thread
+        self._local = threading.local()
+
+    @property
+    def syncing(self):
+        """True while this thread is applying changes read from other processes (a sync or a load).
+
+        Listeners use it to tell those apart from this process's own writes,
+        even when a write syncs first (see songbump.history).
+        """
+        return getattr(self._local, "syncing", False)
+
+    def version(self, name):
+        """Returns the version of a user's row as of the last sync (0 if there is no such user)."""
+        data = self.users.get(name)
+        return 0 if data is None else data.version
+
+    # --- Optimistic updates ---
+    def update_many(self, changes, retries=MAX_RETRIES):
+        """Applies each change(data) to the latest copy of that user's row and stores them in one write."""
+        for _ in range(retries):
+            with self._lock:
+                self.sync()
+                rows = {name: self._copy(name) for name in changes}
+                expected = {name: self.version(name) for name in changes}
+            for name, change in changes.items():
+                change(rows[name])
+            try:
+                self.put_many(rows, expected)
+                return rows
+            except ConflictError:
+                self.conflicts += 1 # someone else wrote first, merge on top of theirs
+        raise ConflictError(f"Gave up on {', '.join(changes)} after {retries} conflicting writes")
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ReadOnlyError(f"{type(self).__name__} was opened read-only")
+
+    def _check_versions(self, expected, current):
+        """Raises ConflictError if any user's current version is not the expected one."""
+        for name, version in (expected or {}).items():
+            if current(name) != version:
+                raise ConflictError(name)
+
+
+def synced_in(method):
+    """Marks every change a sync or load method notifies as read from elsewhere (see Storage.syncing)."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        outer = self.syncing
+        self._local.syncing = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._local.syncing = outer
+    return wrapper
+
+
+def open_storage(backend=None, snapshot_path=None, journal_path=None, db_path=None, read_only=False):
+    """Opens the configured backend. Leave backend as None to use $SONGBUMP_STORAGE."""
+    from songbump.journal import JOURNAL_FILE, SNAPSHOT_FILE
+
+    backend = backend or os.environ.get("SONGBUMP_STORAGE") or DEFAULT_BACKEND
+    snapshot_path = snapshot_path or SNAPSHOT_FILE
+    journal_path = journal_path or JOURNAL_FILE
+    if backend == "journal":
+        from songbump.journal import Journal
+        return Journal(snapshot_path, journal_path, read_only=read_only)
+    if backend == "sqlite":
+        from songbump.sqlite_store import SQLiteStorage
+        # The JSON files are only read once, to migrate an existing session
+        return SQLiteStorage(db_path or DB_FILE, snapshot_path, journal_path, read_only=read_only)
+    raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def add_storage_arguments(parser):
+    """Adds the --storage/--snapshot/--journal/--db options the command line tools share."""
+    from songbump.journal import JOURNAL_FILE, SNAPSHOT_FILE
+
+    parser.add_argument("--storage", choices=BACKENDS, help="storage backend (default: $SONGBUMP_STORAGE or journal)")
+    parser.add_argument("--snapshot", default=SNAPSHOT_FILE)
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database for --storage sqlite")
+
+
+def storage_from_args(args, read_only=False):
+    return open_storage(args.storage, args.snapshot, args.journal, args.db, read_only)
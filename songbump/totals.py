@@ -0,0 +1,117 @@
+"""Grand totals for the whole session, kept up to date one user change at a time.
+
+Instead of zeroing the totals and walking every user on each rerun, the
+totals remember what each user last contributed. A change to one user
+subtracts that user's old share and adds the new one, so adds,
+subtract-mode edits and deletes all cost O(1) in plain Python.
+
+A full reload goes through the columnar store instead: a few vectorized
+sums, and every user's share packed into one integer array row. Only users
+that change after that get a share tuple of their own.
+"""
+import numpy as np
+
+from songbump.columnar import ColumnarStore
+
+# --- Grand total fields, in display order ---
+GRAND_TOTAL_KEYS = (
+    "total_monetary",
+    "total_resubs_value",
+    "total_gifted_subs_value",
+    "total_donos",
+    "total_bits_value",
+    "total_bits_amount",
+    "total_subs_count",
+    # --- RAW COUNTS ---
+    "total_gifted_subs_count", # Total gifted subs (Tier 1, 2, 3)
+    "total_resubs_count",      # Total Tier 1, 2, or 3 resubs (not value, just the count of active subs)
+    "total_tier1",
+    "total_tier2",
+    "total_tier3",
+)
+MONEY_KEYS = ("total_monetary", "total_resubs_value", "total_gifted_subs_value", "total_donos", "total_bits_value") # cents
+
+
+def empty_totals():
+    return {key: 0 for key in GRAND_TOTAL_KEYS}
+
+
+def share_columns(cols):
+    """Returns what each row adds to each grand total, one array per key in GRAND_TOTAL_KEYS order."""
+    resub_active = (cols["resub_tier"] > 0).astype(np.int64) # only the highest active tier counts, so 1 per user at most
+    return (
+        cols["monetary_total"],
+        cols["resub_total"],
+        cols["gifted_subs_total"],
+        cols["donos"],
+        cols["bits_total"],
+        cols["num_bits"],
+        resub_active + cols["gifted_subs_count"], # simplified sub count for the sub goal
+        cols["gifted_subs_count"],
+        resub_active,
+        cols["tier1"],
+        cols["tier2"],
+        cols["tier3"],
+    )
+
+
+def user_share(data):
+    """Returns what one user adds to each grand total, in GRAND_TOTAL_KEYS order."""
+    resub_active = 1 if data["resub_tier"] > 0 else 0
+    return (
+        data["monetary_total"],
+        data["resub_total"],
+        data["gifted_subs_total"],
+        data["donos"],
+        data["bits_total"],
+        data["num_bits"],
+        resub_active + data["gifted_subs_count"],
+        data["gifted_subs_count"],
+        resub_active,
+        data["tier1"],
+        data["tier2"],
+        data["tier3"],
+    )
+
+
+def grand_totals(store, name=None):
+    """Sums the shares of every user in the store, or of a single user."""
+    return {key: column.sum().item() for key, column in zip(GRAND_TOTAL_KEYS, share_columns(store.columns(name)))}
+
+
+class GrandTotals:
+    """Journal listener that keeps the session's grand totals current."""
+
+    def __init__(self):
+        self.values = empty_totals()
+        self._rows = {} # name -> row in _baseline, for users loaded by the last reset
+        self._baseline = np.zeros((0, len(GRAND_TOTAL_KEYS)), np.int64) # one packed share row per loaded user
+        self._shares = {} # name -> share tuple for users changed since, None once deleted
+
+    def reset(self, users):
+        store = ColumnarStore.from_users(users)
+        columns = share_columns(store.columns())
+        self.values = {key: column.sum().item() for key, column in zip(GRAND_TOTAL_KEYS, columns)}
+        self._rows = store.index
+        self._baseline = np.column_stack(columns) if store.size else np.zeros((0, len(GRAND_TOTAL_KEYS)), np.int64)
+        self._shares = {}
+
+    def update(self, name, data):
+        """Moves one user's share from their old contributions to the new ones (data is None on delete)."""
+        old_share = self._shares.get(name, self)
+        if old_share is self: # not changed since the reset, so it's still in the packed rows
+            row = self._rows.get(name)
+            old_share = None if row is None else self._baseline[row].tolist()
+        if old_share is not None:
+            self._add(old_share, -1)
+        if data is None:
+            self._shares[name] = None
+        else:
+            share = user_share(data)
+            self._shares[name] = share
+            self._add(share, 1)
+
+    def _add(self, share, sign):
+        values = self.values
+        for key, amount in zip(GRAND_TOTAL_KEYS, share):
+            values[key] += sign * amount # integer cents and counts, so this never drifts
@@ -0,0 +1,284 @@
+"""Asyncio live ingest of subs, gifts and bits from Twitch chat (TMI / IRC).
+
+Connects anonymously to the channel's chat, turns USERNOTICE sub, resub,
+subgift and submysterygift notices and PRIVMSG bits= tags into
+contributions, and commits them to the journal in batches. The Streamlit
+app picks the changes up on its next rerun, so the UI never waits on chat.
+
+- Backpressure: parsed events go through a bounded queue. If committing
+  falls behind, the reader stops pulling from the socket until there is
+  room again.
+- Batching: events are folded into one delta per user and written with a
+  single journal append every BATCH_SIZE events or FLUSH_INTERVAL seconds.
+- Reconnects: dropped connections and server RECONNECT notices are retried
+  with exponential backoff.
+- Failed commits: a batch that lost a write race too often (ConflictError)
+  is retried, since nothing of it was written. Anything else, e.g. an
+  OSError from the journal, may have left part of the batch on disk, so
+  retrying could count it twice: the service stops reading and run()
+  raises the error instead.
+
+    python -m songbump.twitch_ingest --channel somechannel
+    python -m songbump.twitch_ingest --channel test --host 127.0.0.1 --port 6667 --no-tls --once
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from songbump.importer import aggregate, commit_deltas
+from songbump.storage import ConflictError
+
+# --- Connection defaults ---
+DEFAULT_HOST = "irc.chat.twitch.tv"
+DEFAULT_PORT = 6697 # TLS, use 6667 for plain text
+ANONYMOUS_NICK = "justinfan12345" # read-only login that needs no token
+
+# --- Batching and backpressure ---
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0 # seconds
+QUEUE_SIZE = 10000
+MAX_BACKOFF = 30 # seconds between reconnect attempts
+COMMIT_ATTEMPTS = 5 # tries per batch when it keeps losing write races to other mods
+
+SUB_PLANS = {"1000": 1, "2000": 2, "3000": 3, "Prime": 1}
+_STOP = object() # tells the batcher to flush and exit
+
+_TAG_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
+# --- Parsing ---
+def _unescape(value):
+    if "\\" not in value:
+        return value
+    out = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            escaped = next(chars, "")
+            out.append(_TAG_ESCAPES.get(escaped, escaped))
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def parse_line(line):
+    """Splits one IRC line into (tags, prefix, command, params)."""
+    tags = {}
+    if line.startswith("@"):
+        raw_tags, _, line = line[1:].partition(" ")
+        for item in raw_tags.split(";"):
+            key, _, value = item.partition("=")
+            tags[key] = _unescape(value)
+    prefix = None
+    if line.startswith(":"):
+        prefix, _, line = line[1:].partition(" ")
+    line, has_trailing, trailing = line.partition(" :")
+    params = line.split()
+    if has_trailing:
+        params.append(trailing)
+    command = params.pop(0).upper() if params else ""
+    return tags, prefix, command, params
+
+
+def contribution_from_message(tags, prefix, command):
+    """Returns a (user, kind, amount, tier) contribution for a chat message, or None."""
+    user = tags.get("display-name") or tags.get("login") or (prefix or "").split("!")[0]
+    if not user:
+        return None
+
+    if command == "PRIVMSG":
+        bits = tags.get("bits")
+        if bits and bits.isdigit():
+            return user, "bits", int(bits), 1
+        return None
+
+    if command != "USERNOTICE":
+        return None
+    msg_id = tags.get("msg-id")
+    tier = SUB_PLANS.get(tags.get("msg-param-sub-plan", "1000"), 1)
+    if msg_id in ("sub", "resub"):
+        return user, "resub", 1, tier
+    if msg_id in ("subgift", "anonsubgift"):
+        if tags.get("msg-param-community-gift-id"):
+            return None # one of the gifts from a submysterygift, already counted there
+        return user, "gifted", 1, tier
+    if msg_id in ("submysterygift", "anonsubmysterygift"):
+        count = tags.get("msg-param-mass-gift-count", "1")
+        return user, "gifted", int(count) if count.isdigit() else 1, tier
+    return None
+
+
+# --- Service ---
+class IngestService:
+    """Reads chat and commits contributions to a journal in batches."""
+
+    def __init__(self, journal, channel, host=DEFAULT_HOST, port=DEFAULT_PORT, tls=True, reconnect=True,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.journal = journal
+        self.channel = channel.lstrip("#").lower()
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.reconnect = reconnect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = {"lines": 0, "events": 0, "batches": 0, "reconnects": 0, "skipped_lines": 0, "retries": 0}
+        self._stopping = False
+
+    async def run(self):
+        """Reads until stopped (or until the first disconnect when reconnect is off), then flushes.
+
+        Raises whatever made a batch impossible to commit, after the reader
+        has been stopped.
+        """
+        batcher = asyncio.create_task(self._batch_loop())
+        reader = asyncio.create_task(self._read_loop())
+        try:
+            await asyncio.wait((reader, batcher), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not reader.done():
+                reader.cancel() # the batcher gave up, or run() itself was cancelled
+            await asyncio.wait((reader,))
+            if not batcher.done():
+                # Flush what is queued. The put waits while the queue is full, so stop
+                # waiting if the batcher fails in the meantime
+                stop = asyncio.ensure_future(self.queue.put(_STOP))
+                await asyncio.wait((stop, batcher), return_when=asyncio.FIRST_COMPLETED)
+                stop.cancel()
+                await asyncio.wait((batcher,))
+        batcher.result()
+        if not reader.cancelled():
+            reader.result()
+
+    def stop(self):
+        self._stopping = True
+
+    async def _read_loop(self):
+        delay = 1
+        while not self._stopping:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.tls or None)
+                await self._login(writer)
+                delay = 1 # connected fine, start the backoff over next time
+                await self._read_messages(reader, writer)
+            except OSError as error:
+                print(f"Chat connection failed: {error}")
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            if not self.reconnect or self._stopping:
+                return
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay + random.random()) # jitter so restarts don't stampede
+            delay = min(delay * 2, MAX_BACKOFF)
+
+    async def _login(self, writer):
+        writer.write(
+            "CAP REQ :twitch.tv/tags twitch.tv/commands\r\n"
+            f"NICK {ANONYMOUS_NICK}\r\n"
+            f"JOIN #{self.channel}\r\n".encode("utf-8")
+        )
+        await writer.drain()
+
+    async def _read_messages(self, reader, writer):
+        while not self._stopping:
+            try:
+                raw = await reader.readline()
+            except ValueError: # longer than the stream's limit, readline has dropped it
+                self.stats["skipped_lines"] += 1
+                continue
+            if not raw:
+                return # server closed the connection
+            self.stats["lines"] += 1
+            tags, prefix, command, params = parse_line(raw.decode("utf-8", "replace").rstrip("\r\n"))
+
+            if command == "PING":
+                writer.write(f"PONG :{params[-1] if params else 'tmi.twitch.tv'}\r\n".encode("utf-8"))
+                await writer.drain()
+            elif command == "RECONNECT":
+                return # Twitch is restarting this server, connect again
+            else:
+                event = contribution_from_message(tags, prefix, command)
+                if event is not None:
+                    await self.queue.put(event) # waits here when the batcher falls behind
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await self.queue.get()
+            if event is _STOP:
+                return
+            batch = [event]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            await self._commit(batch)
+            self.stats["events"] += len(batch)
+            self.stats["batches"] += 1
+            if stopping:
+                return
+
+    async def _commit(self, batch):
+        loop = asyncio.get_running_loop()
+        deltas = aggregate(batch)
+        for attempt in range(1, COMMIT_ATTEMPTS + 1):
+            try:
+                # Journal writes fsync, so keep them off the event loop
+                await loop.run_in_executor(None, commit_deltas, self.journal, deltas)
+                return
+            except ConflictError as error:
+                if attempt == COMMIT_ATTEMPTS:
+                    print(f"Giving up on a batch of {len(batch)} events: {error}")
+                    raise
+                print(f"Batch of {len(batch)} events kept conflicting, retrying: {error}")
+                self.stats["retries"] += 1
+                await asyncio.sleep(attempt * random.random()) # let the other writers finish
+            except Exception as error:
+                print(f"Committing a batch of {len(batch)} events failed, stopping: {error!r}")
+                raise
+
+
+def main():
+    from songbump.storage import add_storage_arguments, storage_from_args
+
+    parser = argparse.ArgumentParser(description="Track subs, gifts and bits from Twitch chat live.")
+    parser.add_argument("--channel", required=True)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--no-tls", action="store_true", help="plain-text connection (e.g. a local fake server)")
+    parser.add_argument("--once", action="store_true", help="exit when the connection closes instead of reconnecting")
+    add_storage_arguments(parser)
+    args = parser.parse_args()
+
+    service = IngestService(
+        storage_from_args(args), args.channel, args.host, args.port,
+        tls=not args.no_tls, reconnect=not args.once,
+    )
+    started = time.perf_counter()
+    try:
+        asyncio.run(service.run())
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - started
+    print(f"Read {service.stats['lines']} lines, committed {service.stats['events']} events "
+          f"in {service.stats['batches']} batches ({elapsed:.2f}s, {service.stats['reconnects']} reconnects)")
+
+
+if __name__ == "__main__":
+    main()
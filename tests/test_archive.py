@@ -0,0 +1,74 @@
+import sqlite3
+
+from songbump import analytics
+from songbump.archive import INDEX_FILE, ArchiveIndex, archive_session
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.core import Session
+
+NOW = 1760000000 # a fixed archive time, so every test stream lands in the same week
+
+
+def session_with(donos):
+    session = Session()
+    for name, cents in donos.items():
+        delta = empty_delta()
+        add_contribution(delta, "dono", cents)
+        session.update(name, lambda data, delta=delta: apply_delta(data, delta))
+    return session
+
+
+def test_names_that_differ_in_case_stay_apart(tmp_path):
+    archive_dir = str(tmp_path)
+    archive_session(session_with({"Alice": 500, "alice": 300}), archive_dir=archive_dir, now=NOW)
+    index = ArchiveIndex(archive_dir)
+    try:
+        assert [row["donos"] for row in index.user_history("Alice")] == [500]
+        assert [row["donos"] for row in index.user_history("alice")] == [300]
+        supporters = {row["name"]: row["donos"] for row in analytics.top_supporters(index, "week")}
+        assert supporters == {"Alice": 500, "alice": 300}
+        assert analytics.revenue(index, "week")[0]["donos"] == 800
+    finally:
+        index.close()
+
+
+def test_old_case_insensitive_index_is_rebuilt(tmp_path):
+    archive_dir = str(tmp_path)
+    archive_session(session_with({"Alice": 500, "alice": 300}), archive_dir=archive_dir, now=NOW)
+
+    # Make it look like a version 1 index, which merged the two into one row
+    db = sqlite3.connect(str(tmp_path / INDEX_FILE))
+    with db:
+        db.execute("DELETE FROM totals WHERE name = 'alice'")
+        db.execute("PRAGMA user_version = 1")
+    db.close()
+
+    index = ArchiveIndex(archive_dir)
+    try:
+        assert [row["donos"] for row in index.user_history("alice")] == [300]
+        assert len(index.streams()) == 1
+        assert analytics.revenue(index, "month")[0]["streams"] == 1
+    finally:
+        index.close()
+
+
+def test_catch_up_uses_each_streams_own_sub_goal(tmp_path, monkeypatch):
+    archive_dir = str(tmp_path)
+    session = Session()
+    delta = empty_delta()
+    add_contribution(delta, "gifted", 3)
+    session.update("alice", lambda data: apply_delta(data, delta))
+    monkeypatch.setattr(analytics, "SUB_GOAL", 3) # the goal that stream had
+    archive_session(session, archive_dir=archive_dir, now=NOW)
+    monkeypatch.setattr(analytics, "SUB_GOAL", 20)
+
+    # An index whose rollups were never filled in, so opening it rolls the stream up again
+    db = sqlite3.connect(str(tmp_path / INDEX_FILE))
+    with db:
+        analytics.clear(db)
+    db.close()
+
+    index = ArchiveIndex(archive_dir)
+    try:
+        assert analytics.revenue(index, "week")[0]["goal_hits"] == 1
+    finally:
+        index.close()
@@ -0,0 +1,69 @@
+import pytest
+
+from songbump.batch import command_line, parse_command, run
+from songbump.core import Session
+
+
+@pytest.mark.parametrize("line, parsed", [
+    ("add alice", ("add", "alice", None, None, None)),
+    ("resub alice", ("contribute", "alice", "resub", 1, 1)),
+    ("RESUB alice 3000", ("contribute", "alice", "resub", 1, 3)),
+    ("gift bob", ("contribute", "bob", "gifted", 1, 1)),
+    ("subgift bob 5 2", ("contribute", "bob", "gifted", 5, 2)),
+    ("cheer bob 100", ("contribute", "bob", "bits", 100, 1)),
+    ("bits bob -100", ("contribute", "bob", "bits", -100, 1)),
+    ("dono carol 4.995", ("contribute", "carol", "dono", 500, 1)),
+    ("tip carol -2.50", ("contribute", "carol", "dono", -250, 1)),
+    ("remove carol", ("delete", "carol", None, None, None)),
+    ("clear", ("clear", None, None, None, None)),
+    ("print", ("print", None, None, None, None)),
+])
+def test_parse_command(line, parsed):
+    assert parse_command(line) == parsed
+
+
+@pytest.mark.parametrize("line", ["dono", "dono carol", "dono carol lots", "bits bob 1.5", "resub alice 4", "follow alice"])
+def test_parse_command_refuses_nonsense(line):
+    with pytest.raises(ValueError):
+        parse_command(line)
+
+
+@pytest.mark.parametrize("contribution", [("alice", "resub", 1, 2), ("bob", "gifted", 3, 3), ("bob", "bits", 250, 1), ("carol", "dono", 1005, 1)])
+def test_command_line_parses_back(contribution):
+    user, kind, amount, tier = contribution
+    assert parse_command(command_line(*contribution)) == ("contribute", user, kind, amount, tier)
+
+
+def test_run_applies_commands_in_order():
+    lines = [
+        "# warm-up",
+        "bits alice 300",
+        "bits alice 300   # hype train",
+        "dono bob 5",
+        "print",
+        "dono dave 1",
+        "delete bob",
+        "bits carol 50",
+        "dono nobody abc",
+        "clear",
+        "add erin",
+        "dono erin 2.50",
+        "bits erin -100",
+        "",
+    ]
+    session = Session()
+    boards = []
+    summary = run(session, lines, show=lambda: boards.append({name: data.monetary_total for name, data in session.users.items()}))
+
+    assert boards == [{"alice": 600, "bob": 500}]
+    assert (summary.commands, summary.skipped) == (12, 1)
+    assert summary.errors == ["line 9: Not a dollar amount: 'abc'"]
+    assert {name: data.monetary_total for name, data in session.users.items()} == {"erin": 150}
+
+
+def test_run_shows_every_n_commands():
+    session = Session()
+    shown = []
+    run(session, [f"bits alice {i}" for i in range(1, 11)], show=lambda: shown.append(session.users["alice"].num_bits), every=4)
+    assert shown == [10, 36]
+    assert session.users["alice"].num_bits == 55
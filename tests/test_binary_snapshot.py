@@ -0,0 +1,72 @@
+import json
+
+from songbump import binary_snapshot
+from songbump.binary_snapshot import BinarySnapshot, encode, read, to_binary, to_json
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.journal import SCHEMA_VERSION, Journal
+
+
+def add(kind, amount, tier=1):
+    delta = empty_delta()
+    add_contribution(delta, kind, amount, tier)
+    return lambda data: apply_delta(data, delta)
+
+
+def app_snapshot(tmp_path):
+    """A users.json the way the app writes it, with ties, unicode and played songs."""
+    journal = Journal(str(tmp_path / "users.json"), str(tmp_path / "users.journal.jsonl"))
+    journal.update("alice", add("dono", 1250))
+    journal.update("bob", add("bits", 700))
+    journal.update("çhloé ✨", add("gifted", 3, 2))
+    journal.update("dave", add("resub", 1, 3))
+    journal.update("erin", add("dono", 700)) # same total as bob, ties go by name
+    journal.update("zed", lambda data: None) # nothing yet
+    journal.update("alice", lambda data: data.update(song_played=True))
+    journal.compact()
+    return journal
+
+
+def test_json_to_binary_and_back_is_byte_identical(tmp_path):
+    journal = app_snapshot(tmp_path)
+    original = (tmp_path / "users.json").read_bytes()
+
+    assert to_binary(str(tmp_path / "users.json"), str(tmp_path / "users.bin")) == len(journal.users)
+    assert binary_snapshot.is_binary(str(tmp_path / "users.bin"))
+    assert to_json(str(tmp_path / "users.bin"), str(tmp_path / "back.json")) == len(journal.users)
+    assert (tmp_path / "back.json").read_bytes() == original
+
+    users, schema = read(str(tmp_path / "users.bin"))
+    assert schema == SCHEMA_VERSION
+    assert users == {name: data.to_row() for name, data in journal.users.items()}
+    assert list(users) == list(journal.users) # session order is kept too
+
+
+def test_page_is_the_leaderboard_order(tmp_path):
+    journal = app_snapshot(tmp_path)
+    snapshot = BinarySnapshot.from_bytes(encode(journal.users))
+    ranked = sorted(journal.users.values(), key=lambda data: (-data.monetary_total, data.name))
+    everyone = snapshot.page(0, len(snapshot))
+    assert [name for name, _ in everyone] == [data.name for data in ranked]
+    assert snapshot.page(1, 2) == everyone[1:3]
+    assert snapshot.page(len(snapshot), 10) == []
+    assert snapshot.get("çhloé ✨") == journal.users["çhloé ✨"].to_row()
+    assert snapshot.get("nobody") is None
+
+
+def test_float_dollar_users_json_becomes_cents(tmp_path):
+    legacy = {"alice": {"donos": 2.5, "bits_total": 0.07, "num_bits": 7, "monetary_total": 2.57}}
+    (tmp_path / "users.json").write_text(json.dumps(legacy)) # from before the schema version
+    to_binary(str(tmp_path / "users.json"), str(tmp_path / "users.bin"))
+    users, schema = read(str(tmp_path / "users.bin"))
+    assert schema == SCHEMA_VERSION
+    assert (users["alice"]["donos"], users["alice"]["bits_total"], users["alice"]["monetary_total"]) == (250, 7, 257)
+
+
+def test_journal_with_a_binary_snapshot_reloads_the_same_rows(tmp_path):
+    journal = app_snapshot(tmp_path)
+    binary = Journal(str(tmp_path / "users.bin"), str(tmp_path / "bin.journal.jsonl"))
+    binary.put_many({name: data.copy() for name, data in journal.users.items()})
+    binary.compact()
+    reloaded = Journal(str(tmp_path / "users.bin"), str(tmp_path / "bin.journal.jsonl"))
+    rows = lambda storage: {name: {**data.to_row(), "version": 0} for name, data in storage.users.items()}
+    assert rows(reloaded) == rows(journal)
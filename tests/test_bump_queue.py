@@ -0,0 +1,60 @@
+import random
+
+from songbump.bump_queue import COMPACT_MIN, BumpQueue, waiting
+
+
+def row(total, bumpable=True, played=False):
+    return {"monetary_total": total, "bumpable": bumpable, "song_played": played}
+
+
+def test_peek_matches_a_full_scan():
+    rng = random.Random(5)
+    queue = BumpQueue()
+    users = {}
+    arrivals = {} # name -> when they last joined the queue
+    clock = 0
+    for step in range(5000):
+        name = f"u{rng.randrange(200)}"
+        if rng.random() < 0.1:
+            data = None
+        else:
+            data = row(rng.choice([600, 1000, rng.randrange(100000)]), rng.random() < 0.8, rng.random() < 0.2)
+        was_waiting = name in users and waiting(users[name])
+        if data is None:
+            users.pop(name, None)
+        else:
+            users[name] = data
+        if data is not None and waiting(data) and not was_waiting:
+            clock += 1
+            arrivals[name] = clock
+        queue.update(name, data)
+
+        if step % 100 == 0:
+            expected = sorted(
+                (name for name, data in users.items() if waiting(data)),
+                key=lambda name: (-users[name]["monetary_total"], arrivals[name]),
+            )
+            assert len(queue) == len(expected)
+            assert queue.peek(10) == expected[:10]
+            assert queue.peek(len(expected) + 5) == expected
+    assert len(queue._heap) <= 2 * len(queue) + COMPACT_MIN + 1 # stale entries get rebuilt away
+
+
+def test_played_or_unbumpable_users_leave_the_queue():
+    queue = BumpQueue()
+    queue.reset({"alice": row(900), "bob": row(900), "carol": row(700), "dave": row(5000, bumpable=False)})
+    assert queue.peek(5) == ["alice", "bob", "carol"] # equal totals keep their order
+    queue.update("alice", row(900, played=True))
+    queue.update("carol", row(1200)) # a bigger total moves them up
+    assert queue.peek(5) == ["carol", "bob"]
+    assert "alice" not in queue
+    queue.update("bob", None)
+    assert queue.peek() == ["carol"]
+    assert BumpQueue().peek(3) == []
+
+
+def test_a_raise_keeps_the_place_among_equal_totals():
+    queue = BumpQueue()
+    queue.reset({"alice": row(500), "bob": row(1000)})
+    queue.update("alice", row(1000))
+    assert queue.peek(2) == ["alice", "bob"] # alice was in line before bob
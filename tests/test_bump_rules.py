@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from songbump import columnar, core
+from songbump.bump_rules import RULE_FIELDS, RULES_FILE, BumpRules, load_rules
+from songbump.columnar import ColumnarStore
+from songbump.core import Contributor
+
+
+def write_rules(tmp_path, *rules):
+    path = tmp_path / "bump_rules.json"
+    path.write_text(json.dumps({"rules": list(rules)}))
+    return str(path)
+
+
+def test_rule_fields_exist_on_contributors_and_columns():
+    assert set(RULE_FIELDS) <= set(core.FIELDS)
+    assert set(RULE_FIELDS) <= set(columnar.FIELDS)
+    for rule in load_rules(RULES_FILE):
+        assert rule["field"] in RULE_FIELDS
+
+
+def test_typo_in_field_is_refused_at_load_time(tmp_path):
+    path = write_rules(tmp_path, {"name": "500+ bits", "field": "num_bit", "op": ">=", "value": 500})
+    with pytest.raises(ValueError, match="'num_bit'"):
+        load_rules(path)
+
+
+@pytest.mark.parametrize("rule", [
+    {"field": "num_bits", "op": "=>", "value": 500},
+    {"field": "num_bits", "op": ">=", "value": "500"},
+    {"field": ["num_bits"], "op": ">=", "value": 500},
+])
+def test_malformed_rules_are_refused(tmp_path, rule):
+    with pytest.raises(ValueError):
+        load_rules(write_rules(tmp_path, rule))
+
+
+def test_rules_agree_on_rows_contributors_and_columns(tmp_path):
+    rules = BumpRules(load_rules(write_rules(
+        tmp_path,
+        {"name": "500+ bits", "field": "num_bits", "op": ">=", "value": 500},
+        {"name": "Over $5.99", "field": "donos", "op": ">", "value": 5.99},
+    )))
+    users = {}
+    for name, bits, donos in (("a", 499, 599), ("b", 500, 0), ("c", 0, 600)):
+        data = Contributor(name)
+        data.num_bits, data.donos = bits, donos
+        users[name] = data
+    expected = {"a": False, "b": True, "c": True}
+    assert {name: rules.is_bumpable_contributor(data) for name, data in users.items()} == expected
+    assert {name: rules.is_bumpable(data.to_row()) for name, data in users.items()} == expected
+    assert rules.mask(ColumnarStore.from_users(users).columns()).tolist() == [False, True, True]
+    assert rules.reason(users["c"]) == "Over $5.99"
@@ -0,0 +1,18 @@
+from songbump.core import ChangeCounter, Session
+
+
+def test_change_counter_tells_edits_from_users_coming_and_going():
+    session = Session()
+    changes = ChangeCounter()
+    session.subscribe(changes)
+    assert (changes.value, changes.user_set) == (1, 1)
+
+    session.update("alice", lambda data: data.update(donos=100))
+    assert (changes.value, changes.user_set) == (2, 2)
+    session.update("alice", lambda data: data.update(donos=200)) # an edit, nothing to redraw around it
+    assert (changes.value, changes.user_set) == (3, 2)
+    session.delete("alice")
+    session.delete("alice")
+    assert changes.user_set == 3
+    session.update("alice", lambda data: data.update(donos=100))
+    assert changes.user_set == 4
@@ -0,0 +1,134 @@
+import csv
+import threading
+import time
+import zipfile
+
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.core import Session
+from songbump.exporter import LEADERBOARD_COLUMNS, CSVSink, Exporter, Sink, XLSXSink
+
+
+def add(kind, amount):
+    delta = empty_delta()
+    add_contribution(delta, kind, amount)
+    return lambda data: apply_delta(data, delta)
+
+
+def board():
+    session = Session()
+    session.update("alice", add("dono", 250))
+    session.update("bob", add("dono", 1000))
+    session.update("carol <3 & co", add("bits", 100))
+    return session
+
+
+class CountingSink(Sink):
+    def __init__(self):
+        self.exports = []
+
+    def write(self, export):
+        self.exports.append(export)
+
+
+class BlockingSink(Sink):
+    """Holds every write until released, counting writers that overlap."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.writing = self.most_at_once = self.writes = 0
+        self._lock = threading.Lock()
+
+    def write(self, export):
+        with self._lock:
+            self.writing += 1
+            self.most_at_once = max(self.most_at_once, self.writing)
+        self.started.set()
+        self.release.wait(5)
+        with self._lock:
+            self.writing -= 1
+            self.writes += 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_csv_sink_writes_ranked_leaderboard_and_totals(tmp_path):
+    session = board()
+    exporter = Exporter([CSVSink(tmp_path)])
+    session.subscribe(exporter)
+    exporter.flush()
+
+    with open(tmp_path / "leaderboard.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    assert tuple(rows[0]) == LEADERBOARD_COLUMNS
+    assert [row[:3] for row in rows[1:]] == [["1", "bob", "10.0"], ["2", "alice", "2.5"], ["3", "carol <3 & co", "1.0"]]
+    with open(tmp_path / "totals.csv", newline="") as f:
+        totals = dict(list(csv.reader(f))[1:])
+    assert totals["Monetary"] == "13.5"
+    assert totals["Donos"] == "12.5"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_xlsx_sink_writes_both_sheets(tmp_path):
+    session = board()
+    path = tmp_path / "out" / "leaderboard.xlsx"
+    exporter = Exporter([XLSXSink(str(path))])
+    session.subscribe(exporter)
+    exporter.flush()
+
+    with zipfile.ZipFile(path) as book:
+        assert book.testzip() is None
+        workbook = book.read("xl/workbook.xml").decode()
+        leaderboard = book.read("xl/worksheets/sheet1.xml").decode()
+        totals = book.read("xl/worksheets/sheet2.xml").decode()
+    assert 'name="Leaderboard"' in workbook and 'name="Totals"' in workbook
+    assert leaderboard.count("<row>") == 4
+    assert "<t>carol &lt;3 &amp; co</t>" in leaderboard # escaped, so Excel opens it
+    assert "<c><v>10.0</v></c>" in leaderboard
+    assert "<t>Monetary</t>" in totals
+
+
+def test_burst_of_changes_is_one_export():
+    session = Session()
+    sink = CountingSink()
+    exporter = Exporter([sink], debounce=0.2, max_delay=5)
+    session.subscribe(exporter)
+    exporter.start()
+    wait_for(lambda: exporter.exports == 1) # the export start() asks for
+    for i in range(100):
+        session.update(f"u{i}", add("dono", 100))
+    wait_for(lambda: exporter.exports == 2)
+    time.sleep(0.4)
+    assert exporter.stop(timeout=5)
+    assert exporter.exports == 2
+    assert exporter.changes == 101
+    assert len(sink.exports[-1].leaderboard) == 100
+
+
+def test_stop_mid_write_returns_at_once_and_never_starts_a_second_writer():
+    session = board()
+    sink = BlockingSink()
+    exporter = Exporter([sink], debounce=0)
+    session.subscribe(exporter)
+    exporter.start()
+    assert sink.started.wait(5)
+
+    started = time.monotonic()
+    assert not exporter.stop(timeout=0) # still writing
+    assert time.monotonic() - started < 0.5
+    assert not exporter.running and exporter.stopping
+
+    session.update("dave", add("dono", 500)) # lands while the old thread is still going
+    exporter.start() # cancels the stop instead of starting another thread
+    assert exporter.running
+    exporter.stop(timeout=0)
+    sink.release.set()
+    assert exporter.stop(timeout=5)
+    assert not exporter.running and not exporter.stopping
+    assert sink.most_at_once == 1
+    assert sink.writes == 2 # the pending change was written before the thread exited
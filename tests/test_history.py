@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from songbump import history as history_module
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.core import Session
+from songbump.history import STATE_FIELDS, History, row_state
+from songbump.storage import open_storage
+
+
+def add_donos(cents):
+    delta = empty_delta()
+    add_contribution(delta, "dono", cents)
+    return lambda data: apply_delta(data, delta)
+
+
+def state(session):
+    return {name: row_state(data) for name, data in session.users.items()}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(history_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_state_at_replays_exactly_within_retention(clock):
+    rng = random.Random(7)
+    session = Session()
+    history = History(session, checkpoint_every=50, max_events=200)
+    names = [f"u{i}" for i in range(25)]
+    seen = []
+    for _ in range(1000):
+        clock[0] += 1
+        name = rng.choice(names)
+        if rng.random() < 0.9:
+            session.update(name, add_donos(rng.randint(1, 500)))
+        else:
+            session.delete(name)
+        seen.append((clock[0], state(session)))
+
+    assert len(history.events) <= 250 # trimmed a checkpoint interval at a time
+    assert len(history.checkpoints) <= 6
+    oldest = history.checkpoints[0][1]
+    for moment, expected in seen:
+        if moment >= oldest:
+            got = {name: tuple(data[field] for field in STATE_FIELDS) for name, data in history.state_at(moment).items()}
+            assert got == expected
+
+
+def test_undo_only_takes_back_your_own_changes():
+    session = Session()
+    history = History(session)
+    with history.action(owner="mod a"):
+        session.update("alice", add_donos(500))
+    with history.action(owner="mod b"):
+        session.update("alice", add_donos(300))
+    session.update("alice", add_donos(100)) # synced in from elsewhere, nobody's to undo
+
+    assert history.next_undo("mod a").label == "Added alice with $5.00"
+    assert history.undo("mod a").owner == "mod a"
+    assert session.users["alice"].donos == 400 # mod b's and the synced change survive
+    assert history.undo("mod a") is None
+    assert history.next_undo("mod b").label == "alice +$3.00"
+
+    with history.action(owner="mod b"):
+        session.update("bob", add_donos(50))
+    assert history.next_redo("mod a").owner == "mod a" # mod b's edit doesn't clear mod a's redo
+    history.redo("mod a")
+    assert session.users["alice"].donos == 900
+
+
+def test_undo_across_storages_keeps_the_other_mods_write(tmp_path):
+    paths = {"snapshot_path": str(tmp_path / "users.json"), "journal_path": str(tmp_path / "users.journal.jsonl")}
+    storage, other = open_storage("journal", **paths), open_storage("journal", **paths)
+    history = History(storage)
+    with history.action(owner="mod a"):
+        storage.update("alice", add_donos(500))
+    other.update("alice", add_donos(200))
+    storage.sync()
+
+    assert history.next_undo("mod a") is not None
+    assert history.undo(None) is None # the synced write isn't anyone's to undo
+    assert history.recent()[0].label == "alice +$2.00"
+    history.undo("mod a")
+    assert open_storage("journal", **paths).users["alice"].donos == 200
+
+
+def test_undo_stack_is_capped():
+    session = Session()
+    history = History(session, max_actions=10)
+    for i in range(25):
+        with history.action(owner="mod"):
+            session.update(f"u{i}", add_donos(100))
+    assert len(history.undo_stack) == 10
+    assert history.next_undo("mod").label == "Added u24 with $1.00"
+
+
+def test_rows_synced_in_during_a_save_are_not_part_of_it(tmp_path):
+    paths = {"snapshot_path": str(tmp_path / "users.json"), "journal_path": str(tmp_path / "users.journal.jsonl")}
+    storage, other = open_storage("journal", **paths), open_storage("journal", **paths)
+    history = History(storage)
+
+    other.update("bob", add_donos(300)) # not synced yet, so the save below pulls it in
+    with history.action(owner="mod a"):
+        storage.update("alice", add_donos(500))
+    assert history.next_undo("mod a").label == "Added alice with $5.00"
+    assert history.recent()[1].label == "Added bob with $3.00"
+
+    other.update("carol", add_donos(700))
+    other.compact() # the next save reloads from the new snapshot
+    with history.action(owner="mod a"):
+        storage.update("alice", add_donos(100))
+    assert list(history.next_undo("mod a").changes) == ["alice"]
+
+    history.undo("mod a")
+    history.undo("mod a")
+    assert history.undo("mod a") is None
+    fresh = open_storage("journal", **paths)
+    assert {name: data.donos for name, data in fresh.users.items()} == {"bob": 300, "carol": 700}
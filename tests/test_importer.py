@@ -0,0 +1,63 @@
+import io
+
+from songbump.core import Session
+from songbump.importer import detect_format, import_stream, import_upload
+
+CSV_EXPORT = """﻿Username,Event,Plan,Amount
+alice,resub,2000,
+bob,subgift,1000,3
+bob,Cheer,,500
+carol,donation,,5.005
+carol,tip,,$5
+dave,follow,,
+,bits,,100
+erin,bits,,-100
+frank,sub,4000,
+gina,submysterygift,Prime,2
+"""
+
+
+def summary_counts(summary):
+    return summary.rows, summary.skipped, summary.users, summary.new_users
+
+
+def test_csv_export_with_loose_headers_and_bad_rows():
+    upload = io.BytesIO(CSV_EXPORT.encode("utf-8"))
+    upload.name = "activity.csv"
+    session = Session()
+    session.update("alice", lambda data: data.update(num_bits=100, bits_total=100))
+    summary = import_upload(session, upload)
+
+    # $5 isn't an amount, a follow isn't a contribution, no user, negative bits, tier 4000
+    assert summary_counts(summary) == (10, 5, 4, 3)
+    users = session.users
+    assert (users["alice"].resub_tier, users["alice"].resub_total, users["alice"].num_bits) == (2, 999, 100)
+    assert (users["bob"].gifted_subs_count, users["bob"].tier1, users["bob"].gifted_subs_total) == (3, 3, 1797)
+    assert (users["bob"].num_bits, users["bob"].bits_total) == (500, 500)
+    assert users["carol"].donos == 501 # half a cent rounds up
+    assert users["gina"].tier1 == 2
+    assert users["bob"].monetary_total == 1797 + 500
+    assert set(users) == {"alice", "bob", "carol", "gina"}
+
+
+def test_jsonl_export_skips_lines_that_arent_objects():
+    lines = [
+        '{"user_name": "alice", "type": "bits", "bits": 250}',
+        "",
+        "not json",
+        "[1, 2]",
+        '{"display_name": "alice", "kind": "dono", "amount": 2.5}',
+        '{"name": "bob", "event": "gift", "count": "2", "tier": "3"}',
+    ]
+    session = Session()
+    summary = import_stream(session, io.StringIO("\n".join(lines)), "jsonl")
+    assert summary_counts(summary) == (5, 2, 2, 2)
+    assert (session.users["alice"].num_bits, session.users["alice"].donos) == (250, 250)
+    assert (session.users["bob"].tier3, session.users["bob"].gifted_subs_total) == (2, 4998)
+
+
+def test_format_is_picked_from_the_extension():
+    assert detect_format("export.JSONL") == "jsonl"
+    assert detect_format("export.ndjson") == "jsonl"
+    assert detect_format("export.csv") == "csv"
+    assert detect_format("export") == "csv"
@@ -0,0 +1,53 @@
+import random
+
+from songbump.leaderboard import LeaderboardIndex
+
+
+def row(total):
+    return {"monetary_total": total}
+
+
+def ranked(users):
+    return [name for name, total in sorted(users.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def test_order_rank_and_pages_match_a_full_sort():
+    rng = random.Random(3)
+    index = LeaderboardIndex()
+    users = {}
+    for step in range(3000):
+        name = f"u{rng.randrange(300)}"
+        if rng.random() < 0.15:
+            users.pop(name, None)
+            index.update(name, None)
+        else:
+            users[name] = rng.choice([0, 100, 599, rng.randrange(100000)]) # plenty of ties
+            index.update(name, row(users[name]))
+        if step % 250 == 0:
+            expected = ranked(users)
+            assert list(index) == expected
+            assert len(index) == len(users)
+            assert all(index.rank(name) == position for position, name in enumerate(expected))
+            for offset in (0, 1, 24, max(len(expected) - 3, 0), len(expected)):
+                assert index.page(offset, 25) == expected[offset:offset + 25]
+    assert index.top(10) == ranked(users)[:10]
+
+
+def test_ties_go_by_name_and_missing_users_have_no_rank():
+    index = LeaderboardIndex()
+    index.reset({"bob": row(500), "alice": row(500), "carol": row(900)})
+    assert list(index) == ["carol", "alice", "bob"]
+    assert index.rank("bob") == 2
+    assert index.rank("nobody") is None
+    assert "nobody" not in index
+    index.update("bob", row(1000))
+    assert index.top(1) == ["bob"]
+    assert index.page(-1, 5) == [] and index.page(3, 5) == []
+
+
+def test_between_is_inclusive_and_highest_first():
+    index = LeaderboardIndex()
+    index.reset({name: row(total) for name, total in (("a", 100), ("b", 500), ("c", 500), ("d", 999), ("e", 1000))})
+    assert index.between(500, 999) == ["d", "b", "c"]
+    assert index.between(0, 99) == []
+    assert index.between(0, 10**9) == list(index)
@@ -0,0 +1,42 @@
+import pytest
+
+from songbump.money import dollars, format_dollars, format_dono, migrate_user, to_cents
+
+
+@pytest.mark.parametrize("amount, cents", [
+    ("5", 500),
+    ("5.99", 599),
+    (" 2.50 ", 250),
+    (0.1, 10),
+    (5.99, 599), # floats go through str(), so 5.99 doesn't become 598
+    ("0.005", 1), # half a cent rounds up
+    ("0.0049", 0),
+    ("1.005", 101),
+    ("-1.005", -101), # and away from zero for negatives
+    ("-0.01", -1),
+    (3, 300),
+    ("1e2", 10000),
+])
+def test_to_cents_rounds_half_up(amount, cents):
+    assert to_cents(amount) == cents
+
+
+@pytest.mark.parametrize("amount", ["", "abc", "$5", "5,00", None, "inf", "nan", [5]])
+def test_to_cents_refuses_what_isnt_an_amount(amount):
+    with pytest.raises(ValueError):
+        to_cents(amount)
+
+
+def test_formatting():
+    assert dollars(1234) == "12.34"
+    assert dollars(5) == "0.05"
+    assert dollars(-1234) == "-12.34"
+    assert format_dollars(0) == "$0.00"
+    assert format_dollars(-5) == "$-0.05"
+    assert format_dono(500) == "$5"
+    assert format_dono(550) == "$5.50"
+
+
+def test_migrate_user_converts_only_money_fields():
+    data = migrate_user({"donos": 2.5, "monetary_total": 8.49, "resub_total": 5.99, "num_bits": 7, "tier1": 1})
+    assert data == {"donos": 250, "monetary_total": 849, "resub_total": 599, "num_bits": 7, "tier1": 1}
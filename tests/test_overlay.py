@@ -0,0 +1,58 @@
+import http.client
+import json
+import threading
+
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.overlay import MAX_TOP, Snapshot, make_server
+from songbump.storage import open_storage
+
+
+def add_donos(cents):
+    delta = empty_delta()
+    add_contribution(delta, "dono", cents)
+    return lambda data: apply_delta(data, delta)
+
+
+def test_snapshot_bodies_are_built_once_across_request_threads():
+    rows = [{"rank": rank, "name": f"u{rank}", "total": 1000 - rank} for rank in range(1, MAX_TOP + 1)]
+    snapshot = Snapshot(1, rows, {"monetary": 0}, [])
+    start = threading.Barrier(16)
+    seen = []
+
+    def request_thread():
+        start.wait()
+        seen.append([snapshot.body(top) for top in range(1, MAX_TOP + 1)])
+
+    threads = [threading.Thread(target=request_thread) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for bodies in seen[1:]:
+        assert all(body is first for body, first in zip(bodies, seen[0])) # same object, so serialized once
+
+
+def test_overlay_serves_a_read_only_storage(tmp_path):
+    paths = (str(tmp_path / "users.json"), str(tmp_path / "users.journal.jsonl"))
+    writer = open_storage("journal", *paths)
+    writer.update("alice", add_donos(500))
+    server, feed = make_server(open_storage("journal", *paths, read_only=True), port=0, poll_interval=3600)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    try:
+        client.request("GET", "/leaderboard.json?top=5")
+        response = client.getresponse()
+        assert [row["name"] for row in json.loads(response.read())["leaderboard"]] == ["alice"]
+        etag = response.getheader("ETag")
+
+        writer.update("bob", add_donos(900))
+        feed.poll()
+        client.request("GET", "/leaderboard.json?top=5", headers={"If-None-Match": etag})
+        response = client.getresponse()
+        assert response.status == 200
+        assert [row["name"] for row in json.loads(response.read())["leaderboard"]] == ["bob", "alice"]
+    finally:
+        client.close()
+        feed.stop()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,188 @@
+import json
+import random
+import threading
+
+import pytest
+
+from songbump.contributions import add_contribution, apply_delta, empty_delta
+from songbump.storage import BACKENDS, ConflictError, ReadOnlyError, open_storage
+
+
+@pytest.fixture(params=BACKENDS)
+def open_mod(request, tmp_path):
+    """Opens another storage on the same files, like another mod's Streamlit server."""
+    paths = {
+        "snapshot_path": str(tmp_path / "users.json"),
+        "journal_path": str(tmp_path / "users.journal.jsonl"),
+        "db_path": str(tmp_path / "users.db"),
+    }
+    return lambda **options: open_storage(request.param, **paths, **options)
+
+
+def add_donos(cents):
+    delta = empty_delta()
+    add_contribution(delta, "dono", cents)
+    return lambda data: apply_delta(data, delta)
+
+
+def test_every_write_bumps_the_version(open_mod):
+    storage = open_mod()
+    assert storage.version("alice") == 0
+    storage.update("alice", add_donos(100))
+    storage.update("alice", add_donos(100))
+    assert storage.version("alice") == 2
+    assert open_mod().users["alice"].version == 2
+
+
+def test_stale_put_is_refused(open_mod):
+    mod_a, mod_b = open_mod(), open_mod()
+    mod_a.update("alice", add_donos(100))
+    mod_b.sync()
+    mod_a.update("alice", add_donos(100))
+
+    stale = mod_b.users["alice"].copy()
+    with pytest.raises(ConflictError):
+        mod_b.put_many({"alice": stale}, {"alice": 1})
+    assert open_mod().users["alice"].donos == 200
+
+
+def test_conflicting_update_is_merged(open_mod):
+    mod_a, mod_b = open_mod(), open_mod()
+    mod_a.update("alice", add_donos(100))
+    interrupted = []
+
+    def change(data):
+        if not interrupted: # mod B saves while mod A's change is being applied
+            interrupted.append(True)
+            mod_b.update("alice", add_donos(250))
+        apply_delta(data, {**empty_delta(), "donos": 500})
+
+    mod_a.update("alice", change)
+
+    assert mod_a.conflicts == 1
+    fresh = open_mod().users["alice"]
+    assert fresh.donos == 850 # nobody's contribution was lost
+    assert fresh.version == 3
+
+
+def test_update_gives_up_after_retries(open_mod):
+    mod_a, mod_b = open_mod(), open_mod()
+
+    def change(data):
+        mod_b.update("alice", add_donos(1)) # someone always gets there first
+        data.donos += 1000
+
+    with pytest.raises(ConflictError):
+        mod_a.update_many({"alice": change}, retries=3)
+    assert open_mod().users["alice"].donos == 3
+
+
+def test_concurrent_mods_lose_nothing(open_mod):
+    mods = [open_mod(), open_mod()]
+    names = [f"user{i}" for i in range(5)]
+    added = {name: 0 for name in names}
+    lock = threading.Lock()
+
+    def session(storage, seed):
+        rng = random.Random(seed)
+        for _ in range(40):
+            name, cents = rng.choice(names), rng.randint(1, 2000)
+            storage.update(name, add_donos(cents))
+            with lock:
+                added[name] += cents
+
+    # Two threads per storage, the way Streamlit sessions share one
+    threads = [threading.Thread(target=session, args=(mods[i % 2], i)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    fresh = open_mod()
+    assert {name: fresh.users[name].donos for name in names} == added
+
+
+
+def files(folder):
+    # The -shm file is SQLite's shared-memory index, which readers use too
+    return {path.name: path.read_bytes() for path in folder.iterdir() if not path.name.endswith("-shm")}
+
+
+def test_read_only_storage_follows_without_writing(open_mod, tmp_path):
+    writer = open_mod()
+    writer.update("alice", add_donos(100))
+    before = files(tmp_path)
+    viewer = open_mod(read_only=True)
+    assert viewer.users["alice"].donos == 100
+    assert files(tmp_path) == before
+
+    writer.update("bob", add_donos(200))
+    writer.delete("alice")
+    before = files(tmp_path)
+    viewer.sync()
+    assert set(viewer.users) == {"bob"}
+    for write in (lambda: viewer.update("carol", add_donos(1)), lambda: viewer.delete("bob"), viewer.clear, viewer.compact):
+        with pytest.raises(ReadOnlyError):
+            write()
+    assert set(viewer.users) == {"bob"}
+    assert files(tmp_path) == before
+
+
+def test_read_only_journal_migrates_old_files_in_memory_only(tmp_path):
+    snapshot = tmp_path / "users.json"
+    snapshot.write_text('{"alice": {"donos": 2.5}}') # float dollars, from before the schema version
+    viewer = open_storage("journal", str(snapshot), str(tmp_path / "users.journal.jsonl"), read_only=True)
+    assert viewer.users["alice"].donos == 250
+    assert files(tmp_path) == {"users.json": b'{"alice": {"donos": 2.5}}'}
+
+
+def test_read_only_sqlite_needs_an_existing_database(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        open_storage("sqlite", db_path=str(tmp_path / "users.db"), read_only=True)
+    assert not list(tmp_path.iterdir())
+
+
+# --- Journal crash safety ---
+def open_journal(tmp_path, **options):
+    return open_storage("journal", str(tmp_path / "users.json"), str(tmp_path / "users.journal.jsonl"), **options)
+
+
+def test_torn_last_record_is_skipped_and_closed_off(tmp_path):
+    journal = open_journal(tmp_path)
+    journal.update("alice", add_donos(100))
+    with open(tmp_path / "users.journal.jsonl", "ab") as f:
+        f.write(b'{"op":"put","name":"bob","v":2,"data":{"don') # a crash half way through an append
+
+    recovered = open_journal(tmp_path)
+    assert set(recovered.users) == {"alice"}
+    recovered.update("carol", add_donos(300)) # starts on a fresh line after the torn record
+    assert set(open_journal(tmp_path).users) == {"alice", "carol"}
+    assert (tmp_path / "users.journal.jsonl").read_bytes().count(b"\n") == 3
+
+
+def test_journal_is_compacted_every_compact_every_records(tmp_path):
+    from songbump.journal import Journal
+
+    journal = Journal(str(tmp_path / "users.json"), str(tmp_path / "users.journal.jsonl"), compact_every=5)
+    for i in range(4):
+        journal.update(f"u{i}", add_donos(100))
+    assert (tmp_path / "users.journal.jsonl").read_bytes().count(b"\n") == 4
+    journal.update("u4", add_donos(100))
+    assert (tmp_path / "users.journal.jsonl").read_bytes() == b""
+    assert set(json.loads((tmp_path / "users.json").read_text())["users"]) == {f"u{i}" for i in range(5)}
+    assert {name: data.donos for name, data in open_journal(tmp_path).users.items()} == {f"u{i}": 100 for i in range(5)}
+
+
+def test_sync_starts_over_after_another_process_compacts(tmp_path):
+    mod_a, mod_b = open_journal(tmp_path), open_journal(tmp_path)
+    mod_a.update("alice", add_donos(100))
+    mod_b.sync()
+    mod_a.update("bob", add_donos(200))
+    mod_a.compact() # new snapshot, new (empty) journal file
+    mod_a.update("carol", add_donos(300))
+    mod_a.delete("alice")
+
+    mod_b.sync()
+    assert {name: data.donos for name, data in mod_b.users.items()} == {"bob": 200, "carol": 300}
+    mod_b.update("bob", add_donos(50)) # and its own writes land on top of the compacted files
+    assert open_journal(tmp_path).users["bob"].donos == 250
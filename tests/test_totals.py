@@ -0,0 +1,48 @@
+import random
+
+from songbump.columnar import ColumnarStore
+from songbump.contributions import new_user, recalculate
+from songbump.core import Contributor
+from songbump.totals import GrandTotals, grand_totals
+
+
+def random_user(rng, name):
+    data = new_user()
+    data.update(
+        resub_tier=rng.choice([0, 0, 1, 3]),
+        resub_total=rng.randint(0, 2000),
+        tier1=rng.randint(0, 3),
+        gifted_subs_count=rng.randint(0, 5),
+        gifted_subs_total=rng.randint(0, 3000),
+        num_bits=rng.randint(0, 500),
+        bits_total=rng.randint(0, 500),
+        donos=rng.randint(0, 9999),
+    )
+    return recalculate(Contributor.from_row(name, data))
+
+
+def test_updates_match_a_full_recompute():
+    rng = random.Random(3)
+    users = {f"u{i}": random_user(rng, f"u{i}") for i in range(500)}
+    totals = GrandTotals()
+    totals.reset(users)
+    assert totals.values == grand_totals(ColumnarStore.from_users(users))
+
+    for _ in range(2000):
+        name = f"u{rng.randrange(600)}" # some new users, some loaded ones, some changed twice
+        if rng.random() < 0.1:
+            users.pop(name, None)
+            totals.update(name, None)
+        else:
+            users[name] = random_user(rng, name)
+            totals.update(name, users[name])
+
+    assert totals.values == grand_totals(ColumnarStore.from_users(users))
+
+
+def test_reset_to_empty():
+    totals = GrandTotals()
+    totals.reset({})
+    totals.update("alice", random_user(random.Random(1), "alice"))
+    totals.update("alice", None)
+    assert set(totals.values.values()) == {0}
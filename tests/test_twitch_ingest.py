@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import pytest
+
+from songbump.core import Session
+from songbump.fake_irc import FakeChatServer, load_recording
+from songbump.importer import aggregate, commit_deltas
+from songbump.storage import ConflictError
+from songbump.twitch_ingest import IngestService, contribution_from_message, parse_line
+
+RECORDING = os.path.join(os.path.dirname(__file__), os.pardir, "samples", "hype_train.irc")
+
+
+def replay(session, lines, loops=1, **options):
+    """Runs an IngestService against a local fake chat server until the replay ends."""
+    async def main():
+        fake = FakeChatServer(lines, loops)
+        server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        service = IngestService(session, "prb", "127.0.0.1", port, tls=False, reconnect=False,
+                                flush_interval=0.05, **options)
+        async with server:
+            await asyncio.wait_for(service.run(), 10)
+        return service
+
+    return asyncio.run(main())
+
+
+def rows(users):
+    """Users as plain rows without versions, which depend on how the writes were batched."""
+    return {name: {**data.to_row(), "version": None} for name, data in users.items()}
+
+
+def expected_rows(lines, loops=1):
+    events = [contribution_from_message(*parse_line(line)[:3]) for line in lines] * loops
+    session = Session()
+    commit_deltas(session, aggregate([event for event in events if event is not None]))
+    return rows(session.users)
+
+
+def test_replay_commits_every_contribution():
+    lines = load_recording(RECORDING)
+    lines.insert(3, "@display-name=" + "x" * 200000 + " :tmi.twitch.tv USERNOTICE #prb") # over the read limit
+    session = Session()
+    service = replay(session, lines, loops=20, batch_size=7)
+
+    assert service.stats["skipped_lines"] >= 20 # a long line can overrun the buffer more than once
+    assert service.stats["batches"] > 1
+    assert rows(session.users) == expected_rows(lines, loops=20)
+
+
+class ConflictingSession(Session):
+    def __init__(self, conflicts):
+        super().__init__()
+        self.conflicts = conflicts
+
+    def update_many(self, changes):
+        if self.conflicts:
+            self.conflicts -= 1
+            raise ConflictError("another mod kept writing")
+        return super().update_many(changes)
+
+
+def test_conflicting_batch_is_retried():
+    lines = load_recording(RECORDING)
+    session = ConflictingSession(conflicts=2)
+    service = replay(session, lines)
+
+    assert service.stats["retries"] == 2
+    assert rows(session.users) == expected_rows(lines)
+
+
+class BrokenSession(Session):
+    def update_many(self, changes):
+        raise OSError(28, "No space left on device")
+
+
+def test_failing_commit_stops_the_service():
+    lines = load_recording(RECORDING)
+    with pytest.raises(OSError, match="No space left"):
+        # The queue is much smaller than the replay, so the reader is blocked on it when the batcher fails
+        replay(BrokenSession(), lines, loops=200, batch_size=5, queue_size=10)